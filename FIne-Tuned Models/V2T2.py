@@ -1,23 +1,79 @@
 import whisper
 import os
+import torch
 
-def v2t(filename):
-    model = whisper.load_model("large")
-    result = model.transcribe(os.path.abspath(filename), fp16=False)
+from batching import scheduler
+from model_registry import registry
+
+LANGUAGES = {
+    "en": "English",
+    "es": "Spanish",
+    "fr": "French",
+    "de": "German",
+    "zh": "Chinese",
+    "hi": "Hindi",
+    "ru": "Russian",
+    # Add more languages as needed
+}
+
+# Approximate fp32 weight sizes, used by the registry to make room before loading
+WHISPER_SIZES_MB = {"tiny": 150, "base": 290, "small": 970, "medium": 3000, "large": 6200}
+
+
+def get_whisper_model(name="large"):
+    """Whisper model from the model registry, loaded once per process on first use."""
+    key = f"whisper-{name}"
+    registry.register(key, lambda: whisper.load_model(name), size_hint_mb=WHISPER_SIZES_MB.get(name))
+    return registry.get(key)
+
+
+def _language_and_text(result):
     lang = result["language"]
     text = result["text"]
-    if text:
-        LANGUAGES = {
-            "en": "English",
-            "es": "Spanish",
-            "fr": "French",
-            "de": "German",
-            "zh": "Chinese",
-            "hi": "Hindi",
-            "ru": "Russian",
-            # Add more languages as needed
-        }
-
-        full_lang = LANGUAGES.get(lang, "Unknown")
-
-        return full_lang, text
\ No newline at end of file
+    return LANGUAGES.get(lang, "Unknown"), text
+
+
+def _decode_short(model, audios):
+    """Decode clips of up to 30 s as one batch: a single encoder/decoder pass for all of them."""
+    mel = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.as_tensor(audio, dtype=torch.float32)),
+                                    model.dims.n_mels)
+        for audio in audios
+    ]).to(model.device)
+    options = whisper.DecodingOptions(fp16=False, without_timestamps=True)
+    results = []
+    for decoded in whisper.decode(model, mel, options):
+        # Same silence rule transcribe() applies per window
+        silent = decoded.no_speech_prob > 0.6 and decoded.avg_logprob < -1.0
+        results.append((LANGUAGES.get(decoded.language, "Unknown"), "" if silent else decoded.text))
+    return results
+
+
+def transcribe_batch(items):
+    """
+    Batch function for the scheduler. Items are file paths or 16 kHz float32 arrays; arrays
+    that fit in one 30 s window are decoded together, anything longer goes through transcribe().
+    """
+    model = get_whisper_model()
+    results = [None] * len(items)
+    short = [i for i, item in enumerate(items)
+             if not isinstance(item, str) and len(item) <= whisper.audio.N_SAMPLES]
+    if short:
+        for i, result in zip(short, _decode_short(model, [items[i] for i in short])):
+            results[i] = result
+    for i, item in enumerate(items):
+        if results[i] is None:
+            results[i] = _language_and_text(model.transcribe(item, fp16=False))
+    return results
+
+
+scheduler.register("whisper", transcribe_batch, max_batch=8, max_wait_ms=20)
+
+
+def v2t(filename):
+    return scheduler.run("whisper", os.path.abspath(filename))
+
+
+def v2t_array(audio):
+    """Transcribe a mono float32 array sampled at 16 kHz (no temp file needed)."""
+    return scheduler.run("whisper", audio)
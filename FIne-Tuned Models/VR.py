@@ -1,10 +1,10 @@
-from pyannote.audio.pipelines.speaker_diarization import SpeakerDiarization
 from pyannote.core import Segment
 from pydub import AudioSegment
 import os
-
-# Load pretrained diarization model (replace with your model checkpoint if needed)
-pipeline = SpeakerDiarization.from_pretrained("pyannote/speaker-diarization")
+import torch
+from batched_embeddings import load_waveform, TARGET_SAMPLE_RATE
+from vad import speech_regions, SpeechMap
+from model_registry import registry
 
 
 def diarize_audio(file_path, output_folder):
@@ -13,17 +13,29 @@ def diarize_audio(file_path, output_folder):
     # Ensure output directory exists
     os.makedirs(output_folder, exist_ok=True)
 
+    # Keep only speech so the pipeline does not spend time on silence
+    waveform = load_waveform(file_path).numpy()
+    speech = SpeechMap(waveform, TARGET_SAMPLE_RATE, speech_regions(waveform, TARGET_SAMPLE_RATE))
+    if not speech.regions:
+        print(f"No speech found in {file_path}")
+        return
+
     # Run diarization
-    diarization = pipeline(file_path)
+    # Pretrained diarization pipeline, loaded once by the model registry
+    diarization = registry.get("diarization")({
+        "waveform": torch.from_numpy(speech.compact).unsqueeze(0),
+        "sample_rate": TARGET_SAMPLE_RATE,
+    })
 
     # Load full audio
     audio = AudioSegment.from_wav(file_path)
 
     # Process each speaker segment
     for i, (turn, _, speaker) in enumerate(diarization.itertracks(yield_label=True)):
-        start_time = int(turn.start * 1000)  # Convert to milliseconds
-        end_time = int(turn.end * 1000)
-        segment_audio = audio[start_time:end_time]
+        # A turn can span removed silence; cut each speech piece and join them
+        segment_audio = AudioSegment.empty()
+        for start, end in speech.original_spans(turn.start, turn.end):
+            segment_audio += audio[int(start * 1000):int(end * 1000)]  # milliseconds
 
         # Save segmented audio
         segment_filename = f"segment_{i + 1}.wav"
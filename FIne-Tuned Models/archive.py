@@ -0,0 +1,137 @@
+import os
+import json
+from math import gcd, ceil
+from datetime import datetime
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+# Every model downstream (ECAPA, Whisper, pyannote) consumes 16 kHz mono.
+ARCHIVE_SAMPLE_RATE = 16000
+
+# soundfile (libsndfile) format/subtype per archive flavour
+FORMATS = {
+    "flac": ("FLAC", "PCM_16", ".flac"),   # lossless
+    "opus": ("OGG", "OPUS", ".opus"),      # lossy, ~4x smaller than FLAC for speech
+}
+
+
+def index_path_for(archive_path):
+    """Sidecar index written next to every archive."""
+    return archive_path + ".json"
+
+
+def _resampled_blocks(source, target_rate, block_s=30.0, context_s=0.05):
+    """
+    Yield mono float32 blocks of `source` resampled to `target_rate`.
+
+    Blocks are resampled with a little context on each side and trimmed, so there are no
+    seams, and block/context lengths are multiples of the decimation factor so the output
+    lines up sample-exactly. Only one block is ever held in memory.
+    """
+    src_rate = source.samplerate
+    g = gcd(src_rate, target_rate)
+    up, down = target_rate // g, src_rate // g
+    block = down * max(1, int(block_s * src_rate) // down)
+    pad = down * max(1, int(context_s * src_rate) // down)
+    out_pad = pad * up // down
+
+    buf = np.zeros(pad, dtype=np.float32)  # left context for the first block
+    for chunk in source.blocks(blocksize=block, dtype="float32", always_2d=True):
+        buf = np.concatenate([buf, chunk.mean(axis=1)])
+        while len(buf) >= pad + block + pad:
+            y = resample_poly(buf[:pad + block + pad], up, down)
+            yield y[out_pad:out_pad + block * up // down].astype(np.float32)
+            buf = buf[block:]
+
+    remaining = len(buf) - pad
+    if remaining > 0:
+        y = resample_poly(np.concatenate([buf, np.zeros(pad, dtype=np.float32)]), up, down)
+        yield y[out_pad:out_pad + ceil(remaining * up / down)].astype(np.float32)
+
+
+def archive_recording(source_path, archive_dir=None, fmt="flac", delete_original=False):
+    """
+    Resample a recording to 16 kHz mono once and store it compressed, with a JSON index.
+
+    Returns the archive path. The archive sits next to the source unless `archive_dir` is given.
+    """
+    file_format, subtype, ext = FORMATS[fmt]
+    archive_dir = archive_dir or os.path.dirname(os.path.abspath(source_path))
+    os.makedirs(archive_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    archive_path = os.path.join(archive_dir, stem + ext)
+    tmp_path = archive_path + ".part"
+
+    frames = 0
+    with sf.SoundFile(source_path) as source:
+        source_rate = source.samplerate
+        with sf.SoundFile(tmp_path, mode="w", samplerate=ARCHIVE_SAMPLE_RATE, channels=1,
+                          format=file_format, subtype=subtype) as sink:
+            for block in _resampled_blocks(source, ARCHIVE_SAMPLE_RATE):
+                sink.write(np.clip(block, -1.0, 1.0))
+                frames += len(block)
+    os.replace(tmp_path, archive_path)
+
+    with open(index_path_for(archive_path), "w", encoding="utf-8") as f:
+        json.dump({
+            "format": fmt,
+            "samplerate": ARCHIVE_SAMPLE_RATE,
+            "channels": 1,
+            "frames": frames,
+            "duration": frames / ARCHIVE_SAMPLE_RATE,
+            "source": os.path.basename(source_path),
+            "source_samplerate": source_rate,
+            "archived_at": datetime.now().isoformat(timespec="seconds"),
+        }, f, indent=2)
+
+    if delete_original:
+        os.remove(source_path)
+    return archive_path
+
+
+def load_index(archive_path):
+    """Read an archive's sidecar index (duration etc. without opening the audio)."""
+    with open(index_path_for(archive_path), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_range(archive_path, start_s=0.0, end_s=None):
+    """
+    Decode only [start_s, end_s) of an archive as mono float32 at 16 kHz.
+
+    The decoder seeks straight to the start frame (libFLAC / libopusfile seek within the
+    file), so reading one turn of a two-hour visit does not decode the whole recording.
+    """
+    with sf.SoundFile(archive_path) as f:
+        start = max(0, int(start_s * f.samplerate))
+        stop = f.frames if end_s is None else min(f.frames, int(end_s * f.samplerate))
+        if stop <= start:
+            return np.zeros(0, dtype=np.float32)
+        f.seek(start)
+        return f.read(stop - start, dtype="float32")
+
+
+def archive_folder(recordings_folder, fmt="flac", delete_original=False):
+    """Archive every WAV in a folder that has not been archived yet."""
+    archived = []
+    _, _, ext = FORMATS[fmt]
+    for file_name in sorted(os.listdir(recordings_folder)):
+        if not file_name.lower().endswith(".wav"):
+            continue
+        source_path = os.path.join(recordings_folder, file_name)
+        if os.path.exists(os.path.splitext(source_path)[0] + ext):
+            continue
+        print(f"Archiving: {file_name}")
+        archived.append(archive_recording(source_path, fmt=fmt, delete_original=delete_original))
+    return archived
+
+
+if __name__ == "__main__":
+    import sys
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else "recordings"
+    for path in archive_folder(folder):
+        info = load_index(path)
+        print(f"  {path}: {info['duration']:.1f}s @ {info['samplerate']} Hz")
@@ -5,6 +5,7 @@ import threading
 from datetime import datetime
 
 import db
+import archive
 
 # Audio Configuration
 mic = 1  # Adjust based on your input device
@@ -13,58 +14,88 @@ CHANNELS = 1
 RATE = 44100
 CHUNK = 1024
 directory = "recordings"
+ARCHIVE_FORMAT = "flac"  # "flac", "opus", or None to keep raw 44.1 kHz WAVs
 
 os.makedirs(directory, exist_ok=True)
 
 # Global variables
 p = pyaudio.PyAudio()
-stream = None
-frames = []
 filename = ""
 recording = False  # Flag to control recording
+recorder_thread = None
+listeners = []  # Callables receiving each raw int16 block as it is captured (e.g. live transcription)
 
 
 def record():
-    """Starts recording audio in a separate thread."""
-    global stream, frames, filename, recording
+    """Records audio, appending each chunk to the WAV file as it arrives (constant memory)."""
+    global filename, recorder_thread
 
     filename = os.path.join(directory, f"recording_{datetime.now().strftime('%d-%b%y_%H-%M-%S')}.wav")
-
-    stream = p.open(format=FORMAT, channels=CHANNELS, rate=RATE,
-                    input=True, frames_per_buffer=CHUNK, input_device_index=mic)
-
-    frames = []
-    recording = True
-    print("Recording started...")
-
-    while recording:
-        data = stream.read(CHUNK)
-        frames.append(data)
+    try:
+        stream = p.open(format=FORMAT, channels=CHANNELS, rate=RATE,
+                        input=True, frames_per_buffer=CHUNK, input_device_index=mic)
+        print("Recording started...")
+
+        # wave patches the header sizes on close, so the file is valid however long we record
+        with wave.open(filename, 'wb') as wf:
+            wf.setnchannels(CHANNELS)
+            wf.setsampwidth(p.get_sample_size(FORMAT))
+            wf.setframerate(RATE)
+            try:
+                while recording:
+                    data = stream.read(CHUNK)
+                    wf.writeframes(data)
+                    for listener in listeners:
+                        listener(data)
+            finally:
+                stream.stop_stream()
+                stream.close()
+    finally:
+        # If the device failed to open, let start_recording() try again
+        if recorder_thread is threading.current_thread() and recording:
+            recorder_thread = None
 
 
 def stop():
-    """Stops recording and saves the audio file."""
-    global stream, frames, filename, recording
+    """Stops recording and registers the saved audio file."""
+    global recording, recorder_thread
 
-    if stream:
-        recording = False
-        stream.stop_stream()
-        stream.close()
+    thread = recorder_thread
+    if not thread:
+        return
 
-    with wave.open(filename, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(p.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b''.join(frames))
+    recording = False
+    thread.join()
+    recorder_thread = None
 
+    if not os.path.exists(filename):
+        print("Recording failed; nothing was saved.")
+        return
     print(f"Recording stopped. Saved: {filename}")
-    db.save_recording_info(filename)
+    if ARCHIVE_FORMAT:
+        # Resample to 16 kHz and compress off the UI thread; the archive replaces the raw WAV
+        threading.Thread(target=archive_and_register, args=(filename,), daemon=True).start()
+    else:
+        db.save_recording_info(filename)
+
+
+def archive_and_register(wav_path):
+    """Archive a finished recording and store the archive (not the raw WAV) in the database."""
+    try:
+        archived = archive.archive_recording(wav_path, fmt=ARCHIVE_FORMAT, delete_original=True)
+    except Exception as e:
+        print(f"Archiving failed, keeping raw WAV: {e}")
+        archived = wav_path
+    db.save_recording_info(archived)
 
 
 
 def start_recording():
     """Starts recording in a new thread to prevent UI freezing."""
-    global recording
+    global recorder_thread, recording
 
-    if not recording:  # Prevent multiple recordings at the same time
-        threading.Thread(target=record, daemon=True).start()
+    if not recorder_thread:  # Prevent multiple recordings at the same time
+        # Set before the thread starts, so a stop() that arrives first is not overwritten
+        recording = True
+        recorder_thread = threading.Thread(target=record, daemon=True)
+        recorder_thread.start()
@@ -0,0 +1,131 @@
+import numpy as np
+import torch
+import torchaudio
+
+from batching import scheduler
+
+# ECAPA (spkrec-ecapa-voxceleb) is trained on 16 kHz mono audio.
+TARGET_SAMPLE_RATE = 16000
+
+
+def load_waveform(audio_path, sample_rate=TARGET_SAMPLE_RATE):
+    """Load an audio file as a 1-D mono float tensor at `sample_rate`."""
+    signal, fs = torchaudio.load(audio_path)
+    if signal.shape[0] > 1:
+        signal = signal.mean(dim=0, keepdim=True)
+    if fs != sample_rate:
+        signal = torchaudio.functional.resample(signal, fs, sample_rate)
+    return signal.squeeze(0)
+
+
+def frame_waveform(waveform, sample_rate=TARGET_SAMPLE_RATE, window=5.0, hop=2.5):
+    """
+    Cut a 1-D waveform into overlapping windows, returned as one (n_windows, window_samples) tensor.
+
+    Uses Tensor.unfold, so the windows are strided views rather than copies. If the hop does
+    not land exactly on the end, one extra window aligned to the end covers the tail.
+    window=None keeps the whole waveform as a single window.
+    """
+    if window is None or waveform.shape[0] <= int(window * sample_rate):
+        return waveform.unsqueeze(0)
+
+    win = int(window * sample_rate)
+    step = int(hop * sample_rate)
+
+    frames = waveform.unfold(0, win, step)
+    if (waveform.shape[0] - win) % step:
+        frames = torch.cat([frames, waveform[-win:].unsqueeze(0)], dim=0)
+    return frames
+
+
+def extract_embeddings_batched(model, waveform, sample_rate=TARGET_SAMPLE_RATE, window=5.0, hop=2.5,
+                               batch_size=32, num_threads=None):
+    """
+    Run the speaker encoder over sliding windows of `waveform` in batches.
+
+    Args:
+        model: a SpeechBrain EncoderClassifier/SpeakerRecognition (anything with encode_batch)
+        waveform: 1-D float tensor at `sample_rate`
+        window, hop: window length and step in seconds (window=None embeds the whole waveform)
+        batch_size: windows per encode_batch call
+        num_threads: torch intra-op threads to use for this call (None keeps the current setting)
+
+    Returns:
+        np.ndarray of shape (n_windows, embedding_dim)
+    """
+    frames = frame_waveform(waveform, sample_rate, window, hop)
+
+    previous_threads = torch.get_num_threads()
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    try:
+        embeddings = []
+        with torch.inference_mode():
+            for start in range(0, frames.shape[0], batch_size):
+                batch = frames[start:start + batch_size].contiguous()
+                embedding = model.encode_batch(batch)
+                embeddings.append(embedding.reshape(batch.shape[0], -1).cpu())
+    finally:
+        torch.set_num_threads(previous_threads)
+
+    return torch.cat(embeddings, dim=0).numpy().astype(np.float32)
+
+
+def extract_embeddings_from_file(model, audio_path, chunk_size=5, hop=None, min_chunked_duration=30,
+                                 batch_size=32, num_threads=None):
+    """
+    Drop-in replacement for the old per-chunk loops: short files give one whole-file embedding,
+    longer ones are framed into `chunk_size`-second windows (overlapping if `hop` < chunk_size).
+    """
+    waveform = load_waveform(audio_path)
+    duration = waveform.shape[0] / TARGET_SAMPLE_RATE
+    window = None if duration <= min_chunked_duration else chunk_size
+    return extract_embeddings_batched(
+        model,
+        waveform,
+        window=window,
+        hop=hop or chunk_size,
+        batch_size=batch_size,
+        num_threads=num_threads,
+    )
+
+
+def embed_signals(model, signals):
+    """
+    Embed variable-length mono signals with one encode_batch call: zero-pad to the longest
+    and pass relative lengths, so pooling ignores the padding.
+    """
+    tensors = []
+    for signal in signals:
+        signal = torch.as_tensor(signal, dtype=torch.float32)
+        tensors.append(signal.mean(dim=0) if signal.dim() > 1 else signal)
+    longest = max(t.shape[0] for t in tensors)
+    batch = torch.zeros(len(tensors), longest)
+    for i, t in enumerate(tensors):
+        batch[i, :t.shape[0]] = t
+    lengths = torch.tensor([t.shape[0] / longest for t in tensors])
+    with torch.inference_mode():
+        embeddings = model.encode_batch(batch, wav_lens=lengths)
+    return embeddings.reshape(len(tensors), -1).cpu().numpy()
+
+
+def _embed_batch(items):
+    # Items are (model, signal); requests for different model instances are batched separately.
+    results = [None] * len(items)
+    groups = {}
+    for i, (model, _) in enumerate(items):
+        groups.setdefault(id(model), []).append(i)
+    for indices in groups.values():
+        model = items[indices[0]][0]
+        embeddings = embed_signals(model, [items[i][1] for i in indices])
+        for i, embedding in zip(indices, embeddings):
+            results[i] = embedding
+    return results
+
+
+scheduler.register("ecapa", _embed_batch, max_batch=16, max_wait_ms=10)
+
+
+def embed_signal(model, signal):
+    """ECAPA embedding of one 16 kHz signal, batched with whatever other segments are waiting."""
+    return scheduler.run("ecapa", (model, signal))
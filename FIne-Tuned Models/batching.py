@@ -0,0 +1,174 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class Overloaded(RuntimeError):
+    """A model queue stayed full for longer than the caller was willing to wait."""
+
+
+class ModelQueue:
+    """
+    One model's request queue and the worker thread that drains it in batches.
+
+    The worker takes the first waiting request, keeps collecting until it has `max_batch`
+    requests or `max_wait_ms` has passed, then makes a single `batch_fn(items)` call that
+    must return one result per item, in order. The queue holds at most `max_queue`
+    requests; a submit waits up to `put_timeout` seconds for room (None waits forever,
+    0 fails immediately) and then raises Overloaded.
+    """
+
+    def __init__(self, name, batch_fn, max_batch=8, max_wait_ms=10, max_queue=64, put_timeout=None):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.put_timeout = put_timeout
+
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.batches = 0
+        self.rejected = 0
+        self.busy_s = 0.0
+        self.latencies = deque(maxlen=1000)  # seconds from submit to result, recent requests
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name=f"batch-{name}", daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        future = Future()
+        try:
+            if self.put_timeout == 0:
+                self._queue.put_nowait((item, future, time.perf_counter()))
+            else:
+                self._queue.put((item, future, time.perf_counter()), timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(f"{self.name}: queue full ({self._queue.maxsize} pending)")
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            elapsed = time.perf_counter() - self.started
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "mean_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "throughput_per_s": round(self.requests / elapsed, 2) if elapsed else 0.0,
+                "utilization": round(self.busy_s / elapsed, 3) if elapsed else 0.0,
+                "p50_ms": round(1000 * latencies[len(latencies) // 2], 1) if latencies else None,
+                "p95_ms": round(1000 * latencies[int(len(latencies) * 0.95)], 1) if latencies else None,
+                "queued": self._queue.qsize(),
+                "rejected": self.rejected,
+            }
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)  # finish this batch, then stop
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            started = time.perf_counter()
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: batch_fn returned {len(results)} results for {len(batch)} items")
+                outcomes = [(future, result, None) for (_, future, _), result in zip(batch, results)]
+            except Exception as e:
+                print(f"Batch of {len(batch)} failed in {self.name}: {e}")
+                outcomes = [(future, None, e) for _, future, _ in batch]
+            finished = time.perf_counter()
+
+            with self._lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.busy_s += finished - started
+                self.latencies.extend(finished - submitted for _, _, submitted in batch)
+
+            for future, result, error in outcomes:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+
+class BatchScheduler:
+    """
+    In-process micro-batching for every model in the pipeline, one ModelQueue per model.
+
+    Call sites submit single items; concurrent requests for the same model (streaming
+    turns, diarized segments, summary chunks, faces from several frames) are amortized
+    into one batched model call. A lone caller pays at most `max_wait_ms` extra latency.
+    """
+
+    def __init__(self):
+        self.queues = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, batch_fn, **policy):
+        """Create the queue for a model once; later registrations of the same name are ignored."""
+        with self._lock:
+            if name not in self.queues:
+                self.queues[name] = ModelQueue(name, batch_fn, **policy)
+            return self.queues[name]
+
+    def submit(self, name, item):
+        """Queue one item for a model; returns a Future."""
+        return self.queues[name].submit(item)
+
+    def run(self, name, item, timeout=None):
+        """Submit one item and wait for its result."""
+        return self.submit(name, item).result(timeout)
+
+    def map(self, name, items, timeout=None):
+        """Submit several items at once (so they can share batches) and return results in order."""
+        futures = [self.submit(name, item) for item in items]
+        return [future.result(timeout) for future in futures]
+
+    def stats(self):
+        return {name: q.stats() for name, q in self.queues.items()}
+
+    def log_stats(self):
+        for name, s in self.stats().items():
+            print(f"[{name}] {s['requests']} requests in {s['batches']} batches "
+                  f"(mean {s['mean_batch']}), {s['throughput_per_s']}/s, "
+                  f"p50 {s['p50_ms']} ms, p95 {s['p95_ms']} ms, "
+                  f"util {s['utilization']:.0%}, queued {s['queued']}, rejected {s['rejected']}")
+
+    def close(self):
+        with self._lock:
+            for q in self.queues.values():
+                q.close()
+            self.queues.clear()
+
+
+# One scheduler per process, shared by every model module
+scheduler = BatchScheduler()
@@ -1,53 +1,121 @@
 import sqlite3
 import os
+import threading
 
 DATABASE = "audio_recordings.db"
 
 
-def initialize_database():
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-
-    cursor.execute('''CREATE TABLE IF NOT EXISTS recordings (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        filename TEXT NOT NULL,
-                        filepath TEXT NOT NULL,
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+class RecordingsRepository:
+    """
+    The recordings table behind one long-lived connection.
+
+    The schema is created once when the repository opens; WAL mode lets the Tk table
+    read while the recorder thread inserts. The connection is shared across threads,
+    so every statement runs under a lock.
+    """
+
+    def __init__(self, database=DATABASE):
+        self.conn = sqlite3.connect(database, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock, self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS recordings (
+                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                    filename TEXT NOT NULL,
+                                    filepath TEXT NOT NULL,
+                                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS ix_recordings_timestamp_id "
+                              "ON recordings (timestamp, id)")
+
+    def add(self, filename, filepath):
+        """Insert one recording and return its id."""
+        with self._lock, self.conn:
+            cursor = self.conn.execute("INSERT INTO recordings (filename, filepath) VALUES (?, ?)",
+                                       (filename, filepath))
+            return cursor.lastrowid
+
+    def add_many(self, rows):
+        """Insert many (filename, filepath) rows in a single transaction."""
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT INTO recordings (filename, filepath) VALUES (?, ?)", rows)
+
+    def fetch_page(self, limit=200, after=None):
+        """
+        Newest-first page of rows. Pass the last row of the previous page as `after`
+        (keyset pagination on (timestamp, id), so deep pages cost the same as the first).
+        """
+        with self._lock:
+            if after is None:
+                cursor = self.conn.execute(
+                    "SELECT * FROM recordings ORDER BY timestamp DESC, id DESC LIMIT ?", (limit,))
+            else:
+                cursor = self.conn.execute(
+                    "SELECT * FROM recordings WHERE (timestamp, id) < (?, ?) "
+                    "ORDER BY timestamp DESC, id DESC LIMIT ?", (after[3], after[0], limit))
+            return cursor.fetchall()
+
+    def fetch_between(self, start, end, limit=200):
+        """Rows recorded in [start, end), oldest first; timestamps as 'YYYY-MM-DD HH:MM:SS'."""
+        with self._lock:
+            cursor = self.conn.execute(
+                "SELECT * FROM recordings WHERE timestamp >= ? AND timestamp < ? "
+                "ORDER BY timestamp, id LIMIT ?", (start, end, limit))
+            return cursor.fetchall()
+
+    def iter_all(self, page_size=500):
+        """Stream every row, newest first, one page at a time."""
+        after = None
+        while True:
+            page = self.fetch_page(page_size, after)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_repository = None
+
+
+def get_repository():
+    """Process-wide repository, opened on first use."""
+    global _repository
+    if _repository is None:
+        _repository = RecordingsRepository()
+    return _repository
 
-    conn.commit()
-    conn.close()
 
+def initialize_database():
+    get_repository()
 
-def save_recording_info(filename):
-    """Insert a recording and store the full path correctly."""
-    initialize_database()  # Ensure table exists
 
+def _recording_path(filename):
+    """Recordings always live in ./recordings; store the absolute path."""
     filename = os.path.basename(filename)
     full_path = os.path.join(os.getcwd(), "recordings", filename)  # Add recordings/
-    full_path = os.path.abspath(full_path)  # Get absolute path
-
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
+    return filename, os.path.abspath(full_path)  # Get absolute path
 
-    cursor.execute("INSERT INTO recordings (filename, filepath) VALUES (?, ?)",
-                   (filename, full_path))
 
-    conn.commit()
-    conn.close()
+def save_recording_info(filename):
+    """Insert a recording and store the full path correctly."""
+    return get_repository().add(*_recording_path(filename))
 
-    #print(f"✅ Stored recording: {filename} at {full_path}")
 
-def fetch():
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
+def save_recordings_info(filenames):
+    """Insert many recordings in one transaction."""
+    get_repository().add_many([_recording_path(name) for name in filenames])
 
-    cursor.execute("SELECT * FROM recordings;")
-    rows = cursor.fetchall()
 
-    conn.close()
+def fetch_page(limit=200, after=None):
+    return get_repository().fetch_page(limit, after)
 
-    #for row in rows:  # Print stored data
-        #print(f"🔍 DB Row: {row}")
-
-    return rows
 
+def fetch():
+    return list(get_repository().iter_all())
@@ -0,0 +1,146 @@
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VALID_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+ENCODING_DIM = 128
+
+
+def encode_image(path):
+    """
+    Detect (HOG) and encode the first face in one gallery image.
+    Runs in a worker process; returns (path, encoding or None, error message or None).
+    """
+    import face_recognition
+
+    try:
+        image = face_recognition.load_image_file(path)
+        face_locations = face_recognition.face_locations(image, model="hog")
+        if not face_locations:
+            return path, None, None
+        return path, face_recognition.face_encodings(image, face_locations[:1])[0], None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def scan_gallery(base_folder, settle_s=1.0):
+    """
+    {path: (person, mtime, size)} for every image in base_folder/<person>/.
+    Files modified in the last `settle_s` seconds are skipped, since they may still be being written.
+    """
+    now = time.time()
+    found = {}
+    for person_folder in Path(base_folder).iterdir():
+        if not person_folder.is_dir():
+            continue
+        for image_path in person_folder.iterdir():
+            if image_path.suffix.lower() not in VALID_EXTENSIONS:
+                continue
+            stat = image_path.stat()
+            if now - stat.st_mtime < settle_s:
+                continue
+            found[str(image_path)] = (person_folder.name, stat.st_mtime, stat.st_size)
+    return found
+
+
+class FaceEncodingCache:
+    """
+    Gallery encodings persisted next to the gallery, keyed by image path + mtime + size.
+
+    `refresh` re-encodes only images that are new or changed since the last run (across a
+    process pool, since HOG + encoding is CPU-bound per image) and forgets deleted ones.
+    Images without a detectable face are cached too, so they are not re-scanned every start.
+    """
+
+    def __init__(self, base_folder, cache_path=None, workers=None):
+        self.base_folder = Path(base_folder)
+        self.cache_path = Path(cache_path or self.base_folder / ".encodings.npz")
+        self.workers = workers
+        self.entries = {}  # path -> (person, mtime, size, encoding or None)
+        self._load()
+
+    def _load(self):
+        if not self.cache_path.exists():
+            return
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                for path, person, mtime, size, has_face, encoding in zip(
+                        data["paths"], data["persons"], data["mtimes"], data["sizes"],
+                        data["has_face"], data["encodings"]):
+                    self.entries[str(path)] = (str(person), float(mtime), int(size),
+                                               encoding if has_face else None)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable encoding cache {self.cache_path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        """Write the cache atomically (temp file + rename)."""
+        paths = list(self.entries)
+        rows = [self.entries[path] for path in paths]
+        encodings = np.zeros((len(rows), ENCODING_DIM), dtype=np.float64)
+        for i, row in enumerate(rows):
+            if row[3] is not None:
+                encodings[i] = row[3]
+
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                paths=np.asarray(paths, dtype=str),
+                persons=np.asarray([row[0] for row in rows], dtype=str),
+                mtimes=np.asarray([row[1] for row in rows], dtype=np.float64),
+                sizes=np.asarray([row[2] for row in rows], dtype=np.int64),
+                has_face=np.asarray([row[3] is not None for row in rows], dtype=bool),
+                encodings=encodings,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self, settle_s=1.0):
+        """Sync the cache with the gallery. Returns (encoded, removed) counts; saves if anything changed."""
+        found = scan_gallery(self.base_folder, settle_s)
+
+        stale = [path for path in self.entries if path not in found and not os.path.exists(path)]
+        for path in stale:
+            del self.entries[path]
+
+        pending = [
+            path for path, (person, mtime, size) in found.items()
+            if path not in self.entries or self.entries[path][1:3] != (mtime, size)
+        ]
+        if pending:
+            logger.info(f"Encoding {len(pending)} new or changed gallery images...")
+            if len(pending) == 1:
+                results = [encode_image(pending[0])]
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    results = list(pool.map(encode_image, pending, chunksize=4))
+
+            for path, encoding, error in results:
+                person, mtime, size = found[path]
+                if error:
+                    logger.error(f"Error processing {os.path.basename(path)}: {error}")
+                    continue  # not cached, so it is retried next refresh
+                if encoding is None:
+                    logger.warning(f"No face found in {os.path.basename(path)}")
+                self.entries[path] = (person, mtime, size, encoding)
+
+        if pending or stale:
+            self.save()
+        return len(pending), len(stale)
+
+    def known_faces(self):
+        """(encodings, names) of every cached image that contains a face."""
+        encodings, names = [], []
+        for person, _, _, encoding in self.entries.values():
+            if encoding is not None:
+                encodings.append(encoding)
+                names.append(person)
+        return encodings, names
@@ -1,71 +1,154 @@
 from asyncio.windows_events import NULL
 
 import cv2
+import dlib
 import face_recognition
 import numpy as np
 import time
 import logging
 import requests
+import os
+import sys
+import threading
 from pathlib import Path
+from tracker import FaceTracker
+from face_cache import FaceEncodingCache
+from batching import scheduler
 
 # Setup logger
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 # Configuration
-ESP32_CAM_URL = "http://192.168.118.217/capture"  # ESP32-CAM snapshot URL
+ESP32_CAM_URL = os.getenv("ESP32_CAM_URL", "http://192.168.118.217/capture")  # ESP32-CAM snapshot URL
+ESP32_STREAM_URL = os.getenv("ESP32_STREAM_URL")  # optional MJPEG stream, e.g. http://<ip>:81/stream
 BASE_FOLDER = Path(r"C:\Users\shshv\PycharmProjects\voice_test\known_faces")
 CONFIDENCE_THRESHOLD = 0.55
 FRAME_SKIP = 2  # Process every 2nd frame for efficiency
-SCAN_DURATION = 1  # Print detection results every 3 seconds
+DETECTION_SCALE = 0.5  # Run HOG detection on a frame scaled by this factor (1 = full resolution)
+STATS_INTERVAL = 10  # Log capture/recognition throughput every N seconds
+WATCH_INTERVAL = 5  # In watch mode, rescan the gallery for new images every N seconds
 faces = NULL
-class FaceRecognitionSystem:
+
+
+def encode_faces_batch(items):
+    """
+    Scheduler batch function: items are (rgb_frame, face_boxes). Landmarks are found once
+    per frame, then dlib computes the descriptors of every frame in one call (one call per
+    frame if this dlib build does not support the batched overload).
+    """
+    frames, shapes = [], []
+    for rgb, boxes in items:
+        detections = dlib.full_object_detections()  # the batched overload wants one of these per image
+        for landmarks in face_recognition.api._raw_face_landmarks(rgb, boxes, model="small"):
+            detections.append(landmarks)
+        frames.append(rgb)
+        shapes.append(detections)
+
+    encoder = face_recognition.api.face_encoder
+    try:
+        descriptors = encoder.compute_face_descriptor(frames, shapes, 1)
+    except (TypeError, RuntimeError):
+        descriptors = [encoder.compute_face_descriptor(rgb, detections, 1) for rgb, detections in zip(frames, shapes)]
+    return [[np.array(d) for d in per_frame] for per_frame in descriptors]
+
+
+def enable_face_batching():
+    """
+    Share face encoding between several producer threads (e.g. one per camera) through the
+    batching scheduler. With FaceRecognitionSystem's single recognition thread a batch never
+    holds more than one frame, so it encodes directly unless this has been called.
+    """
+    scheduler.register("face", encode_faces_batch, max_batch=4, max_wait_ms=5)
+
+
+class LatestFrame:
+    """
+    Single-slot frame buffer between threads. The producer overwrites whatever the
+    consumer has not picked up yet, so the consumer always gets the newest frame and
+    stale frames are dropped (and counted) instead of queueing up latency.
+    """
+
     def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, frame):
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the newest frame, or None on timeout/close."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame is not None or self._closed, timeout)
+            frame, self._frame = self._frame, None
+            return frame
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class FaceRecognitionSystem:
+    def __init__(self, watch=False):
         self.known_face_encodings = []
         self.known_face_names = []
+        self.face_cache = FaceEncodingCache(BASE_FOLDER)
+        self.watch = watch
         self.load_known_faces()
+        self.stack_known_faces()
 
         self.frame_count = 0
-        self.last_detection_time = time.time()
+        self.tracker = FaceTracker()
+        self.encodings_computed = 0
+
+        # Capture -> recognition -> display pipeline
+        self.session = requests.Session()
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.latest_frame = LatestFrame()
+        self.display_frame = LatestFrame()
+        self.stop_event = threading.Event()
+        self.frames_captured = 0
+        self.frames_processed = 0
 
     def load_known_faces(self):
-        """Load known faces from the specified folder."""
+        """Load known faces from the encoding cache, encoding only new or changed images."""
         logger.info("Loading known faces...")
         try:
-            valid_extensions = {".jpg", ".jpeg", ".png"}
-            for person_folder in BASE_FOLDER.iterdir():
-                if person_folder.is_dir():
-                    person_name = person_folder.name
-                    logger.info(f"Processing folder: {person_name}")
-
-                    for image_path in person_folder.glob("*"):
-                        if image_path.suffix.lower() in valid_extensions:
-                            try:
-                                image = face_recognition.load_image_file(str(image_path))
-                                face_locations = face_recognition.face_locations(image, model="hog")
-
-                                if face_locations:
-                                    face_encoding = face_recognition.face_encodings(image, face_locations)[0]
-                                    self.known_face_encodings.append(face_encoding)
-                                    self.known_face_names.append(person_name)
-                                    logger.info(f"Loaded {image_path.name}")
-                                else:
-                                    logger.warning(f"No face found in {image_path.name}")
-
-                            except Exception as e:
-                                logger.error(f"Error processing {image_path.name}: {str(e)}")
+            encoded, removed = self.face_cache.refresh(settle_s=0)
+            logger.info(f"Encoded {encoded} images, dropped {removed} deleted images")
         except Exception as e:
             logger.error(f"Error loading known faces: {str(e)}")
             exit()
+        self.known_face_encodings, self.known_face_names = self.face_cache.known_faces()
+
+    def watch_known_faces(self):
+        """Pick up images added to the gallery (e.g. by dataset.capture_image_burst) without a restart."""
+        while not self.stop_event.wait(WATCH_INTERVAL):
+            try:
+                encoded, removed = self.face_cache.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing known faces: {str(e)}")
+                continue
+            if encoded or removed:
+                self.known_face_encodings, self.known_face_names = self.face_cache.known_faces()
+                self.stack_known_faces()
+                logger.info(f"Gallery updated: {len(self.known_face_names)} known faces")
 
     def get_frame_from_esp32(self):
-        """Fetch a frame from the ESP32-CAM."""
+        """Fetch a frame from the ESP32-CAM over the pooled keep-alive session."""
         try:
-            response = requests.get(ESP32_CAM_URL, timeout=2)  # Fetch frame from ESP32
+            response = self.session.get(ESP32_CAM_URL, timeout=2)  # Fetch frame from ESP32
             if response.status_code == 200:
                 image_array = np.frombuffer(response.content, dtype=np.uint8)
                 frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-                return True, frame
+                return frame is not None, frame
             else:
                 logger.error("Failed to fetch frame from ESP32-CAM")
                 return False, None
@@ -73,56 +156,184 @@ class FaceRecognitionSystem:
             logger.error(f"ESP32-CAM Connection Error: {e}")
             return False, None
 
-    def run(self):
-        """Run the face recognition system."""
-        logger.info(f"Starting face recognition with {len(self.known_face_encodings)} known faces.")
+    def stream_frames_from_esp32(self):
+        """Yield decoded frames from the ESP32-CAM MJPEG stream (one long-lived response)."""
+        with self.session.get(ESP32_STREAM_URL, stream=True, timeout=5) as response:
+            buffer = b""
+            for chunk in response.iter_content(chunk_size=4096):
+                if self.stop_event.is_set():
+                    return
+                buffer += chunk
+                start = buffer.find(b"\xff\xd8")
+                end = buffer.find(b"\xff\xd9", start + 2)
+                if start != -1 and end != -1:
+                    jpeg, buffer = buffer[start:end + 2], buffer[end + 2:]
+                    frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                    if frame is not None:
+                        yield frame
+
+    def capture_loop(self):
+        """Producer: keep the latest-frame slot filled as fast as the camera allows."""
+        while not self.stop_event.is_set():
+            if ESP32_STREAM_URL:
+                try:
+                    for frame in self.stream_frames_from_esp32():
+                        self.frames_captured += 1
+                        self.latest_frame.put(frame)
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"ESP32-CAM stream error: {e}")
+                    self.stop_event.wait(1)
+                continue
 
-        while True:
             ret, frame = self.get_frame_from_esp32()
             if not ret:
                 logger.error("Failed to capture frame from ESP32-CAM.")
+                self.stop_event.wait(0.5)
+                continue
+            self.frames_captured += 1
+            self.latest_frame.put(frame)
+
+    def recognition_loop(self):
+        """Consumer: always work on the newest frame; publish annotated frames for display."""
+        while not self.stop_event.is_set():
+            frame = self.latest_frame.get(timeout=0.5)
+            if frame is None:
                 continue
 
             self.frame_count += 1
 
             # Skip frames for efficiency
-            if self.frame_count % FRAME_SKIP != 0:
-                cv2.imshow("Face Recognition", frame)
+            if self.frame_count % FRAME_SKIP == 0:
+                # Detect faces (on a downscaled frame; boxes come back in full-res coordinates)
+                face_locations, rgb = self.detect_faces(frame)
+                self.process_faces(rgb, face_locations)
+                self.frames_processed += 1
+
+            self.draw_tracks(frame)
+            self.display_frame.put(frame)
+
+    def log_stats(self, elapsed):
+        logger.info(
+            f"Capture {self.frames_captured / elapsed:.1f} fps, "
+            f"recognition {self.frames_processed / elapsed:.1f} fps, "
+            f"encodings {self.encodings_computed / elapsed:.1f}/s, "
+            f"stale frames dropped {self.latest_frame.dropped}"
+        )
+        scheduler.log_stats()
+        self.frames_captured = self.frames_processed = self.encodings_computed = 0
+
+    def run(self):
+        """Run the face recognition system."""
+        logger.info(f"Starting face recognition with {len(self.known_face_encodings)} known faces.")
+
+        workers = [
+            threading.Thread(target=self.capture_loop, daemon=True),
+            threading.Thread(target=self.recognition_loop, daemon=True),
+        ]
+        if self.watch:
+            workers.append(threading.Thread(target=self.watch_known_faces, daemon=True))
+        for worker in workers:
+            worker.start()
+
+        # OpenCV windows must be driven from the main thread
+        stats_start = time.time()
+        try:
+            while True:
+                frame = self.display_frame.get(timeout=0.1)
+                if frame is not None:
+                    # Ensure bounding boxes & text are visible
+                    cv2.imshow("Face Recognition", frame)
                 if cv2.waitKey(1) & 0xFF == ord("q"):
                     break
-                continue
+                if time.time() - stats_start >= STATS_INTERVAL:
+                    self.log_stats(time.time() - stats_start)
+                    stats_start = time.time()
+        finally:
+            self.stop_event.set()
+            self.latest_frame.close()
+            self.display_frame.close()
+            for worker in workers:
+                worker.join(timeout=2)
+            self.session.close()
+            cv2.destroyAllWindows()
+
+    def stack_known_faces(self):
+        """Stack the known encodings into one (N, 128) array for vectorized matching."""
+        # One tuple assignment, so the recognition thread never sees a matrix and names from different reloads
+        self.known_gallery = (
+            np.asarray(self.known_face_encodings, dtype=np.float64).reshape(-1, 128),
+            np.asarray(self.known_face_names, dtype=object),
+        )
 
-            # Detect faces
-            face_locations = face_recognition.face_locations(frame, model="hog")
+    def match_faces(self, face_encodings):
+        """
+        Match all detected faces at once: one (faces x known) distance matrix, then the
+        nearest known face per row. Returns [(name, confidence), ...] aligned with face_encodings.
+        """
+        known_matrix, known_names = self.known_gallery
+        if not len(face_encodings) or not len(known_matrix):
+            return [("Unknown", 0) for _ in face_encodings]
 
-            if face_locations and time.time() - self.last_detection_time >= SCAN_DURATION:
-                face_encodings = face_recognition.face_encodings(frame, face_locations)
-                self.process_faces(frame, face_locations, face_encodings)
-                self.last_detection_time = time.time()
+        encodings = np.asarray(face_encodings, dtype=np.float64)
+        distances = np.linalg.norm(encodings[:, None, :] - known_matrix[None, :, :], axis=2)
+        best = distances.argmin(axis=1)
+        best_distances = distances[np.arange(len(best)), best]
 
-            # Ensure bounding boxes & text are visible
-            cv2.imshow("Face Recognition", frame)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
+        results = []
+        for index, distance in zip(best, best_distances):
+            if distance <= CONFIDENCE_THRESHOLD:
+                results.append((known_names[index], 1 - distance))
+            else:
+                results.append(("Unknown", 0))
+        return results
 
-        cv2.destroyAllWindows()
+    def detect_faces(self, frame):
+        """
+        Detect on a downscaled copy (HOG cost scales with pixel count) and map the boxes
+        back to full resolution. Returns (face_locations, rgb_frame) for encoding.
+        """
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # face_recognition expects RGB
+        if DETECTION_SCALE == 1:
+            return face_recognition.face_locations(rgb, model="hog"), rgb
 
-    def process_faces(self, frame, face_locations, face_encodings):
-        """Recognize faces, print detected names, and draw bounding boxes."""
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding, tolerance=CONFIDENCE_THRESHOLD)
-            name = "Unknown"
-            confidence = 0
+        small = cv2.resize(rgb, (0, 0), fx=DETECTION_SCALE, fy=DETECTION_SCALE, interpolation=cv2.INTER_AREA)
+        height, width = rgb.shape[:2]
+        locations = [
+            (
+                max(0, int(top / DETECTION_SCALE)),
+                min(width, int(right / DETECTION_SCALE)),
+                min(height, int(bottom / DETECTION_SCALE)),
+                max(0, int(left / DETECTION_SCALE)),
+            )
+            for top, right, bottom, left in face_recognition.face_locations(small, model="hog")
+        ]
+        return locations, rgb
 
-            if True in matches:
-                face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                best_match_index = np.argmin(face_distances)
-                if matches[best_match_index]:
-                    name = self.known_face_names[best_match_index]
-                    confidence = 1 - face_distances[best_match_index]
+    def process_faces(self, rgb, face_locations):
+        """Track detected faces and encode only the tracks whose identity is new or stale."""
+        now = time.time()
+        tracks = self.tracker.update(face_locations, now)
+        stale = [track for track in tracks if self.tracker.needs_encoding(track, now)]
+        if not stale:
+            return
 
-            # Print detected name every 3 seconds
-            logger.info(f"Detected: {name} (Confidence: {confidence:.2%})")
+        boxes = [track.box for track in stale]
+        if "face" in scheduler.queues:
+            face_encodings = scheduler.run("face", (rgb, boxes))
+        else:
+            face_encodings = face_recognition.face_encodings(rgb, boxes)
+        for track, (name, confidence) in zip(stale, self.match_faces(face_encodings)):
+            self.tracker.set_identity(track, name, confidence, now)
+            logger.info(f"Detected: {name} (Confidence: {confidence:.2%}) [track {track.id}]")
+        self.encodings_computed += len(stale)
+
+    def draw_tracks(self, frame):
+        """Draw bounding boxes and cached identities of the faces currently tracked."""
+        for track in self.tracker.tracks:
+            if track.missed:
+                continue
+            top, right, bottom, left = track.box
+            name, confidence = track.name, track.confidence
 
             # Draw a rectangle around the face
             color = (0, 255, 0) if confidence >= CONFIDENCE_THRESHOLD else (0, 0, 255)
@@ -134,7 +345,7 @@ class FaceRecognitionSystem:
 
 if __name__ == "__main__":
     try:
-        face_system = FaceRecognitionSystem()
+        face_system = FaceRecognitionSystem(watch="--watch" in sys.argv)
         face_system.run()
     except Exception as e:
         logger.error(f"System initialization failed: {str(e)}")
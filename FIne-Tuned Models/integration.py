@@ -1,89 +1,59 @@
 import os
 import numpy as np
 import json
-import pickle
-from pyannote.audio.pipelines.speaker_diarization import SpeakerDiarization
+import requests
 from pydub import AudioSegment
+import torch
 import torchaudio
-from speechbrain.inference import SpeakerRecognition, EncoderClassifier
-from V2T2 import v2t
+from V2T2 import v2t_array
+from batching import scheduler
+from model_registry import registry
+from speaker_store import SpeakerStore
+from batched_embeddings import extract_embeddings_from_file, load_waveform, embed_signal, TARGET_SAMPLE_RATE
+from vad import speech_regions, SpeechMap
+from streaming import StreamingTranscriber, OnlineSpeakerAssigner
 
 
 class ConversationProcessor:
-    def __init__(self, embeddings_db_path="speaker_embeddings.pkl", threshold=0.75):
+    def __init__(self, embeddings_db_path="speaker_embeddings.pkl", threshold=0.75, store_dir="speaker_store"):
         """Initialize the conversation processor."""
-        # Load diarization pipeline
-        self.diarization_pipeline = SpeakerDiarization.from_pretrained("pyannote/speaker-diarization")
-
-        # Lazy load models
-        self.spk_verification = None
-        self.embedding_model = None
-
-        # Speaker embeddings database
+        # Speaker embeddings database (memory-mapped; the legacy pickle is only read once to migrate)
         self.embeddings_db_path = embeddings_db_path
-        self.speaker_embeddings = self.load_embeddings_db()
+        self.speaker_embeddings = self.load_embeddings_db(store_dir)
         self.threshold = threshold
 
     def get_speaker_model(self):
-        """Load SpeechBrain speaker verification model only when needed."""
-        if self.spk_verification is None:
-            self.spk_verification = SpeakerRecognition.from_hparams(
-                source="speechbrain/spkrec-ecapa-voxceleb",
-                savedir="tmp_model"
-            )
-        return self.spk_verification
+        """SpeechBrain speaker verification model (ECAPA), loaded once by the model registry."""
+        return registry.get("ecapa")
 
     def get_embedding_model(self):
-        """Load SpeechBrain embedding model only when needed."""
-        if self.embedding_model is None:
-            self.embedding_model = EncoderClassifier.from_hparams(
-                source="speechbrain/spkrec-ecapa-voxceleb",
-                savedir="tmp_model",
-                run_opts={"fetch_strategy": "copy"}
-            )
-        return self.embedding_model
-
-    def load_embeddings_db(self):
-        """Load the speaker embeddings database."""
-        if os.path.exists(self.embeddings_db_path):
-            with open(self.embeddings_db_path, 'rb') as f:
-                return pickle.load(f)
-        return {}
-
-    def save_embeddings_db(self):
-        """Save the speaker embeddings database."""
-        with open(self.embeddings_db_path, 'wb') as f:
-            pickle.dump(self.speaker_embeddings, f)
-
-    def extract_embeddings_from_audio(self, audio_path, chunk_size=5):
-        """Extract speaker embeddings from an audio file in fixed-length chunks."""
+        """Same ECAPA weights as get_speaker_model: SpeakerRecognition is an EncoderClassifier."""
+        return registry.get("ecapa")
+
+    @property
+    def diarization_pipeline(self):
+        """pyannote diarization pipeline, loaded on first use instead of in __init__."""
+        return registry.get("diarization")
+
+    def load_embeddings_db(self, store_dir):
+        """Open the speaker embedding store, migrating the old pickle database if present."""
+        store = SpeakerStore(store_dir)
+        if not len(store) and os.path.exists(self.embeddings_db_path):
+            migrated = store.import_pickle(self.embeddings_db_path)
+            print(f"Migrated {migrated} speakers from {self.embeddings_db_path}")
+        return store
+
+    def extract_embeddings_from_audio(self, audio_path, chunk_size=5, hop=None, batch_size=32, num_threads=None):
+        """Extract speaker embeddings from an audio file over (optionally overlapping) windows in batches."""
         model = self.get_embedding_model()
-
-        audio = AudioSegment.from_wav(audio_path)
-        duration = len(audio) / 1000  # Convert to seconds
-        embeddings = []
-
-        # Process in chunks if the file is longer than 30 seconds
-        if duration > 30:
-            temp_chunk_path = "temp_chunk_extract.wav"
-            try:
-                for start in range(0, int(duration), chunk_size):
-                    end = min(start + chunk_size, duration)
-                    segment = audio[start * 1000:end * 1000]  # Convert to ms
-                    segment.export(temp_chunk_path, format="wav")
-
-                    signal, fs = torchaudio.load(temp_chunk_path)
-                    embedding = model.encode_batch(signal)
-                    embeddings.append(embedding.squeeze().detach().cpu().numpy())
-            finally:
-                if os.path.exists(temp_chunk_path):
-                    os.remove(temp_chunk_path)
-        else:
-            signal, fs = torchaudio.load(audio_path)
-            embedding = model.encode_batch(signal)
-            embeddings.append(embedding.squeeze().detach().cpu().numpy())
-
-        return np.array(embeddings)
+        return extract_embeddings_from_file(
+            model,
+            audio_path,
+            chunk_size=chunk_size,
+            hop=hop,
+            batch_size=batch_size,
+            num_threads=num_threads,
+        )
 
     def add_speaker(self, speaker_name, audio_files_or_folder):
         """Add a new speaker to the database by processing their audio files."""
@@ -141,39 +111,40 @@ class ConversationProcessor:
         if all_embeddings:
             # Calculate mean embedding for the speaker
             speaker_embedding = np.array(all_embeddings).mean(axis=0)
-            self.speaker_embeddings[speaker_name] = speaker_embedding
-            self.save_embeddings_db()
+            self.speaker_embeddings.put(speaker_name, speaker_embedding)
             print(f"  Added {speaker_name} with {len(all_embeddings)} embeddings")
             return True
         else:
             print(f"  No valid embeddings extracted for {speaker_name}")
             return False
 
+    def embed_signal(self, signal):
+        """Compute the ECAPA embedding of a 16 kHz mono signal (numpy array or tensor)."""
+        return embed_signal(self.get_speaker_model(), signal)
+
+    def match_embedding(self, segment_embedding):
+        """Return the enrolled speaker closest to an embedding, or "Unknown" below the threshold."""
+        if not self.speaker_embeddings:
+            return "Unknown"
+
+        # Cosine similarity against all known speakers at once
+        names, matrix = self.speaker_embeddings.matrix()
+        similarities = matrix @ segment_embedding / (
+                np.linalg.norm(matrix, axis=1) * np.linalg.norm(segment_embedding)
+        )
+        best = int(np.argmax(similarities))
+        if similarities[best] > self.threshold:
+            return names[best]
+        return "Unknown"
+
     def identify_speaker(self, segment_path):
         """Identify the speaker in an audio segment."""
         if not self.speaker_embeddings:
             return "Unknown"
 
         try:
-            model = self.get_speaker_model()
             signal, fs = torchaudio.load(segment_path)
-            segment_embedding = model.encode_batch(signal).squeeze().detach().cpu().numpy()
-
-            best_match = "Unknown"
-            best_similarity = 0
-
-            # Compare with all known speakers
-            for speaker_name, speaker_embedding in self.speaker_embeddings.items():
-                # Compute cosine similarity
-                similarity = np.dot(speaker_embedding, segment_embedding) / (
-                        np.linalg.norm(speaker_embedding) * np.linalg.norm(segment_embedding)
-                )
-
-                if similarity > best_similarity and similarity > self.threshold:
-                    best_similarity = similarity
-                    best_match = speaker_name
-
-            return best_match
+            return self.match_embedding(self.embed_signal(signal))
 
         except Exception as e:
             print(f"Error identifying speaker: {e}")
@@ -186,57 +157,80 @@ class ConversationProcessor:
             return []
 
         print("Known speakers:")
-        for speaker in self.speaker_embeddings.keys():
+        for speaker in self.speaker_embeddings.names():
             print(f"  - {speaker}")
-        return list(self.speaker_embeddings.keys())
+        return self.speaker_embeddings.names()
 
     def remove_speaker(self, speaker_name):
         """Remove a speaker from the database."""
-        if speaker_name in self.speaker_embeddings:
-            del self.speaker_embeddings[speaker_name]
-            self.save_embeddings_db()
+        if self.speaker_embeddings.remove(speaker_name):
             print(f"Removed speaker: {speaker_name}")
             return True
         else:
             print(f"Speaker {speaker_name} not found in database.")
             return False
 
-    def diarize_and_process(self, file_path, temp_folder="temp_segments"):
+    def push_speaker(self, speaker_name, person_id, server_url="http://127.0.0.1:5000"):
+        """Send a stored voiceprint to the Memoir app so it is linked to that Person's profile."""
+        embedding = self.speaker_embeddings.get(speaker_name)
+        if embedding is None:
+            print(f"Speaker {speaker_name} not found in database.")
+            return False
+
+        response = requests.post(
+            f"{server_url}/glasses/api/voice/enroll",
+            json={"person_id": int(person_id), "vector": embedding.tolist(), "provider": "ecapa"},
+            timeout=10,
+        )
+        if response.ok and response.json().get("ok"):
+            print(f"Linked {speaker_name} to Memoir person #{person_id}")
+            return True
+        print(f"Memoir rejected voiceprint for {speaker_name}: {response.status_code} {response.text}")
+        return False
+
+    def diarize_and_process(self, file_path):
         """Diarize audio and return segments with speaker labels and timestamps."""
-        # Ensure temp directory exists
-        os.makedirs(temp_folder, exist_ok=True)
+        # Drop non-speech first so diarization, verification and ASR skip silent stretches
+        waveform = load_waveform(file_path).numpy()
+        speech = SpeechMap(waveform, TARGET_SAMPLE_RATE, speech_regions(waveform, TARGET_SAMPLE_RATE))
+        if not speech.regions:
+            return []
+        print(f"Speech: {speech.duration:.1f}s of {len(waveform) / TARGET_SAMPLE_RATE:.1f}s")
 
-        # Run diarization
+        # Run diarization on the speech-only waveform
         print("Running diarization...")
-        diarization = self.diarization_pipeline(file_path)
-
-        # Load full audio
-        audio = AudioSegment.from_wav(file_path)
+        diarization = self.diarization_pipeline({
+            "waveform": torch.from_numpy(speech.compact).unsqueeze(0),
+            "sample_rate": TARGET_SAMPLE_RATE,
+        })
+
+        # Queue every segment for speaker embedding and ASR up front, so the scheduler can batch them
+        model = self.get_speaker_model()
+        pending = []
+        for turn, _, speaker in diarization.itertracks(yield_label=True):
+            # Extract segment from the compact waveform; report times in the original recording
+            segment_audio = speech.compact[int(turn.start * TARGET_SAMPLE_RATE):int(turn.end * TARGET_SAMPLE_RATE)]
+            start_time = speech.to_original(turn.start)
+            end_time = speech.to_original(turn.end, end=True)
+            pending.append((
+                start_time, end_time, speaker,
+                scheduler.submit("ecapa", (model, segment_audio)),
+                scheduler.submit("whisper", segment_audio),
+            ))
 
         segments = []
-
-        # Process each speaker segment
-        for i, (turn, _, speaker) in enumerate(diarization.itertracks(yield_label=True)):
-            start_time = turn.start
-            end_time = turn.end
-
-            # Extract segment
-            start_ms = int(start_time * 1000)
-            end_ms = int(end_time * 1000)
-            segment_audio = audio[start_ms:end_ms]
-
-            # Save temporary segment file
-            segment_filename = f"temp_segment_{i}.wav"
-            segment_path = os.path.join(temp_folder, segment_filename)
-            segment_audio.export(segment_path, format="wav")
-
+        for i, (start_time, end_time, speaker, embedding, transcript) in enumerate(pending):
             # Identify speaker
-            identified_speaker = self.identify_speaker(segment_path)
+            try:
+                identified_speaker = self.match_embedding(embedding.result())
+            except Exception as e:
+                print(f"Error identifying speaker: {e}")
+                identified_speaker = "Unknown"
 
             # Transcribe the segment
             print(f"Transcribing segment {i + 1}...")
             try:
-                language, text = v2t(segment_path)
+                language, text = transcript.result()
                 if text:
                     text = text.strip()
                 else:
@@ -255,15 +249,23 @@ class ConversationProcessor:
                 'language': language
             })
 
-            # Clean up temp file
-            os.remove(segment_path)
-
-        # Clean up temp directory
-        if os.path.exists(temp_folder) and not os.listdir(temp_folder):
-            os.rmdir(temp_folder)
-
         return segments
 
+    def start_stream(self, input_rate=16000, channels=1, on_turn=None, **segmenter_options):
+        """
+        Start live processing: feed recorder blocks to the returned StreamingTranscriber,
+        then call its close() when recording stops to get the remaining turns.
+        """
+        assigner = OnlineSpeakerAssigner(self.embed_signal, self.match_embedding, self.threshold)
+        return StreamingTranscriber(
+            identify_fn=assigner,
+            transcribe_fn=v2t_array,
+            input_rate=input_rate,
+            channels=channels,
+            on_turn=on_turn,
+            **segmenter_options,
+        )
+
     def format_conversation(self, segments):
         """Format the conversation segments into readable text."""
         conversation_text = []
@@ -359,6 +361,7 @@ def main():
         print("  Add speaker:         python main_processor.py add_speaker <name> <audio_folder_or_file>")
         print("  List speakers:       python main_processor.py list_speakers")
         print("  Remove speaker:      python main_processor.py remove_speaker <name>")
+        print("  Push to Memoir:      python main_processor.py push_speaker <name> <person_id> [server_url]")
         print("\nExamples:")
         print("  python main_processor.py add_speaker John ./john_recordings/")
         print("  python main_processor.py add_speaker Mary mary_sample.wav")
@@ -375,6 +378,8 @@ def main():
         wav_file = sys.argv[2]
         output_file = sys.argv[3] if len(sys.argv) > 3 else None
         processor.process_conversation(wav_file, output_file)
+        registry.report()
+        scheduler.log_stats()
 
     elif command == "add_speaker":
         if len(sys.argv) < 4:
@@ -398,6 +403,13 @@ def main():
         speaker_name = sys.argv[2]
         processor.remove_speaker(speaker_name)
 
+    elif command == "push_speaker":
+        if len(sys.argv) < 4:
+            print("Error: Speaker name and Memoir person id required.")
+            return
+        server_url = sys.argv[4] if len(sys.argv) > 4 else "http://127.0.0.1:5000"
+        processor.push_speaker(sys.argv[2], sys.argv[3], server_url)
+
     else:
         print(f"Unknown command: {command}")
 
@@ -10,6 +10,8 @@ import threading
 
 from datetime import datetime
 
+live = None  # StreamingTranscriber for the recording in progress
+
 
 def create_wind():
     global root
@@ -31,11 +33,21 @@ def create_wind2():
     t.configure(bg="black")
     t.geometry("1080x720")
     table(t)
-    refresh(tree, db.fetch())
+    refresh(tree)
     t.mainloop()
 
 
+def show_live_turn(turn):
+    output_text.insert(tk.END, f"[{turn['speaker']}]: {turn['text']}\n")
+    output_text.yview(tk.END)
+
+
 def start():
+    global live
+    if not audiorec.recorder_thread:
+        # Transcribe while recording so the transcript is ready when we stop
+        live = model.start_stream(input_rate=audiorec.RATE, channels=audiorec.CHANNELS, on_turn=show_live_turn)
+        audiorec.listeners[:] = [live.feed]
     audiorec.start_recording()
     output_text.insert(tk.END, "🎙️ Recording started...\n")  # ✅ Moved here
     output_text.yview(tk.END)
@@ -43,8 +55,11 @@ def start():
 
 def stop():
     audiorec.stop()
+    audiorec.listeners.clear()
     output_text.insert(tk.END, "💾 Stopping and saving.\n")  # ✅ Moved here
     output_text.yview(tk.END)
+    if live:
+        threading.Thread(target=live.close, daemon=True).start()
 
 
 def rec_but():
@@ -71,11 +86,26 @@ def viewt():
     vt.place(x=325, y=600)
 
 
-def refresh(tree, rows):
+PAGE_SIZE = 200
+last_row = None  # last DB row shown; the keyset for the next page
+
+
+def refresh(tree):
+    global last_row
     for item in tree.get_children():
         tree.delete(item)
+    last_row = None
+    load_more(tree)
+
+
+def load_more(tree):
+    """Append the next page of recordings (newest first) to the table."""
+    global last_row
+    rows = db.fetch_page(PAGE_SIZE, last_row)
     for row in rows:
         tree.insert("", "end", values=row)
+    if rows:
+        last_row = rows[-1]
 
 
 def on_row_selected(event, tree, action_button):
@@ -142,7 +172,9 @@ def table(t):
     action_button.pack(pady=10)
     tree.bind("<<TreeviewSelect>>", lambda event: on_row_selected(event, tree, action_button))
     tree.pack(expand=True, fill="both", padx=10, pady=10)
-    refresh_button = tk.Button(t, text="Refresh Data", command=lambda: refresh(tree, db.fetch()))
+    more_button = tk.Button(t, text="Load More", command=lambda: load_more(tree))
+    more_button.pack(pady=5)
+    refresh_button = tk.Button(t, text="Refresh Data", command=lambda: refresh(tree))
     refresh_button.pack(pady=10)
 
 
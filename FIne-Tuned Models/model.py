@@ -1,32 +1,57 @@
 import numpy as np
+import torch
 import torchaudio
-from speechbrain.inference import SpeakerRecognition
-from pydub import AudioSegment
 import os
-from V2T2 import v2t  # Import your voice-to-text function
-
-# Lazy load SpeechBrain model
-spk_verification = None
-shashvat_embedding = np.load("shashvat_embeddings.npy").mean(axis=0)  # Load embedding once
+from V2T2 import v2t_array  # Import your voice-to-text function
+from speaker_store import SpeakerStore
+from streaming import StreamingTranscriber
+from batched_embeddings import load_waveform, embed_signal, TARGET_SAMPLE_RATE
+from vad import speech_regions
+from batching import scheduler
+from model_registry import registry
+
+
+def load_shashvat_embedding(store_dir="speaker_store", legacy_path="shashvat_embeddings.npy"):
+    """Read Shashvat's voiceprint from the speaker store, importing the legacy .npy dump once."""
+    store = SpeakerStore(store_dir)
+    embedding = store.get("Shashvat")
+    if embedding is None and os.path.exists(legacy_path):
+        embedding = np.load(legacy_path).mean(axis=0)
+        store.put("Shashvat", embedding)
+    return embedding
+
+
+_shashvat_embedding = None
+
+
+def get_shashvat_embedding():
+    """Shashvat's voiceprint, read on first use (importing this module touches no files)."""
+    global _shashvat_embedding
+    if _shashvat_embedding is None:
+        embedding = load_shashvat_embedding()
+        if embedding is None:
+            raise LookupError(
+                "Shashvat is not enrolled: no 'Shashvat' entry in speaker_store/ "
+                "and no shashvat_embeddings.npy to import"
+            )
+        _shashvat_embedding = embedding
+    return _shashvat_embedding
 
 
 def get_speaker_model():
-    """Load SpeechBrain model only when needed."""
-    global spk_verification
-    if spk_verification is None:
-        spk_verification = SpeakerRecognition.from_hparams(
-            source="speechbrain/spkrec-ecapa-voxceleb",
-            savedir="tmp_model"
-        )
-    return spk_verification
+    """SpeechBrain ECAPA model, shared through the model registry and loaded only when needed."""
+    return registry.get("ecapa")
 
 
-def verify_speaker(segment_path):
-    """Check if the speaker in the segment is Shashvat."""
+def verify_signal(signal):
+    """Check if the speaker in a 16 kHz mono signal is Shashvat."""
     model = get_speaker_model()  # Load model only when needed
-    signal, fs = torchaudio.load(segment_path)
-    segment_embedding = model.encode_batch(signal).squeeze().detach().cpu().numpy()
+    return match_shashvat(embed_signal(model, signal))
 
+
+def match_shashvat(segment_embedding):
+    """Compare an ECAPA embedding against Shashvat's enrolled embedding."""
+    shashvat_embedding = get_shashvat_embedding()
     # Compute cosine similarity
     similarity = np.dot(shashvat_embedding, segment_embedding) / (
             np.linalg.norm(shashvat_embedding) * np.linalg.norm(segment_embedding)
@@ -35,30 +60,50 @@ def verify_speaker(segment_path):
     return "Shashvat" if similarity > 0.75 else "Unknown"  # Threshold can be adjusted
 
 
-def process_audio(file_path, output_folder):
-    """Diarize, verify, and transcribe audio segments."""
-    audio = AudioSegment.from_wav(file_path)
-    duration = len(audio) / 1000  # Convert to seconds
+def verify_speaker(segment_path):
+    """Check if the speaker in the segment is Shashvat."""
+    signal, fs = torchaudio.load(segment_path)
+    return verify_signal(signal)
+
+
+def start_stream(input_rate=16000, channels=1, on_turn=None):
+    """Verify and transcribe live audio as it is recorded; feed blocks, then close() at stop."""
+    return StreamingTranscriber(
+        identify_fn=verify_signal,
+        transcribe_fn=v2t_array,
+        input_rate=input_rate,
+        channels=channels,
+        on_turn=on_turn,
+    )
+
+
+def process_audio(file_path, output_folder, max_segment_s=5.0):
+    """Find speech with VAD, then verify and transcribe only the speech segments."""
+    get_shashvat_embedding()  # fail before any segment is written if nobody is enrolled
+    waveform = load_waveform(file_path).numpy()
     os.makedirs(output_folder, exist_ok=True)
 
     results = []
 
-    # Split into fixed segments (e.g., 5 seconds each)
-    for i, start in enumerate(range(0, int(duration), 5)):
-        end = min(start + 5, duration)
-        segment_audio = audio[start * 1000:end * 1000]
+    # Speech regions (capped at a few seconds each) instead of fixed windows over silence
+    regions = speech_regions(waveform, TARGET_SAMPLE_RATE, max_segment_s=max_segment_s)
+    model = get_speaker_model()
+    pending = []
+    for i, (start, end) in enumerate(regions):
+        segment = waveform[int(start * TARGET_SAMPLE_RATE):int(end * TARGET_SAMPLE_RATE)]
         segment_path = os.path.join(output_folder, f"segment_{i + 1}.wav")
-        segment_audio.export(segment_path, format="wav")
+        torchaudio.save(segment_path, torch.from_numpy(segment).unsqueeze(0), TARGET_SAMPLE_RATE)
+
+        # Queue verification and transcription; the scheduler batches segments together
+        pending.append((scheduler.submit("ecapa", (model, segment)), scheduler.submit("whisper", segment)))
 
+    for embedding, transcript in pending:
         # Verify speaker identity
-        speaker = verify_speaker(segment_path)
+        speaker = match_shashvat(embedding.result())
 
         # Transcribe speech
-        language, text = v2t(segment_path)
+        language, text = transcript.result()
 
-         # Yield result immediately
         results.append(f"[{speaker}]: {text}")
 
-
     return results
-
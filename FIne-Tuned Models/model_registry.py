@@ -0,0 +1,162 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import torch
+
+# RAM budget for all loaded models, in MB (unset = no limit)
+MODEL_BUDGET_MB = float(os.getenv("MEMOIR_MODEL_BUDGET_MB", "0")) or None
+
+ECAPA_LOCAL_DIR = "./models/spkrec-ecapa-voxceleb"
+
+
+def model_bytes(model):
+    """
+    Parameter + buffer bytes of a loaded model. Understands torch modules, SpeechBrain
+    wrappers (.mods), Hugging Face pipelines (.model) and pyannote pipelines (module attributes).
+    """
+    if isinstance(model, torch.nn.Module):
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    for attr in ("mods", "model"):
+        inner = getattr(model, attr, None)
+        if isinstance(inner, torch.nn.Module):
+            return model_bytes(inner)
+    seen = set()
+    total = 0
+    for value in vars(model).values() if hasattr(model, "__dict__") else ():
+        if isinstance(value, torch.nn.Module) and id(value) not in seen:
+            seen.add(id(value))
+            total += model_bytes(value)
+    return total
+
+
+class ModelRegistry:
+    """
+    One place that owns every heavy model in the pipeline.
+
+    Models are registered by name with a loader and only loaded on the first `get`.
+    Everything that needs the same weights asks for the same name, so they are loaded
+    once. When loading a model would exceed the RAM budget, the least recently used
+    models are unloaded first (they load again transparently on their next `get`).
+    Call `get` at the point of use rather than keeping the model around, or an evicted
+    model stays alive through the caller's reference.
+    """
+
+    def __init__(self, budget_mb=MODEL_BUDGET_MB):
+        self.budget_bytes = budget_mb * 1024 * 1024 if budget_mb else None
+        self.loaders = {}
+        self.size_hints = {}
+        self.models = OrderedDict()  # name -> model, least recently used first
+        self.info = {}               # name -> load stats
+        self._lock = threading.RLock()
+        self._load_locks = {}
+
+    def register(self, name, loader, size_hint_mb=None):
+        """Register how to load a model. Registering a name twice keeps the first loader."""
+        with self._lock:
+            if name not in self.loaders:
+                self.loaders[name] = loader
+                self.size_hints[name] = size_hint_mb
+                self._load_locks[name] = threading.Lock()
+                self.info[name] = {"loads": 0, "hits": 0, "load_s": None, "size_mb": size_hint_mb}
+
+    def get(self, name):
+        """Return the model, loading it (and evicting others to fit the budget) if needed."""
+        with self._lock:
+            if name in self.models:
+                self.models.move_to_end(name)
+                self.info[name]["hits"] += 1
+                return self.models[name]
+            if name not in self.loaders:
+                raise KeyError(f"Unknown model: {name}")
+            load_lock = self._load_locks[name]
+
+        # Load outside the registry lock so other models stay usable meanwhile,
+        # but only once per name even if several threads ask at the same time.
+        with load_lock:
+            with self._lock:
+                if name in self.models:
+                    self.models.move_to_end(name)
+                    return self.models[name]
+                hint = self.size_hints[name]
+                if hint:
+                    self._make_room(hint * 1024 * 1024)
+
+            print(f"Loading model '{name}'...")
+            started = time.perf_counter()
+            model = self.loaders[name]()
+            elapsed = time.perf_counter() - started
+            size = model_bytes(model) or (hint or 0) * 1024 * 1024
+
+            with self._lock:
+                self._make_room(size, exclude=name)
+                self.models[name] = model
+                self.info[name].update(
+                    loads=self.info[name]["loads"] + 1,
+                    load_s=round(elapsed, 2),
+                    size_mb=round(size / 1024 / 1024, 1),
+                    loaded_at=time.time(),
+                )
+            print(f"Loaded model '{name}' in {elapsed:.1f}s ({size / 1024 / 1024:.0f} MB)")
+            return model
+
+    def unload(self, name):
+        with self._lock:
+            if self.models.pop(name, None) is not None:
+                print(f"Unloaded model '{name}'")
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def loaded_bytes(self):
+        with self._lock:
+            return sum(self.info[name]["size_mb"] * 1024 * 1024 for name in self.models)
+
+    def _make_room(self, needed, exclude=None):
+        if self.budget_bytes is None:
+            return
+        while self.models and self.loaded_bytes() + needed > self.budget_bytes:
+            victim = next((n for n in self.models if n != exclude), None)
+            if victim is None:
+                break
+            self.unload(victim)
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(info, loaded=name in self.models) for name, info in self.info.items()}
+
+    def report(self):
+        budget = f"{self.budget_bytes / 1024 / 1024:.0f} MB" if self.budget_bytes else "unlimited"
+        print(f"Models: {self.loaded_bytes() / 1024 / 1024:.0f} MB loaded, budget {budget}")
+        for name, info in self.stats().items():
+            state = "loaded" if info["loaded"] else "not loaded"
+            print(f"  {name}: {state}, {info['size_mb']} MB, load {info['load_s']}s, "
+                  f"{info['loads']} loads, {info['hits']} hits")
+
+
+registry = ModelRegistry()
+
+
+def _load_ecapa():
+    # SpeakerRecognition subclasses EncoderClassifier, so one instance serves both
+    # verification and plain embedding extraction.
+    from speechbrain.inference import SpeakerRecognition
+
+    run_opts = {"device": "cuda" if torch.cuda.is_available() else "cpu"}
+    if os.path.isdir(ECAPA_LOCAL_DIR):
+        return SpeakerRecognition.from_hparams(source=ECAPA_LOCAL_DIR, savedir=ECAPA_LOCAL_DIR, run_opts=run_opts)
+    return SpeakerRecognition.from_hparams(source="speechbrain/spkrec-ecapa-voxceleb", savedir="tmp_model",
+                                           run_opts=run_opts)
+
+
+def _load_diarization():
+    from pyannote.audio.pipelines.speaker_diarization import SpeakerDiarization
+
+    return SpeakerDiarization.from_pretrained("pyannote/speaker-diarization")
+
+
+registry.register("ecapa", _load_ecapa, size_hint_mb=85)
+registry.register("diarization", _load_diarization, size_hint_mb=120)
@@ -0,0 +1,140 @@
+import os
+import json
+import pickle
+import numpy as np
+
+
+class SpeakerStore:
+    """
+    Speaker voiceprints kept as a memory-mapped float32 matrix plus a small JSON name index.
+
+    Layout of the store directory:
+        vectors.f32  - raw float32 rows, `capacity` x `dim`, grown in place by doubling
+        index.json   - {"dim", "capacity", "rows": {name: row}, "free": [row, ...]}
+
+    The index is the commit point: a row is written and flushed first, then the index is
+    replaced atomically (write temp file + os.replace). A crash in between leaves the
+    previous index, which never points at a half-written row. Removal only drops the
+    name from the index and puts the row on the free list, so both append and remove
+    are O(1). Loading reads the index only; vectors are paged in on access.
+    """
+
+    INDEX_NAME = "index.json"
+    VECTORS_NAME = "vectors.f32"
+
+    def __init__(self, store_dir="speaker_store", dim=192, initial_capacity=64):
+        self.store_dir = store_dir
+        self.index_path = os.path.join(store_dir, self.INDEX_NAME)
+        self.vectors_path = os.path.join(store_dir, self.VECTORS_NAME)
+        os.makedirs(store_dir, exist_ok=True)
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        else:
+            index = {"dim": dim, "capacity": 0, "rows": {}, "free": []}
+
+        self.dim = int(index["dim"])
+        self.capacity = int(index["capacity"])
+        self.rows = {name: int(row) for name, row in index["rows"].items()}
+        self.free = [int(row) for row in index["free"]]
+        self.initial_capacity = initial_capacity
+        self._vectors = None
+
+    # ---------- Internals ----------
+    def _map(self):
+        """Memory-map the vector file on first use."""
+        if self._vectors is None and self.capacity:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                      shape=(self.capacity, self.dim))
+        return self._vectors
+
+    def _grow(self):
+        """Double the capacity of the vector file in place and queue the new rows as free."""
+        new_capacity = max(self.initial_capacity, self.capacity * 2)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        # Keep the free list ordered so the lowest rows are reused first.
+        self.free.extend(range(new_capacity - 1, self.capacity - 1, -1))
+        self.capacity = new_capacity
+
+    def _write_index(self):
+        """Atomically replace index.json with the current state."""
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": self.dim,
+                "capacity": self.capacity,
+                "rows": self.rows,
+                "free": self.free,
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    # ---------- Public API ----------
+    def __contains__(self, name):
+        return name in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def names(self):
+        """Return the names of all stored speakers."""
+        return list(self.rows.keys())
+
+    def get(self, name):
+        """Return a copy of one speaker's embedding, or None if unknown."""
+        row = self.rows.get(name)
+        if row is None:
+            return None
+        return np.array(self._map()[row])
+
+    def put(self, name, embedding):
+        """Add or replace a speaker embedding."""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Expected a {self.dim}-d embedding, got {vector.shape[0]}")
+
+        # Replacing writes into a fresh row so the old vector stays valid until the index flips.
+        old_row = self.rows.get(name)
+        if not self.free:
+            self._grow()
+        row = self.free.pop()
+
+        vectors = self._map()
+        vectors[row] = vector
+        vectors.flush()
+
+        self.rows[name] = row
+        if old_row is not None:
+            self.free.append(old_row)
+        self._write_index()
+
+    def remove(self, name):
+        """Remove a speaker. Returns False if the name is not stored."""
+        row = self.rows.pop(name, None)
+        if row is None:
+            return False
+        self.free.append(row)
+        self._write_index()
+        return True
+
+    def matrix(self):
+        """Return (names, float32 matrix) of all stored speakers for vectorized matching."""
+        names = list(self.rows.keys())
+        if not names:
+            return names, np.zeros((0, self.dim), dtype=np.float32)
+        rows = [self.rows[name] for name in names]
+        return names, np.asarray(self._map()[rows])
+
+    def import_pickle(self, pickle_path):
+        """One-time migration from the old {name: embedding} pickle database."""
+        with open(pickle_path, "rb") as f:
+            legacy = pickle.load(f)
+        for name, embedding in legacy.items():
+            self.put(name, embedding)
+        return len(legacy)
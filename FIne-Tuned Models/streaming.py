@@ -0,0 +1,146 @@
+import queue
+import threading
+
+import numpy as np
+import torch
+import torchaudio
+
+from vad import SpeechSegmenter
+
+# Whisper and ECAPA both expect 16 kHz mono.
+MODEL_SAMPLE_RATE = 16000
+
+
+def block_to_float(block, channels=1):
+    """Convert a recorder block (raw int16 bytes or an int16/float array) to mono float32 in [-1, 1]."""
+    if isinstance(block, (bytes, bytearray)):
+        samples = np.frombuffer(block, dtype=np.int16).reshape(-1, channels)
+    else:
+        samples = np.asarray(block)
+    if samples.dtype == np.int16:
+        samples = samples.astype(np.float32) / 32768.0
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    return samples.astype(np.float32, copy=False)
+
+
+def resample(audio, from_rate, to_rate=MODEL_SAMPLE_RATE):
+    """Resample a finished segment once (not block by block, which would click at boundaries)."""
+    if from_rate == to_rate:
+        return audio
+    tensor = torchaudio.functional.resample(torch.from_numpy(audio), from_rate, to_rate)
+    return tensor.numpy()
+
+
+class OnlineSpeakerAssigner:
+    """
+    Labels segments with enrolled speaker names, and groups everyone else into
+    "Speaker 1", "Speaker 2", ... by comparing against running centroids of earlier unknown segments.
+    """
+
+    def __init__(self, embed_fn, match_fn, threshold=0.75):
+        self.embed_fn = embed_fn
+        self.match_fn = match_fn
+        self.threshold = threshold
+        self.centroids = []
+        self.counts = []
+
+    def __call__(self, audio):
+        embedding = self.embed_fn(audio)
+        name = self.match_fn(embedding)
+        if name != "Unknown":
+            return name
+
+        unit = embedding / (np.linalg.norm(embedding) + 1e-12)
+        if self.centroids:
+            centroids = np.stack(self.centroids)
+            similarities = centroids @ unit / (np.linalg.norm(centroids, axis=1) + 1e-12)
+            best = int(np.argmax(similarities))
+            if similarities[best] > self.threshold:
+                self.counts[best] += 1
+                self.centroids[best] += (unit - self.centroids[best]) / self.counts[best]
+                return f"Speaker {best + 1}"
+
+        self.centroids.append(unit.copy())
+        self.counts.append(1)
+        return f"Speaker {len(self.centroids)}"
+
+
+class StreamingTranscriber:
+    """
+    Consumes audio blocks while a conversation is being recorded and emits transcript turns.
+
+    `feed` is cheap and safe to call from an audio callback: it only converts and enqueues.
+    A worker thread runs VAD segmentation, speaker assignment and ASR on each finished
+    segment, so a turn is emitted at most `end_silence_ms` after the speaker pauses (or
+    every `max_segment_s` during a monologue) plus model time. Turns use the same dict
+    shape as ConversationProcessor.diarize_and_process, so format_conversation works on them.
+    """
+
+    def __init__(self, identify_fn, transcribe_fn, input_rate=16000, channels=1, on_turn=None,
+                 end_silence_ms=600, max_segment_s=15.0, max_pending_blocks=4096):
+        self.identify_fn = identify_fn
+        self.transcribe_fn = transcribe_fn
+        self.input_rate = input_rate
+        self.channels = channels
+        self.on_turn = on_turn
+        self.segmenter = SpeechSegmenter(input_rate, end_silence_ms=end_silence_ms, max_segment_s=max_segment_s)
+
+        self.turns = []
+        self.dropped_blocks = 0
+        self._blocks = queue.Queue(maxsize=max_pending_blocks)
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def feed(self, block):
+        """Queue one block of captured audio. Never blocks the caller."""
+        try:
+            self._blocks.put_nowait(block_to_float(block, self.channels))
+        except queue.Full:
+            self.dropped_blocks += 1
+
+    def close(self, timeout=None):
+        """Flush the last open segment, wait for the worker and return all turns."""
+        self._blocks.put(None)
+        self._worker.join(timeout)
+        return self.turns
+
+    def _run(self):
+        while True:
+            samples = self._blocks.get()
+            if samples is None:
+                segments = self.segmenter.flush()
+            else:
+                segments = self.segmenter.push(samples)
+
+            for start_time, end_time, audio in segments:
+                self._emit(start_time, end_time, audio)
+
+            if samples is None:
+                break
+
+    def _emit(self, start_time, end_time, audio):
+        audio = resample(audio, self.input_rate)
+        try:
+            speaker = self.identify_fn(audio)
+        except Exception as e:
+            print(f"Error identifying speaker: {e}")
+            speaker = "Unknown"
+        try:
+            language, text = self.transcribe_fn(audio)
+            text = text.strip() if text else "[No speech detected]"
+        except Exception as e:
+            print(f"Error transcribing segment: {e}")
+            language, text = "Unknown", "[Transcription failed]"
+
+        turn = {
+            'start_time': start_time,
+            'end_time': end_time,
+            'speaker': speaker,
+            'original_speaker': speaker,
+            'text': text,
+            'language': language,
+        }
+        self.turns.append(turn)
+        if self.on_turn:
+            self.on_turn(turn)
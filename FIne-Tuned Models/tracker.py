@@ -0,0 +1,108 @@
+import time
+from itertools import count
+
+
+def iou(a, b):
+    """Intersection-over-union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def centroid_distance(a, b):
+    """Centroid distance between two boxes, relative to the size of box `a`."""
+    ay, ax = (a[0] + a[2]) / 2, (a[1] + a[3]) / 2
+    by, bx = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+    size = max(a[2] - a[0], a[1] - a[3], 1)
+    return ((ay - by) ** 2 + (ax - bx) ** 2) ** 0.5 / size
+
+
+class Track:
+    """One face followed across frames, with the identity from its last encoding."""
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.name = "Unknown"
+        self.confidence = 0.0
+        self.encoded_at = None
+        self.last_seen = now
+        self.missed = 0
+
+    def identity_confidence(self, now, half_life):
+        """Confidence of the cached identity, halving every `half_life` seconds since it was encoded."""
+        if self.encoded_at is None:
+            return 0.0
+        return self.confidence * 0.5 ** ((now - self.encoded_at) / half_life)
+
+
+class FaceTracker:
+    """
+    Associates detections between frames (greedy IoU, with a centroid fallback for fast moves)
+    so the expensive 128-d encoding only runs when a track is new or its cached identity has
+    decayed below `min_confidence`. Unknown faces are retried every `retry_unknown` seconds.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_centroid_shift=0.5, max_missed=5,
+                 half_life=10.0, min_confidence=0.3, retry_unknown=2.0):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_shift = max_centroid_shift
+        self.max_missed = max_missed
+        self.half_life = half_life
+        self.min_confidence = min_confidence
+        self.retry_unknown = retry_unknown
+        self.tracks = []
+        self._ids = count(1)
+
+    def update(self, boxes, now=None):
+        """Assign detections to tracks. Returns the tracks matched to `boxes`, in the same order."""
+        now = time.time() if now is None else now
+
+        pairs = []
+        for ti, track in enumerate(self.tracks):
+            for bi, box in enumerate(boxes):
+                overlap = iou(track.box, box)
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, ti, bi))
+                elif centroid_distance(track.box, box) <= self.max_centroid_shift:
+                    pairs.append((0.0, ti, bi))
+        pairs.sort(reverse=True)
+
+        assigned = [None] * len(boxes)
+        used_tracks = set()
+        for _, ti, bi in pairs:
+            if ti in used_tracks or assigned[bi] is not None:
+                continue
+            track = self.tracks[ti]
+            track.box, track.last_seen, track.missed = boxes[bi], now, 0
+            assigned[bi] = track
+            used_tracks.add(ti)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in used_tracks:
+                track.missed += 1
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+
+        for bi, box in enumerate(boxes):
+            if assigned[bi] is None:
+                assigned[bi] = Track(next(self._ids), box, now)
+                self.tracks.append(assigned[bi])
+        return assigned
+
+    def needs_encoding(self, track, now=None):
+        """True when the track has never been encoded or its cached identity is no longer trusted."""
+        now = time.time() if now is None else now
+        if track.encoded_at is None:
+            return True
+        if track.name == "Unknown":
+            return now - track.encoded_at >= self.retry_unknown
+        return track.identity_confidence(now, self.half_life) < self.min_confidence
+
+    def set_identity(self, track, name, confidence, now=None):
+        track.name = name
+        track.confidence = float(confidence)
+        track.encoded_at = time.time() if now is None else now
@@ -0,0 +1,215 @@
+from collections import deque
+
+import numpy as np
+
+try:
+    import webrtcvad
+except ImportError:  # optional: fall back to the energy detector
+    webrtcvad = None
+
+
+class EnergyVAD:
+    """
+    Frame-level voice activity detector based on short-term energy.
+
+    A frame counts as speech when its level (dBFS) is `margin_db` above the noise floor
+    and above `min_db`. The floor is the quietest frame of the last `floor_window_s`
+    seconds (minimum statistics), so it drops as soon as the room gets quieter and rises
+    within one window when the background gets louder: the pauses between words keep it
+    low during speech, while steady noise lifts it and stops counting as speech.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, margin_db=10.0, min_db=-50.0, floor_window_s=3.0):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.window_frames = max(1, int(floor_window_s * 1000 / frame_ms))
+        self.noise_db = None
+        self._levels = deque()  # (frame index, level), levels increasing: front is the window minimum
+        self._frame_index = 0
+
+    def is_speech(self, frame):
+        """Classify one frame of float32 samples in [-1, 1]."""
+        rms = np.sqrt(np.mean(np.square(frame, dtype=np.float64)) + 1e-12)
+        level_db = 20 * np.log10(rms)
+
+        while self._levels and self._levels[-1][1] >= level_db:
+            self._levels.pop()
+        self._levels.append((self._frame_index, level_db))
+        while self._levels[0][0] <= self._frame_index - self.window_frames:
+            self._levels.popleft()
+        self._frame_index += 1
+
+        self.noise_db = self._levels[0][1]
+        return bool(level_db > max(self.noise_db + self.margin_db, self.min_db))
+
+
+class WebRTCVAD:
+    """
+    Same interface as EnergyVAD, backed by the WebRTC GMM detector (pip install webrtcvad).
+    Only 8/16/32/48 kHz and 10/20/30 ms frames are supported by WebRTC.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, aggressiveness=2):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self._vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame):
+        pcm = (np.clip(frame, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+        return self._vad.is_speech(pcm, self.sample_rate)
+
+
+def make_vad(sample_rate=16000, backend="auto", **options):
+    """Pick WebRTC when it is installed and supports the rate, otherwise the energy detector."""
+    if backend == "energy" or webrtcvad is None or sample_rate not in (8000, 16000, 32000, 48000):
+        if backend == "webrtc":
+            raise RuntimeError(f"webrtcvad unavailable for {sample_rate} Hz audio")
+        return EnergyVAD(sample_rate, **options)
+    return WebRTCVAD(sample_rate, **options)
+
+
+class SpeechSegmenter:
+    """
+    Turns a stream of samples into speech segments, one `push` at a time.
+
+    A segment opens on the first speech frame (plus `preroll_ms` of audio before it),
+    stays open across pauses shorter than `end_silence_ms`, and closes after a longer
+    pause or once it reaches `max_segment_s` (which bounds latency for long monologues).
+    Segments shorter than `min_speech_ms` are dropped as clicks/noise, except the remainder
+    of an utterance that was just split at `max_segment_s`.
+    """
+
+    def __init__(self, sample_rate=16000, vad=None, end_silence_ms=600, min_speech_ms=300,
+                 max_segment_s=15.0, preroll_ms=200):
+        self.sample_rate = sample_rate
+        self.vad = vad or make_vad(sample_rate)
+        self.frame_len = self.vad.frame_len
+        self.end_silence_frames = max(1, int(end_silence_ms / self.vad.frame_ms))
+        self.min_speech_frames = max(1, int(min_speech_ms / self.vad.frame_ms))
+        self.max_segment_frames = int(max_segment_s * 1000 / self.vad.frame_ms)
+
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._preroll = deque(maxlen=max(0, int(preroll_ms / self.vad.frame_ms)))
+        self._frames = []
+        self._start = 0
+        self._speech_frames = 0
+        self._silence_run = 0
+        self._position = 0  # samples consumed so far
+        self._continues = False  # the next segment picks up an utterance split at max_segment_s
+        self._gap = 0  # silent frames since the last segment closed
+
+    def push(self, samples):
+        """Feed mono float32 samples. Returns a list of finished (start_s, end_s, audio) segments."""
+        samples = np.concatenate([self._remainder, np.asarray(samples, dtype=np.float32)])
+        n_frames = len(samples) // self.frame_len
+        self._remainder = samples[n_frames * self.frame_len:]
+
+        finished = []
+        for i in range(n_frames):
+            frame = samples[i * self.frame_len:(i + 1) * self.frame_len]
+            segment = self._step(frame, self.vad.is_speech(frame))
+            if segment:
+                finished.append(segment)
+            self._position += self.frame_len
+        return finished
+
+    def flush(self):
+        """Close whatever segment is open (e.g. when recording stops)."""
+        segment = self._close(trim=self._silence_run)
+        return [segment] if segment else []
+
+    def _step(self, frame, speech):
+        if not self._frames:
+            if speech:
+                self._frames = list(self._preroll) + [frame]
+                self._start = self._position - len(self._preroll) * self.frame_len
+                self._speech_frames = 1
+                self._silence_run = 0
+                self._preroll.clear()
+            else:
+                self._preroll.append(frame)
+                self._gap += 1
+                if self._gap >= self.end_silence_frames:
+                    self._continues = False  # the split utterance ended after all
+            return None
+
+        self._frames.append(frame)
+        if speech:
+            self._speech_frames += 1
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+
+        if self._silence_run >= self.end_silence_frames:
+            return self._close(trim=self._silence_run)
+        if len(self._frames) >= self.max_segment_frames:
+            return self._close(trim=0, capped=True)
+        return None
+
+    def _close(self, trim, capped=False):
+        frames, start, speech_frames = self._frames, self._start, self._speech_frames
+        continues, self._continues, self._gap = self._continues, capped, 0
+        self._frames, self._speech_frames, self._silence_run = [], 0, 0
+        if not frames or (speech_frames < self.min_speech_frames and not continues):
+            return None
+        # Drop trailing silence so the segment ends where speech ended.
+        audio = np.concatenate(frames[:len(frames) - trim] if trim else frames)
+        return start / self.sample_rate, (start + len(audio)) / self.sample_rate, audio
+
+
+def speech_regions(waveform, sample_rate=16000, vad=None, **segmenter_options):
+    """
+    Run the segmenter over a whole waveform and return [(start_s, end_s), ...] of speech.
+    Used as a pre-filter so verification, diarization and ASR never see silent stretches.
+    """
+    segmenter = SpeechSegmenter(sample_rate, vad=vad, **segmenter_options)
+    segments = segmenter.push(np.asarray(waveform, dtype=np.float32))
+    segments += segmenter.flush()
+    return [(start, end) for start, end, _ in segments]
+
+
+class SpeechMap:
+    """
+    A waveform with the non-speech removed, plus the mapping back to original timestamps.
+    Models run on `compact`; their timestamps go through `to_original`.
+    """
+
+    def __init__(self, waveform, sample_rate, regions):
+        self.sample_rate = sample_rate
+        self.regions = regions
+        pieces, self._compact_starts = [], []
+        offset = 0.0
+        for start, end in regions:
+            pieces.append(waveform[int(start * sample_rate):int(end * sample_rate)])
+            self._compact_starts.append(offset)
+            offset += len(pieces[-1]) / sample_rate
+        self.compact = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+        self.duration = offset
+
+    def to_original(self, t, end=False):
+        """
+        Map a time in the compact waveform back to the original recording.
+        With end=True a time exactly on a seam maps to the end of the earlier region
+        (use it for the end of a span) instead of the start of the next one.
+        """
+        i = max(0, int(np.searchsorted(self._compact_starts, t, side="left" if end else "right")) - 1)
+        if not self.regions:
+            return t
+        return self.regions[i][0] + (t - self._compact_starts[i])
+
+    def original_spans(self, start, end):
+        """
+        The compact span [start, end) as [(start_s, end_s), ...] in the original recording,
+        split wherever it crosses removed silence.
+        """
+        spans = []
+        for (region_start, region_end), offset in zip(self.regions, self._compact_starts):
+            lo = max(start, offset)
+            hi = min(end, offset + (region_end - region_start))
+            if hi > lo:
+                spans.append((region_start + lo - offset, region_start + hi - offset))
+        return spans
@@ -3,22 +3,46 @@ import nltk
 from nltk.tokenize import sent_tokenize
 import torch
 
+from batching import scheduler
+from model_registry import registry
+
 # Download necessary NLTK data for better sentence tokenization
 try:
     nltk.data.find('tokenizers/punkt')
 except LookupError:
     nltk.download('punkt')
 
-# Check if GPU is available and set device accordingly
-device = 0 if torch.cuda.is_available() else -1
-print(f"Using device: {'GPU' if device == 0 else 'CPU'}")
 
-# Initialize summarization pipeline with better model and parameters
-summarizer = pipeline(
-    "summarization",
-    model="facebook/bart-large-cnn",  # Better model for summarization
-    device=device
-)
+def _load_summarizer():
+    # Check if GPU is available and set device accordingly
+    device = 0 if torch.cuda.is_available() else -1
+    print(f"Using device: {'GPU' if device == 0 else 'CPU'}")
+
+    # Initialize summarization pipeline with better model and parameters
+    return pipeline(
+        "summarization",
+        model="facebook/bart-large-cnn",  # Better model for summarization
+        device=device
+    )
+
+
+registry.register("bart-large-cnn", _load_summarizer, size_hint_mb=1600)
+
+
+def _summarize_batch(items):
+    # Items are (chunk, generation params); chunks with the same params share one pipeline call.
+    results = [None] * len(items)
+    groups = {}
+    for i, (_, params) in enumerate(items):
+        groups.setdefault(params, []).append(i)
+    for params, indices in groups.items():
+        outputs = registry.get("bart-large-cnn")([items[i][0] for i in indices], batch_size=len(indices), **dict(params))
+        for i, output in zip(indices, outputs):
+            results[i] = output['summary_text']
+    return results
+
+
+scheduler.register("bart", _summarize_batch, max_batch=8, max_wait_ms=20)
 
 
 # Function to split text into meaningful chunks by sentences
@@ -53,27 +77,26 @@ def summarize_conversation(text, min_length=30, max_length=150):
     # Split conversation into chunks
     chunks = chunk_text(text, max_chunk_size=1000)
 
-    # Summarize each chunk with appropriate parameters
-    chunk_summaries = []
-    for i, chunk in enumerate(chunks):
-        print(f"Summarizing chunk {i + 1}/{len(chunks)}...")
-
+    # Summarize all chunks through the batching scheduler with appropriate parameters
+    requests = []
+    for chunk in chunks:
         # Adjust summary length based on chunk size
         chunk_min_length = min(min_length, max(20, len(chunk) // 15))
         chunk_max_length = min(max_length, max(50, len(chunk) // 5))
 
         # Generate summary with more appropriate parameters
-        summary = summarizer(
-            chunk,
-            max_length=chunk_max_length,
-            min_length=chunk_min_length,
-            do_sample=True,
-            temperature=0.7,  # Add some variation
-            top_p=0.9,  # Filter unlikely tokens
-            num_beams=4  # Use beam search for better quality
-        )[0]['summary_text']
-
-        chunk_summaries.append(summary)
+        params = (
+            ("max_length", chunk_max_length),
+            ("min_length", chunk_min_length),
+            ("do_sample", True),
+            ("temperature", 0.7),  # Add some variation
+            ("top_p", 0.9),  # Filter unlikely tokens
+            ("num_beams", 4),  # Use beam search for better quality
+        )
+        requests.append((chunk, params))
+
+    print(f"Summarizing {len(chunks)} chunks...")
+    chunk_summaries = scheduler.map("bart", requests)
 
     return chunk_summaries
 
@@ -40,6 +40,28 @@ def create_app(test_config=None):
     app.register_blueprint(glasses_bp, url_prefix="/glasses")
     app.register_blueprint(memory_bank_bp, url_prefix="/memory_bank")
 
+    from .services.enrollment import enroll_gallery_command
+    app.cli.add_command(enroll_gallery_command)
+
+    from .services.search import search_reindex_command
+    app.cli.add_command(search_reindex_command)
+
+    from .services.recall import recall_reindex_command
+    app.cli.add_command(recall_reindex_command)
+
+    from .services.recap import recap_rebuild_command
+    app.cli.add_command(recap_rebuild_command)
+
+    from .services.unknowns import cluster_unknowns_command
+    app.cli.add_command(cluster_unknowns_command)
+
+    from .services.photos import photos_build_command
+    app.cli.add_command(photos_build_command)
+
+    from .services.assets import init_assets, assets_build_command
+    init_assets(app)
+    app.cli.add_command(assets_build_command)
+
     # Example log lines
     @app.before_request
     def log_request():
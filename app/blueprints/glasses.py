@@ -2,12 +2,12 @@ from flask import request  # add this
 import json                # add this
 from flask import Blueprint, render_template, jsonify, abort
 from flask import url_for, current_app
-import os
-from sqlalchemy import func
 from app.models import Person, Conversation, Embedding  # add Embedding
 
 from flask import request, jsonify
-from datetime import datetime
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
 from app import db
 from app.models import Conversation, TranscriptTurn
 
@@ -16,29 +16,19 @@ from app import db
 
 
 from app.logger import log
+from app.services.recognition import (
+    MODALITY_FACE, MODALITY_VOICE, MODALITY_DEFAULTS, upsert_embedding, resolve_person, is_valid_vector,
+)
+from app.services.batching import Overloaded
+from app.services.face_api import DLIB_PROVIDER, DLIB_THRESHOLD, get_face_batcher, reset_face_batcher
+from app.services.recall import recall
+from app.services.recap import get_recap
+from app.services.profile_cache import get_profile_cache
+from app.services.unknowns import record_sighting
+from app.services.photos import photo_url_for_person
 
 bp = Blueprint("glasses", __name__, template_folder="../templates")
 
-def photo_url_for_person(person: Person) -> str:
-    """
-    Build a display URL for a person's photo:
-    1) If person.photo_filename exists, use static/people/<filename>
-    2) Else try ID-based file like people/<id>.(png|jpg|jpeg|webp)
-    3) Else use default silhouette
-    """
-    if getattr(person, "photo_filename", None):
-        return url_for("static", filename=f"people/{person.photo_filename}")
-
-    static_root = os.path.join(current_app.root_path, "static")
-    for ext in ("png", "jpg", "jpeg", "webp"):
-        rel = os.path.join("people", f"{person.id}.{ext}")
-        if os.path.exists(os.path.join(static_root, rel)):
-            return url_for("static", filename=f"people/{person.id}.{ext}")
-
-    return url_for("static", filename="people/default_silhouette.png")
-
-
-
 @bp.route("/")
 def home():
     log.info("Glasses home route accessed")
@@ -52,40 +42,48 @@ def sidebar_home():
 @bp.get("/api/people")
 def api_people():
     """
-    Returns a list of people with their latest 'last_met_at' (latest conversation start time).
+    Returns a list of people with their latest 'last_met_at' (latest conversation start time),
+    read from each person's materialized recap card.
     """
-    # subquery: latest conversation started_at per person
-    last_met_subq = (
-        db.session.query(
-            Conversation.person_id.label("pid"),
-            func.max(Conversation.started_at).label("last_met_at"),
-        )
-        .group_by(Conversation.person_id)
-        .subquery()
-    )
-
-    # Pull Person objects + last_met_at so we can build photo URLs
-    rows = (
-        db.session.query(Person, last_met_subq.c.last_met_at)
-        .outerjoin(last_met_subq, last_met_subq.c.pid == Person.id)
-        .order_by(Person.display_name.asc())
-        .all()
-    )
+    people = db.session.query(Person).order_by(Person.display_name.asc()).all()
 
     out = []
-    for person, last_met_at in rows:
+    for person in people:
+        recap = get_recap(person)
         out.append({
             "id": person.id,
             "display_name": person.display_name,
             "relation": person.relation,
-            "photo_url": photo_url_for_person(person),  # ✅ real URL
+            "photo_url": photo_url_for_person(person, size="thumb"),  # ✅ real URL
             "is_unknown": bool(person.is_unknown),
             "last_summary_cached": person.last_summary_cached,
-            "last_met_at": last_met_at.isoformat() if last_met_at else None,
+            "last_met_at": recap["last_met_at"],
         })
     return jsonify(out)
 
 
+def _person_profile(person_id: int):
+    person: Person | None = db.session.get(Person, person_id)
+    if not person:
+        return None
+    recap = get_recap(person)
+    return {
+        "id": person.id,
+        "display_name": person.display_name,
+        "relation": person.relation,
+        "photo_url": photo_url_for_person(person),  # ✅ real URL
+        "is_unknown": bool(person.is_unknown),
+        "last_summary_cached": person.last_summary_cached,  # may be None
+        "last_met_at": recap["last_met_at"],
+        "latest_conversation": recap["latest_conversation"],  # may be None
+        "recap": {
+            "conversation_count": recap["conversation_count"],
+            "topics": recap["topics"],
+            "bullets": recap["bullets"],
+        },
+    }
+
+
 @bp.get("/api/people/<int:person_id>")
 def api_person(person_id: int):
     """
@@ -93,40 +91,14 @@ def api_person(person_id: int):
     - last_met_at (latest conversation started_at)
     - latest_conversation (id, started_at, ended_at, has_summary)
     - last_summary_cached (bullets text, if any)
+    - recap (conversation_count, topics, bullets)
+    Everything comes from the person row (see services/recap.py), and the serialized body is
+    cached until that person changes (services/profile_cache.py).
     """
-    # base person
-    person: Person | None = db.session.get(Person, person_id)
-    if not person:
+    body = get_profile_cache().get(person_id, _person_profile)
+    if body is None:
         abort(404, description="Person not found")
-
-    # latest conversation for this person
-    latest_conv: Conversation | None = (
-        db.session.query(Conversation)
-        .filter(Conversation.person_id == person.id)
-        .order_by(Conversation.started_at.desc())
-        .first()
-    )
-
-    last_met_at = latest_conv.started_at if latest_conv else None
-    latest_conv_obj = None
-    if latest_conv:
-        latest_conv_obj = {
-            "id": latest_conv.id,
-            "started_at": latest_conv.started_at.isoformat(),
-            "ended_at": latest_conv.ended_at.isoformat() if latest_conv.ended_at else None,
-            "has_summary": bool(latest_conv.summary),
-        }
-
-    return jsonify({
-        "id": person.id,
-        "display_name": person.display_name,
-        "relation": person.relation,
-        "photo_url": photo_url_for_person(person),  # ✅ real URL
-        "is_unknown": bool(person.is_unknown),
-        "last_summary_cached": person.last_summary_cached,  # may be None
-        "last_met_at": last_met_at.isoformat() if last_met_at else None,
-        "latest_conversation": latest_conv_obj,             # may be None
-    })
+    return current_app.response_class(body, mimetype="application/json")
 
 
 def _bad(msg, code=400):
@@ -143,10 +115,28 @@ def api_face_enroll():
         "provider": "local"   # optional; defaults to "local"
       }
     """
+    return _enroll(MODALITY_FACE)
+
+
+@bp.post("/api/voice/enroll")
+def api_voice_enroll():
+    """
+    Save/replace one voiceprint for a person (provider='ecapa').
+    Body JSON:
+      {
+        "person_id": 123,
+        "vector": [ ... 192 floats from the ECAPA speaker encoder ... ],
+        "provider": "ecapa"   # optional; defaults to "ecapa"
+      }
+    """
+    return _enroll(MODALITY_VOICE)
+
+
+def _enroll(modality):
     data = request.get_json(force=True, silent=True) or {}
     person_id = data.get("person_id")
     vector = data.get("vector")
-    provider = data.get("provider", "local")
+    provider = data.get("provider", MODALITY_DEFAULTS[modality]["provider"])
 
     if not isinstance(person_id, int):
         return _bad("person_id_required")
@@ -158,32 +148,29 @@ def api_face_enroll():
         return _bad("person_not_found", 404)
 
     # upsert one embedding per (person, provider)
-    emb = (
-        db.session.query(Embedding)
-        .filter(Embedding.person_id == person_id, Embedding.provider == provider)
-        .first()
-    )
-    vec_json = json.dumps(vector)
-    if emb:
-        emb.vector_json = vec_json
-        emb.dim = len(vector)
-    else:
-        emb = Embedding(
-            person_id=person_id,
-            provider=provider,
-            vector_json=vec_json,
-            dim=len(vector),
-        )
-        db.session.add(emb)
-
+    emb = upsert_embedding(person_id, vector, provider, modality)
     db.session.commit()
     return jsonify({"ok": True, "embedding_id": emb.id})
 
 
-import math
+def _person_match_json(person: Person) -> dict:
+    return {
+        "id": person.id,
+        "display_name": person.display_name,
+        "relation": person.relation,
+        "photo_url": photo_url_for_person(person),  # ✅ real URL
+        "is_unknown": bool(person.is_unknown),
+    }
+
+
+def _matched_person(res: dict, face_vector, face_provider) -> Person:
+    """The matched person; a face match on an unknown profile is recorded as a sighting of it."""
+    person = db.session.get(Person, res["person_id"])
+    if person.is_unknown and face_vector is not None and MODALITY_FACE in res["distances"]:
+        record_sighting(face_vector, provider=face_provider, person=person,
+                        distance=res["distances"][MODALITY_FACE])
+    return person
 
-def l2(a, b):
-    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
 
 @bp.post("/api/face/recognize")
 def api_face_recognize():
@@ -192,57 +179,193 @@ def api_face_recognize():
     provider = data.get("provider", "local")
     if not isinstance(vector, list) or not vector:
         return jsonify({"ok": False, "error": "vector_required"}), 400
-
-    rows = db.session.query(Embedding).filter(Embedding.provider == provider).all()
-    if not rows:
-        return jsonify({"ok": True, "match": False, "reason": "no_enrollments"})
-
-    best, best_d = None, 999.0
-    for r in rows:
-        cand = json.loads(r.vector_json)
-        d = l2(vector, cand)
-        if d < best_d:
-            best_d, best = d, r
+    if not is_valid_vector(vector, MODALITY_FACE):
+        return _bad("bad_vector")
 
     THRESH = float(data.get("threshold", 0.58))
-    if best and best_d <= THRESH:
-        person = db.session.get(Person, best.person_id)
+    # Known contacts only: an unmatched face goes to /api/unknown/ensure, which clusters it
+    # with earlier unknown sightings at a tighter distance
+    res = resolve_person(face_vector=vector, face_provider=provider, face_threshold=THRESH,
+                         include_unknown=False)
+    if "reason" in res:
+        return jsonify({"ok": True, "match": False, "reason": res["reason"]})
+
+    best_d = res["distances"][MODALITY_FACE]
+    if res["match"]:
+        person = db.session.get(Person, res["person_id"])
         return jsonify({
             "ok": True,
             "match": True,
-            "distance": round(best_d, 4),
-            "person": {
-                "id": person.id,
-                "display_name": person.display_name,
-                "relation": person.relation,
-                "photo_url": photo_url_for_person(person),  # ✅ real URL
-            }
+            "distance": best_d,
+            "person": _person_match_json(person),
         })
 
     else:
-        return jsonify({"ok": True, "match": False, "distance": round(best_d, 4)})
+        return jsonify({"ok": True, "match": False, "distance": best_d})
 
 
-@bp.post("/api/unknown/ensure")
-def api_unknown_ensure():
+@bp.post("/api/face/describe")
+def api_face_describe():
     """
-    Return the most recently created unknown profile, or create a fresh one if none exist.
-    Avoids hardcoding an UNKNOWN_ID.
+    Server-side descriptor for a JPEG face crop, for clients too slow to run face-api.js.
+    Body: multipart field "image", or the raw JPEG bytes (Content-Type: image/jpeg).
+    Query: ?recognize=0 to skip matching; ?threshold=0.6 to override the dlib distance threshold;
+    ?crop=1 when the image is already a face box (encoded as a face even if detection misses it).
+    Concurrent uploads are coalesced into one batched call to the encoding workers.
     """
-    # newest unknown if any
-    unk = (
-        db.session.query(Person)
-        .filter(Person.is_unknown == True)
-        .order_by(Person.created_at.desc())
-        .first()
+    upload = request.files.get("image")
+    data = upload.read() if upload else request.get_data()
+    if not data:
+        return _bad("image_required")
+
+    try:
+        result = get_face_batcher()((data, request.args.get("crop") == "1"))
+    except (Overloaded, FutureTimeout):
+        return _bad("busy", 503)
+    except BrokenProcessPool as e:  # a worker died; it is a RuntimeError, but not a missing backend
+        log.error(f"Face encoding workers crashed: {e}")
+        reset_face_batcher()
+        return _bad("busy", 503)
+    except RuntimeError as e:  # face_recognition is not installed on this server
+        log.warning(f"Server-side face encoding unavailable: {e}")
+        return _bad("server_encoding_unavailable", 501)
+
+    if result.get("error"):
+        return _bad("bad_image")
+    if result["encoding"] is None:
+        return jsonify({"ok": True, "face": False})
+
+    out = {
+        "ok": True,
+        "face": True,
+        "provider": DLIB_PROVIDER,
+        "descriptor": result["encoding"],
+        "box": result["box"],
+        "quality": {"size": result["size"], "sharpness": result["sharpness"]},
+    }
+    if request.args.get("recognize", "1") != "0":
+        res = resolve_person(face_vector=result["encoding"], face_provider=DLIB_PROVIDER,
+                             face_threshold=request.args.get("threshold", DLIB_THRESHOLD, type=float))
+        out["match"] = bool(res["match"])
+        if "reason" in res:
+            out["reason"] = res["reason"]
+        else:
+            out["distance"] = res["distances"][MODALITY_FACE]
+            if res["match"]:
+                out["person"] = _person_match_json(_matched_person(res, result["encoding"], DLIB_PROVIDER))
+    return jsonify(out)
+
+
+def _parse_date(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+@bp.get("/api/recall")
+def api_recall():
+    """
+    Semantic lookup over past conversations ("what did we say about the pharmacy?").
+    Query: ?q=...&person_id=3&since=2025-01-01&until=2025-02-01 (or &days=30)&k=5
+    Returns the k most similar transcript windows / summaries, best first.
+    """
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return _bad("q_required")
+    try:
+        since = _parse_date(request.args.get("since"))
+        until = _parse_date(request.args.get("until"))
+    except ValueError:
+        return _bad("bad_date")
+    days = request.args.get("days", type=int)
+    if days and since is None:
+        since = datetime.utcnow() - timedelta(days=days)
+    k = max(1, min(request.args.get("k", 5, type=int), 50))
+
+    hits = recall(q, person_id=request.args.get("person_id", type=int), since=since, until=until, k=k)
+    return jsonify({"ok": True, "q": q, "hits": hits})
+
+
+@bp.post("/api/identify")
+def api_identify():
+    """
+    Resolve a person from a face descriptor, a voiceprint, or both in one call.
+    Body JSON:
+      {
+        "face_vector": [ ... ],        # optional
+        "voice_vector": [ ... ],       # optional
+        "face_provider": "local",      # optional
+        "voice_provider": "ecapa",     # optional
+        "face_threshold": 0.58,        # optional
+        "voice_threshold": 0.25        # optional (cosine distance)
+      }
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    face_vector = data.get("face_vector")
+    voice_vector = data.get("voice_vector")
+    for v, modality in ((face_vector, MODALITY_FACE), (voice_vector, MODALITY_VOICE)):
+        if v is not None and not is_valid_vector(v, modality):
+            return _bad("bad_vector")
+    if face_vector is None and voice_vector is None:
+        return _bad("vector_required")
+
+    thresholds = {}
+    for key in ("face_threshold", "voice_threshold"):
+        if data.get(key) is None:
+            thresholds[key] = None
+            continue
+        try:
+            thresholds[key] = float(data[key])
+        except (TypeError, ValueError):
+            return _bad("bad_threshold")
+        if not 0 < thresholds[key] < float("inf"):  # also rejects NaN
+            return _bad("bad_threshold")
+
+    res = resolve_person(
+        face_vector=face_vector,
+        voice_vector=voice_vector,
+        face_provider=data.get("face_provider"),
+        voice_provider=data.get("voice_provider"),
+        **thresholds,
     )
+    if "reason" in res:
+        return jsonify({"ok": True, "match": False, "reason": res["reason"]})
 
-    if not unk:
-        # uses the model helper from your codebase
-        unk = Person.make_unknown()
-        db.session.add(unk)
-        db.session.commit()
+    out = {"ok": True, "match": res["match"], "score": res["score"], "distances": res["distances"]}
+    if res["match"]:
+        out["person"] = _person_match_json(_matched_person(res, face_vector, data.get("face_provider")))
+    return jsonify(out)
+
+
+@bp.post("/api/unknown/ensure")
+def api_unknown_ensure():
+    """
+    Return the unknown profile for the face in front of the wearer.
+    Body (optional): {"vector": [...], "provider": "local"} - the unrecognized descriptor is
+    clustered with earlier sightings, so the same stranger keeps the same unknown profile and
+    a new face gets a new one. Without a vector, falls back to the newest unknown (or a new one).
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    vector = data.get("vector")
+    created, distance = False, None
+    if vector is not None:
+        if not is_valid_vector(vector, MODALITY_FACE):
+            return _bad("bad_vector")
+        res = record_sighting(vector, provider=data.get("provider"))
+        unk, created, distance = res["person"], res["created"], res["distance"]
+    else:
+        # newest unknown if any
+        unk = (
+            db.session.query(Person)
+            .filter(Person.is_unknown == True)
+            .order_by(Person.created_at.desc())
+            .first()
+        )
 
+        if not unk:
+            # uses the model helper from your codebase
+            unk = Person.make_unknown()
+            db.session.add(unk)
+            db.session.commit()
+            created = True
 
     return jsonify({
         "id": unk.id,
@@ -250,6 +373,8 @@ def api_unknown_ensure():
         "relation": unk.relation,
         "photo_url": photo_url_for_person(unk),
         "is_unknown": True,
+        "created": created,
+        "distance": distance,
     })
 
 @bp.post("/api/conversations/start")
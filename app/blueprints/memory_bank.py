@@ -1,68 +1,17 @@
 # app/blueprints/memory_bank.py
-from flask import Blueprint, render_template, request, redirect, url_for, abort, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, abort, flash, current_app, jsonify
+from flask import Response, stream_with_context
 from app.logger import log
+from app.services.search import search as search_index, group_hits
+from app.services.history import conversation_page, turn_page, iter_turns
+from app.services.merge import MergeError, merge_people
+from app.services.unknowns import merge_proposals
+from app.services.photos import DEFAULT_PHOTO, photo_url_for_person, save_person_photo
 from ..models import db, Person, Conversation, TranscriptTurn
-import os
-from sqlalchemy import update
 from werkzeug.utils import secure_filename
 
 bp = Blueprint("memory_bank", __name__, template_folder="../templates")
 
-ALLOWED_EXTS = {"png", "jpg", "jpeg", "webp"}
-
-def allowed_file(filename: str) -> bool:
-    # Split once from the right; index 1 is always the extension when a dot exists
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in {"png", "jpg", "jpeg", "webp"}
-
-# app/blueprints/memory_bank.py (function stays near the top with helpers)
-
-def save_person_photo(file_storage, desired_stem: str = "") -> str:
-    """
-    Save uploaded image in static/people and return just the stored filename (e.g., 'ravi.png').
-    Ensures uniqueness if a file with the same name already exists.
-    """
-    if not file_storage or file_storage.filename == "":
-        return ""
-    if not allowed_file(file_storage.filename):
-        return ""
-
-    # CORRECT indices: [1] for extension, [0] for base name
-    ext = file_storage.filename.rsplit(".", 1)[1].lower()                      # [web:279]
-    base = secure_filename(desired_stem or file_storage.filename.rsplit(".", 1)[0])  # [web:279]
-    if not base:
-        base = "photo"
-
-    candidate = f"{base}.{ext}"
-    folder = current_app.config.get("UPLOAD_FOLDER") or os.path.join(current_app.root_path, "static", "people")
-    os.makedirs(folder, exist_ok=True)
-    path = os.path.join(folder, candidate)
-
-    i = 1
-    while os.path.exists(path):
-        candidate = f"{base}-{i}.{ext}"
-        path = os.path.join(folder, candidate)
-        i += 1
-
-    file_storage.save(path)                                                    # [web:279]
-    return candidate
-
-
-def photo_url_for_person(person: Person) -> str:
-    """
-    Build a display URL for a person's photo:
-    1) If person.photo_filename exists, use static/people/<filename>
-    2) Else try ID-based file like people/<id>.png|.jpg|.jpeg|.webp
-    3) Else use default silhouette
-    """
-    if getattr(person, "photo_filename", None):
-        return url_for("static", filename=f"people/{person.photo_filename}")  # [4]
-    static_root = os.path.join(current_app.root_path, "static")
-    for ext in ("png", "jpg", "jpeg", "webp"):
-        rel = os.path.join("people", f"{person.id}.{ext}")
-        if os.path.exists(os.path.join(static_root, rel)):
-            return url_for("static", filename=f"people/{person.id}.{ext}")  # [4]
-    return url_for("static", filename="people/default_silhouette.png")  # [4]
-
 @bp.get("/")
 def home():
     people = (
@@ -85,18 +34,40 @@ def home():
 
     return render_template("memory_bank/home.html", people_cards=people_cards, unknown_cards=unknown_cards)
 
+@bp.get("/search")
+def search():
+    q = (request.args.get("q") or "").strip()
+    person_id = request.args.get("person_id", type=int)
+    groups = group_hits(search_index(q, person_id=person_id)) if q else []
+    person = db.session.get(Person, person_id) if person_id else None
+    return render_template("memory_bank/search.html", q=q, groups=groups, scope_person=person)
+
+
+@bp.get("/api/search")
+def api_search():
+    """
+    Full-text search over transcript lines, conversation summaries and person notes.
+    Query: ?q=pharmacy&person_id=3&limit=50 ; hits are bm25-ranked, snippets are HTML with <mark>.
+    """
+    q = (request.args.get("q") or "").strip()
+    person_id = request.args.get("person_id", type=int)
+    limit = min(request.args.get("limit", 50, type=int), 200)
+    hits = search_index(q, person_id=person_id, limit=limit) if q else []
+    for hit in hits:
+        hit["snippet"] = str(hit["snippet"])
+        for key in ("started_at", "timestamp"):
+            hit[key] = hit[key].isoformat() if hit[key] else None
+    return jsonify({"q": q, "hits": hits})
+
+
 @bp.get("/person/<int:person_id>")
 def person(person_id):
     person = Person.query.get_or_404(person_id)
-    conversations = (
-        Conversation.query
-        .filter_by(person_id=person.id)
-        .order_by(Conversation.started_at.desc())
-        .limit(20)
-        .all()
-    )
-    photo_url = photo_url_for_person(person)
-    return render_template("memory_bank/person.html", person=person, conversations=conversations, photo_url=photo_url)
+    before = request.args.get("before")
+    conversations, next_cursor = conversation_page(person.id, before=before)
+    photo_url = photo_url_for_person(person, size="full")
+    return render_template("memory_bank/person.html", person=person, conversations=conversations, photo_url=photo_url,
+                           next_cursor=next_cursor, paged=bool(before))
 
 @bp.post("/person/<int:person_id>/update")
 def person_update(person_id):
@@ -187,14 +158,16 @@ def unknowns():
         .order_by(Person.created_at.desc())
         .all()
     )
-    return render_template("memory_bank/unknowns.html", unknowns=rows)
-
-@bp.get("/conversation/<int:conversation_id>")
-def conversation(conversation_id):
-    conv = Conversation.query.get_or_404(conversation_id)
-    turns = conv.turns
-    person = conv.person
+    knowns = (
+        Person.query
+        .filter_by(is_unknown=False)
+        .order_by(Person.display_name.asc())
+        .all()
+    )
+    proposals = merge_proposals()
+    return render_template("memory_bank/unknowns.html", unknowns=rows, knowns=knowns, proposals=proposals)
 
+def _speaker_labeler(person):
     # The “person” here is the contact whose profile this conversation belongs to.
     # Treat that contact as the Visitor in UI, and the wearer/user as “User”.
     visitor_name = person.display_name if person else "Visitor"
@@ -206,14 +179,61 @@ def conversation(conversation_id):
         if speaker == "VISITOR":
             return visitor_name
         return speaker  # fallback
-    
-    photo_url = photo_url_for_person(person) if person else url_for("static", filename="people/default_silhouette.png")
+    return ui_speaker_label
+
+
+@bp.get("/conversation/<int:conversation_id>")
+def conversation(conversation_id):
+    conv = Conversation.query.get_or_404(conversation_id)
+    person = conv.person
+    # Only the first page of the transcript is rendered; the rest is fetched as the user scrolls
+    turns, next_cursor = turn_page(conv.id)
+
+    photo_url = photo_url_for_person(person, size="full") if person else url_for("static", filename=DEFAULT_PHOTO)
     return render_template("memory_bank/conversation.html", 
                            conversation=conv, 
                            turns=turns, 
+                           next_cursor=next_cursor,
                            person=person, 
                            photo_url=photo_url, 
-                           ui_speaker_label=ui_speaker_label,
+                           ui_speaker_label=_speaker_labeler(person),
+    )
+
+
+@bp.get("/api/conversation/<int:conversation_id>/turns")
+def api_conversation_turns(conversation_id):
+    """
+    Next page of a transcript for incremental loading.
+    Query: ?after=<cursor from the previous page>&limit=200 ; "next" is null on the last page.
+    """
+    conv = Conversation.query.get_or_404(conversation_id)
+    limit = max(1, min(request.args.get("limit", 200, type=int), 1000))
+    rows, next_cursor = turn_page(conv.id, after=request.args.get("after"), limit=limit)
+    label = _speaker_labeler(conv.person)
+    return jsonify({
+        "turns": [
+            {"id": r.id, "speaker": label(r.speaker), "text": r.text,
+             "timestamp": r.timestamp.strftime("%Y-%m-%d %H:%M:%S")}
+            for r in rows
+        ],
+        "next": next_cursor,
+    })
+
+
+@bp.get("/conversation/<int:conversation_id>/transcript.txt")
+def conversation_transcript(conversation_id):
+    """The full transcript as plain text, streamed while rows are read from the database."""
+    conv = Conversation.query.get_or_404(conversation_id)
+    label = _speaker_labeler(conv.person)
+
+    def lines():
+        for r in iter_turns(conv.id):
+            yield f"[{r.timestamp:%Y-%m-%d %H:%M:%S}] {label(r.speaker)}: {r.text}\n"
+
+    return Response(
+        stream_with_context(lines()),
+        mimetype="text/plain",
+        headers={"Content-Disposition": f"inline; filename=conversation-{conv.id}.txt"},
     )
 
 @bp.post("/conversation/<int:conversation_id>/delete")
@@ -270,17 +290,53 @@ def merge_apply(unknown_id):
         return redirect(url_for("memory_bank.merge_pick", unknown_id=unknown.id))
 
     keep_photo = bool(request.form.get("keep_photo"))
-
-    db.session.execute(
-        update(Conversation).where(Conversation.person_id == unknown.id).values(person_id=known.id)
-    )
-
-    if not keep_photo and unknown.photo_filename:
-        known.photo_filename = unknown.photo_filename
-
-    db.session.delete(unknown)
-    db.session.commit()
+    try:
+        merge_people(known.id, [unknown.id], keep_photo=keep_photo)
+    except MergeError as e:
+        flash(f"Merge failed: {e}", "error")
+        return redirect(url_for("memory_bank.merge_pick", unknown_id=unknown.id))
     flash("Merged unknown profile into known contact successfully.", "success")
     return redirect(url_for("memory_bank.person", person_id=known.id))
 
 
+@bp.post("/merge/proposal")
+def merge_proposal_apply():
+    """Accept one suggested merge from the unknowns page (target may be another unknown)."""
+    source = Person.query.get_or_404(request.form.get("source_id", 0, type=int))
+    target = Person.query.get_or_404(request.form.get("target_id", 0, type=int))
+    if not source.is_unknown or source.id == target.id:
+        flash("Only unknown profiles can be merged.", "error")
+        return redirect(url_for("memory_bank.unknowns"))
+    message = f"Merged {source.display_name} into {target.display_name}."
+    try:
+        merge_people(target.id, [source.id])
+    except MergeError as e:
+        flash(f"Merge failed: {e}", "error")
+        return redirect(url_for("memory_bank.unknowns"))
+    flash(message, "success")
+    if target.is_unknown:
+        return redirect(url_for("memory_bank.unknowns"))
+    return redirect(url_for("memory_bank.person", person_id=target.id))
+
+
+@bp.post("/merge/bulk")
+def merge_bulk():
+    """Merge every selected unknown profile into one known contact in one transaction."""
+    unknown_ids = request.form.getlist("unknown_ids", type=int)
+    known = db.session.get(Person, request.form.get("known_id", 0, type=int))
+    if known is None or known.is_unknown:
+        flash("Select a known contact to merge into.", "error")
+        return redirect(url_for("memory_bank.unknowns"))
+    unknowns = Person.query.filter(Person.id.in_(unknown_ids), Person.is_unknown == True).all()
+    if not unknowns:
+        flash("Select at least one unknown profile.", "error")
+        return redirect(url_for("memory_bank.unknowns"))
+
+    try:
+        report = merge_people(known.id, [u.id for u in unknowns], keep_photo=True)
+    except MergeError as e:
+        flash(f"Merge failed: {e}", "error")
+        return redirect(url_for("memory_bank.unknowns"))
+    flash(f"Merged {len(report['merged'])} unknown profiles into {known.display_name} "
+          f"({report['conversations']} conversations).", "success")
+    return redirect(url_for("memory_bank.person", person_id=known.id))
@@ -25,6 +25,7 @@ class Person(db.Model, TimestampMixin):
     temp_tag = db.Column(db.String(64), unique=True)                   # "unknown_<uuid8>" for merge flows
     notes = db.Column(db.Text)                                         # freeform notes for the person
     last_summary_cached = db.Column(db.Text)                           # latest recap bullets for fast sidebar
+    recap_json = db.Column(db.Text)                                    # materialized recap card (services/recap.py)
 
     # Relationships
     conversations = db.relationship(
@@ -41,6 +42,12 @@ class Person(db.Model, TimestampMixin):
         passive_deletes=True,
     )
 
+    sightings = db.relationship(
+        "UnknownSighting",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
     __table_args__ = (
         Index("ix_people_unknown_temp_tag", "is_unknown", "temp_tag"),
     )
@@ -130,10 +137,11 @@ class TranscriptTurn(db.Model, TimestampMixin):
     )
 
 
-# ---------- Optional: generic embedding store (future-proofing) ----------
+# ---------- Biometric embeddings (face + voice) ----------
 class Embedding(db.Model, TimestampMixin):
     """
-    Provider-agnostic face embedding storage to enable switching to server-side matching later.
+    Provider-agnostic embedding storage for every modality we recognize people by.
+    Faces (face-api.js descriptors) and voiceprints (ECAPA speaker embeddings) both hang off Person.
     """
     __tablename__ = "embeddings"
 
@@ -146,11 +154,67 @@ class Embedding(db.Model, TimestampMixin):
     )
 
     provider = db.Column(db.String(80), nullable=False)      # 'azure_face', 'aws_rekognition', 'local', etc.
+    modality = db.Column(db.String(16), default="face", nullable=False)  # 'face' or 'voice'
     vector_json = db.Column(db.Text, nullable=False)         # JSON list or opaque provider blob
     dim = db.Column(db.Integer)                              # optional dimension hint
+    samples = db.Column(db.Integer, default=1, nullable=False)  # how many shots were averaged into vector_json
 
     person = db.relationship("Person", back_populates="embeddings")
 
     __table_args__ = (
         UniqueConstraint("person_id", "provider", name="uq_embeddings_person_provider"),
+        Index("ix_embeddings_modality_provider", "modality", "provider"),
+    )
+
+
+# ---------- Unknown faces: individual sightings ----------
+class UnknownSighting(db.Model):
+    """
+    One face descriptor captured while the person in front of the wearer was not recognized.
+    Sightings are clustered into unknown profiles (services/unknowns.py); the profile's
+    Embedding is the running mean of its sightings.
+    """
+    __tablename__ = "unknown_sightings"
+
+    id = db.Column(db.Integer, primary_key=True)
+    person_id = db.Column(
+        db.Integer,
+        db.ForeignKey("people.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    provider = db.Column(db.String(80), nullable=False)
+    vector_json = db.Column(db.Text, nullable=False)
+    distance = db.Column(db.Float)                            # to the cluster centroid when assigned
+    seen_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+# ---------- Semantic recall: embedded transcript/summary chunks ----------
+class RecallChunk(db.Model):
+    """
+    A few consecutive transcript lines (or a conversation summary) with a compact
+    sentence embedding, used for "what did we talk about ..." similarity lookups.
+    Rebuilt from the conversation whenever it changes (only the open tail window when
+    turns are appended); never edited by hand.
+    """
+    __tablename__ = "recall_chunks"
+
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(
+        db.Integer,
+        db.ForeignKey("conversations.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    kind = db.Column(db.String(16), nullable=False)          # 'turns' or 'summary'
+    text = db.Column(db.Text, nullable=False)
+    at = db.Column(db.DateTime, nullable=False)               # first turn time / conversation start
+    first_turn_id = db.Column(db.Integer)                     # first turn of a 'turns' window
+    model = db.Column(db.String(80), nullable=False)          # embedder that produced `vector`
+    vector = db.Column(db.LargeBinary, nullable=False)        # float16, L2-normalized
+
+    __table_args__ = (
+        Index("ix_recall_chunks_model_at", "model", "at"),
     )
@@ -0,0 +1,199 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import stat
+import threading
+
+import click
+from flask import abort, current_app, request, send_file
+from flask.cli import with_appcontext
+from werkzeug.security import safe_join
+
+from app.logger import log
+
+try:
+    import brotli  # optional: .br variants are only built when it is installed
+except ImportError:
+    brotli = None
+
+# Static files are served with a content fingerprint (?v=<hash>) added by url_for. A request
+# carrying the current fingerprint can be cached forever; anything else must revalidate (ETag).
+# `flask assets-build` writes .br/.gz next to compressible files; they are served when the
+# client accepts them and no byte range was asked for. Plain files keep Range support.
+# A .webp with a .jpg sibling (the photo variants) is answered with the JPEG when the
+# client's Accept header does not list image/webp, so URLs (and cached bodies holding them)
+# never depend on the client.
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+FACE_MODELS_DIR = "face-models"
+COMPRESSIBLE_EXTS = {".js", ".css", ".json", ".svg", ".txt", ".html", ".map"}
+MIN_COMPRESS_BYTES = 1024
+MIN_SAVING = 0.1          # keep a compressed variant only if it is at least 10% smaller
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+IMAGE_FALLBACKS = {".webp": ".jpg"}
+
+_fingerprints = {}        # abs path -> (mtime_ns, size, fingerprint)
+_fingerprint_lock = threading.Lock()
+
+
+def fingerprint(path: str):
+    """Short content hash of a file (cached until it changes on disk), or None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):  # never hash devices, fifos or directories
+        return None
+    with _fingerprint_lock:
+        cached = _fingerprints.get(path)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    fp = h.hexdigest()[:12]
+    with _fingerprint_lock:
+        _fingerprints[path] = (st.st_mtime_ns, st.st_size, fp)
+    return fp
+
+
+def _is_compressible(path: str) -> bool:
+    ext = os.path.splitext(path)[1].lower()
+    # face-api.js weight shards have no extension and are the largest downloads
+    return ext in COMPRESSIBLE_EXTS or (ext == "" and "-shard" in os.path.basename(path))
+
+
+def _precompressed(path: str):
+    """(encoding, path) of the best fresh precompressed variant the client accepts, or (None, path)."""
+    if request.range is not None or not _is_compressible(path):
+        return None, path
+    source_mtime = os.stat(path).st_mtime_ns
+    for encoding, suffix in ENCODINGS:
+        candidate = path + suffix
+        if request.accept_encodings[encoding] and os.path.isfile(candidate) \
+                and os.stat(candidate).st_mtime_ns >= source_mtime:
+            return encoding, candidate
+    return None, path
+
+
+def _image_fallback(path: str):
+    """(negotiated, path): the sibling in an older format when the client can't take this one."""
+    root, ext = os.path.splitext(path)
+    fallback = IMAGE_FALLBACKS.get(ext.lower())
+    if fallback is None or not os.path.isfile(root + fallback):
+        return False, path
+    # Browsers that decode WebP name it explicitly; */* alone is not taken as support
+    if "image/webp" in request.accept_mimetypes.values():
+        return True, path
+    return True, root + fallback
+
+
+def send_asset(folder: str, filename: str, immutable: bool):
+    path = safe_join(folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    negotiated, path = _image_fallback(path)
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    encoding, served = _precompressed(path)
+
+    # conditional=True gives ETag/If-None-Match and Range/206 handling
+    resp = send_file(served, mimetype=mimetype, conditional=True, etag=True, max_age=None)
+    resp.headers["Cache-Control"] = IMMUTABLE if immutable else REVALIDATE
+    if _is_compressible(path):
+        resp.vary.add("Accept-Encoding")
+    if negotiated:
+        resp.vary.add("Accept")
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    return resp
+
+
+def face_models_version(static_folder: str) -> str:
+    """One fingerprint for the whole face-models directory (manifests and shards load together)."""
+    folder = os.path.join(static_folder, FACE_MODELS_DIR)
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(folder)) if os.path.isdir(folder) else ():
+        if name.endswith((".gz", ".br")):
+            continue
+        h.update(f"{name}:{fingerprint(os.path.join(folder, name))};".encode())
+    return h.hexdigest()[:12]
+
+
+def init_assets(app):
+    """Fingerprinted static URLs, cache headers, precompressed delivery and versioned face models."""
+
+    @app.url_defaults
+    def _fingerprint_static_urls(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            path = safe_join(app.static_folder, values["filename"])
+            fp = fingerprint(path) if path and os.path.isfile(path) else None
+            if fp:
+                values["v"] = fp
+
+    def static(filename):
+        # Resolve (and reject traversal) before anything is opened, hashed or cached
+        path = safe_join(app.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        v = request.args.get("v")
+        return send_asset(app.static_folder, filename, immutable=bool(v) and v == fingerprint(path))
+
+    app.view_functions["static"] = static
+
+    # face-api.js resolves shard URLs relative to the manifest, so the version goes in the path
+    @app.get("/models/<version>/<path:filename>")
+    def face_models(version, filename):
+        folder = os.path.join(app.static_folder, FACE_MODELS_DIR)
+        return send_asset(folder, filename, immutable=version == face_models_version(app.static_folder))
+
+    @app.context_processor
+    def _face_models_url():
+        return {"face_models_url": lambda: f"{request.script_root}/models/{face_models_version(app.static_folder)}"}
+
+
+def build_precompressed(static_folder: str) -> dict:
+    """Write .gz (and .br when available) next to every compressible static file that benefits."""
+    report = {"files": 0, "written": 0, "skipped": 0, "bytes_in": 0, "bytes_out": 0}
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith((".gz", ".br", ".part")) or not _is_compressible(path):
+                continue
+            size = os.path.getsize(path)
+            if size < MIN_COMPRESS_BYTES:
+                continue
+            report["files"] += 1
+            with open(path, "rb") as f:
+                data = f.read()
+            variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants[".br"] = brotli.compress(data, quality=11)
+            for suffix, blob in variants.items():
+                target = path + suffix
+                if len(blob) > size * (1 - MIN_SAVING):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    report["skipped"] += 1
+                    continue
+                with open(target + ".part", "wb") as f:
+                    f.write(blob)
+                os.replace(target + ".part", target)
+                report["written"] += 1
+                report["bytes_in"] += size
+                report["bytes_out"] += len(blob)
+    return report
+
+
+@click.command("assets-build")
+@with_appcontext
+def assets_build_command():
+    """Precompress static assets (gzip, plus brotli if installed) for faster overlay boot."""
+    report = build_precompressed(current_app.static_folder)
+    if brotli is None:
+        log.warning("brotli is not installed; only .gz variants were written")
+    saved = report["bytes_in"] - report["bytes_out"]
+    click.echo(f"Precompressed {report['written']} variants of {report['files']} files "
+               f"({saved / 1024:.0f} KB saved), skipped {report['skipped']} that did not shrink.")
@@ -0,0 +1,108 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from app.logger import log
+
+
+class Overloaded(RuntimeError):
+    """Raised when a batcher's queue is full; callers should answer 503 rather than pile up."""
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into batched calls of `batch_fn`.
+
+    A worker thread takes the first waiting item, then keeps collecting until it has
+    `max_batch` items or `max_wait_ms` has passed, and calls `batch_fn(items)` once;
+    `batch_fn` must return one result per item, in order. The queue is bounded, so a
+    burst beyond `max_queue` waiting items is rejected with Overloaded instead of
+    growing latency without limit.
+    """
+
+    def __init__(self, batch_fn: Callable, max_batch: int = 8, max_wait_ms: float = 10.0,
+                 max_queue: int = 64, name: str = "batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item, block_timeout: float = 0.0) -> Future:
+        """Queue one item; the returned future resolves with its result."""
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed")
+        future = Future()
+        try:
+            if block_timeout:
+                self._queue.put((item, future), timeout=block_timeout)
+            else:
+                self._queue.put_nowait((item, future))
+        except queue.Full:
+            self.rejected += 1
+            raise Overloaded(f"{self.name} queue is full")
+        return future
+
+    def __call__(self, item, timeout: Optional[float] = 30.0):
+        """Submit and wait for the result."""
+        return self.submit(item).result(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+            "rejected": self.rejected,
+        }
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)  # finish this batch, then stop
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                log.error(f"{self.name}: batch of {len(items)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self.batches += 1
+            self.items += len(items)
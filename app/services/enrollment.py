@@ -0,0 +1,205 @@
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import click
+import numpy as np
+from flask.cli import with_appcontext
+from sqlalchemy import func
+
+from app import db
+from app.models import Embedding, Person
+from app.logger import log
+from app.services.face_api import DLIB_PROVIDER, encode_image_file, passes_quality
+from app.services.recognition import MODALITY_FACE
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+DUPLICATE_DISTANCE = 0.06  # burst frames closer than this add nothing but weight
+OUTLIER_DISTANCE = 0.6     # further than this from the person's median is probably someone else
+
+
+def walk_gallery(root: str) -> dict:
+    """{person_name: [image paths]} for a gallery laid out as root/<name>/*.jpg (dataset.capture_image_burst)."""
+    gallery = {}
+    for name in sorted(os.listdir(root)):
+        folder = os.path.join(root, name)
+        if not os.path.isdir(folder) or name.startswith("."):
+            continue
+        paths = [
+            os.path.join(folder, f) for f in sorted(os.listdir(folder))
+            if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS
+        ]
+        if paths:
+            gallery[name] = paths
+    return gallery
+
+
+def select_encodings(results, dup_distance: float = DUPLICATE_DISTANCE,
+                     outlier_distance: float = OUTLIER_DISTANCE):
+    """
+    Keep one person's usable shots: drop failed/low-quality images, then outliers far from
+    the median descriptor, then near-duplicates of an already kept shot.
+    Returns (kept encodings as an (n, 128) array, Counter of rejection reasons).
+    """
+    rejected = Counter()
+    good = []
+    for result in results:
+        reason = passes_quality(result)
+        if reason:
+            rejected[reason] += 1
+        else:
+            good.append(result)
+
+    if not good:
+        return np.zeros((0, 128), dtype=np.float32), rejected
+
+    # Sharpest first, so duplicates resolve in favour of the better shot
+    good.sort(key=lambda r: r["sharpness"], reverse=True)
+    encodings = np.stack([r["encoding"] for r in good])
+
+    if len(encodings) >= 3:
+        median = np.median(encodings, axis=0)
+        inliers = np.linalg.norm(encodings - median, axis=1) <= outlier_distance
+        if not inliers.all():
+            rejected["outlier"] += int((~inliers).sum())
+        encodings = encodings[inliers]
+
+    kept = []
+    for encoding in encodings:
+        if kept and np.linalg.norm(np.asarray(kept) - encoding, axis=1).min() < dup_distance:
+            rejected["duplicate"] += 1
+            continue
+        kept.append(encoding)
+    return np.asarray(kept, dtype=np.float32).reshape(-1, 128), rejected
+
+
+def _people_by_name(names, create_missing: bool) -> dict:
+    """Map gallery folder names to Person rows (case-insensitive), creating missing ones if asked."""
+    lowered = {name.lower(): name for name in names}
+    people = {}
+    rows = (
+        db.session.query(Person)
+        .filter(func.lower(Person.display_name).in_(list(lowered)))
+        .order_by(Person.id.asc())
+        .all()
+    )
+    for person in rows:
+        people.setdefault(lowered[person.display_name.lower()], person)
+
+    for name in names:
+        if name not in people and create_missing:
+            people[name] = Person(display_name=name)
+            db.session.add(people[name])
+    db.session.flush()
+    return people
+
+
+def bulk_upsert_embeddings(vectors: dict, provider: str, modality: str) -> int:
+    """
+    Upsert {person_id: (vector, samples)} with one SELECT for the existing rows.
+    Caller commits (so the whole enrollment is one transaction).
+    """
+    existing = {
+        emb.person_id: emb
+        for emb in db.session.query(Embedding)
+        .filter(Embedding.provider == provider, Embedding.person_id.in_(list(vectors)))
+    }
+    for person_id, (vector, samples) in vectors.items():
+        emb = existing.get(person_id)
+        if emb is None:
+            emb = Embedding(person_id=person_id, provider=provider)
+            db.session.add(emb)
+        emb.modality = modality
+        emb.vector_json = json.dumps([round(float(x), 6) for x in vector])
+        emb.dim = len(vector)
+        emb.samples = samples
+    return len(vectors)
+
+
+def enroll_gallery(root: str, workers: Optional[int] = None, provider: str = DLIB_PROVIDER,
+                   create_missing: bool = True, dry_run: bool = False) -> dict:
+    """
+    Encode every image in a gallery across a process pool and enroll one averaged
+    descriptor per person. Returns a report with per-person counts and per-worker throughput.
+    """
+    gallery = walk_gallery(root)
+    paths = [path for person_paths in gallery.values() for path in person_paths]
+    owner = {path: name for name, person_paths in gallery.items() for path in person_paths}
+    if not paths:
+        return {"images": 0, "people": {}, "workers": {}, "seconds": 0.0}
+
+    started = time.perf_counter()
+    by_person = defaultdict(list)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 4))
+        for result in pool.map(encode_image_file, paths, chunksize=chunksize):
+            by_person[owner[result["path"]]].append(result)
+    wall = time.perf_counter() - started
+
+    per_worker = defaultdict(lambda: {"images": 0, "seconds": 0.0})
+    for results in by_person.values():
+        for result in results:
+            stats = per_worker[result["worker"]]
+            stats["images"] += 1
+            stats["seconds"] += result["seconds"]
+    for stats in per_worker.values():
+        stats["images_per_s"] = round(stats["images"] / stats["seconds"], 2) if stats["seconds"] else 0.0
+        stats["seconds"] = round(stats["seconds"], 2)
+
+    report_people = {}
+    selected = {}
+    for name, results in by_person.items():
+        kept, rejected = select_encodings(results)
+        report_people[name] = {"images": len(results), "kept": len(kept), "rejected": dict(rejected)}
+        if len(kept):
+            selected[name] = kept
+
+    if not dry_run and selected:
+        try:
+            people = _people_by_name(list(selected), create_missing)
+            vectors = {
+                people[name].id: (kept.mean(axis=0), len(kept))
+                for name, kept in selected.items() if name in people
+            }
+            for name in selected:
+                report_people[name]["person_id"] = people[name].id if name in people else None
+            bulk_upsert_embeddings(vectors, provider, MODALITY_FACE)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    report = {
+        "images": len(paths),
+        "seconds": round(wall, 2),
+        "images_per_s": round(len(paths) / wall, 2) if wall else 0.0,
+        "people": report_people,
+        "workers": dict(per_worker),
+    }
+    log.info(f"Enrolled gallery {root}: {len(selected)} people from {len(paths)} images in {wall:.1f}s")
+    return report
+
+
+@click.command("enroll-gallery")
+@click.argument("root", type=click.Path(exists=True, file_okay=False))
+@click.option("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+@click.option("--provider", default=DLIB_PROVIDER, show_default=True)
+@click.option("--no-create", is_flag=True, help="Skip folders that do not match an existing person.")
+@click.option("--dry-run", is_flag=True, help="Encode and filter, but do not write embeddings.")
+@with_appcontext
+def enroll_gallery_command(root, workers, provider, no_create, dry_run):
+    """Enroll a folder of face photos (ROOT/<person name>/*.jpg) into the embeddings table."""
+    report = enroll_gallery(root, workers=workers, provider=provider,
+                            create_missing=not no_create, dry_run=dry_run)
+
+    for name, stats in report["people"].items():
+        rejected = ", ".join(f"{k}={v}" for k, v in sorted(stats["rejected"].items())) or "none"
+        click.echo(f"{name}: kept {stats['kept']}/{stats['images']} (rejected: {rejected})")
+    for worker, stats in sorted(report["workers"].items()):
+        click.echo(f"worker {worker}: {stats['images']} images, {stats['images_per_s']} img/s")
+    click.echo(f"Total: {report['images']} images in {report['seconds']}s "
+               f"({report.get('images_per_s', 0.0)} img/s){' [dry run]' if dry_run else ''}")
@@ -0,0 +1,174 @@
+import io
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+from flask import current_app
+
+from app.services.batching import MicroBatcher
+
+try:
+    import face_recognition  # dlib-based; optional, only needed for server-side encoding
+except ImportError:
+    face_recognition = None
+
+# Server-side descriptors come from dlib, not face-api.js, so they live under their own provider:
+# the two 128-d spaces are similar but not interchangeable.
+DLIB_PROVIDER = "dlib"
+DLIB_THRESHOLD = 0.6    # face_recognition's default tolerance
+
+MIN_FACE_PX = 80        # smaller faces give unreliable descriptors
+MIN_SHARPNESS = 40.0    # variance of the Laplacian over the face crop; below this is motion blur
+
+
+def _require_backend():
+    if face_recognition is None:
+        raise RuntimeError("face_recognition is not installed (pip install face-recognition)")
+
+
+def sharpness(gray: np.ndarray) -> float:
+    """Variance of a 4-neighbour Laplacian: a cheap focus/motion-blur measure."""
+    if gray.shape[0] < 3 or gray.shape[1] < 3:
+        return 0.0
+    lap = (4 * gray[1:-1, 1:-1] - gray[:-2, 1:-1] - gray[2:, 1:-1]
+           - gray[1:-1, :-2] - gray[1:-1, 2:])
+    return float(lap.var())
+
+
+def face_quality(image: np.ndarray, box) -> dict:
+    """Size and sharpness of one (top, right, bottom, left) face box in an RGB image."""
+    top, right, bottom, left = box
+    crop = image[max(0, top):bottom, max(0, left):right].astype(np.float32).mean(axis=2)
+    return {"size": int(min(bottom - top, right - left)), "sharpness": round(sharpness(crop), 1)}
+
+
+def encode_image(image: np.ndarray, model: str = "hog"):
+    """
+    Detect faces in an RGB image and encode the largest one.
+    Returns (encoding or None, box or None, face_count).
+    """
+    _require_backend()
+    boxes = face_recognition.face_locations(image, model=model)
+    if not boxes:
+        return None, None, 0
+    box = max(boxes, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+    encoding = face_recognition.face_encodings(image, [box])[0]
+    return encoding, box, len(boxes)
+
+
+def encode_image_file(path: str, model: str = "hog") -> dict:
+    """
+    Encode the main face of one image file. Runs in worker processes, so it only
+    returns plain data: the encoding, quality metrics, and which worker did it how fast.
+    """
+    started = time.perf_counter()
+    result = {"path": path, "encoding": None, "error": None, "worker": os.getpid()}
+    try:
+        _require_backend()
+        image = face_recognition.load_image_file(path)
+        encoding, box, count = encode_image(image, model)
+        result["faces"] = count
+        if encoding is not None:
+            result["encoding"] = encoding.astype(np.float32)
+            result.update(face_quality(image, box))
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def passes_quality(result: dict, min_face_px: int = MIN_FACE_PX,
+                   min_sharpness: float = MIN_SHARPNESS) -> Optional[str]:
+    """Reason to reject an encoded image, or None if it is good enough to enroll."""
+    if result.get("error"):
+        return "error"
+    if result.get("encoding") is None:
+        return "no_face"
+    if result.get("faces", 1) > 1:
+        return "multiple_faces"
+    if result["size"] < min_face_px:
+        return "too_small"
+    if result["sharpness"] < min_sharpness:
+        return "blurry"
+    return None
+
+
+def describe_jpeg(data: bytes, assume_face: bool = False, model: str = "hog") -> dict:
+    """
+    Descriptor for an uploaded JPEG (usually a face crop from the overlay). If detection finds
+    nothing and `assume_face` is set (the client says the image is already a face box), the
+    whole crop is treated as the face box; otherwise the result has no encoding.
+    """
+    _require_backend()
+    image = face_recognition.load_image_file(io.BytesIO(data))
+    encoding, box, count = encode_image(image, model)
+    if encoding is None and assume_face:
+        height, width = image.shape[:2]
+        box, count = (0, width, height, 0), 1
+        encoding = face_recognition.face_encodings(image, [box])[0]
+    if encoding is None:
+        return {"encoding": None, "faces": 0}
+    return {"encoding": [round(float(x), 6) for x in encoding], "box": list(box), "faces": count,
+            **face_quality(image, box)}
+
+
+def _describe_or_error(item) -> dict:
+    # item is (jpeg bytes, assume_face). A corrupt upload must not fail the other
+    # requests coalesced into the same batch
+    data, assume_face = item
+    try:
+        return describe_jpeg(data, assume_face=assume_face)
+    except Exception as e:
+        return {"encoding": None, "error": str(e)}
+
+
+def _describe_batch(pool: Optional[ProcessPoolExecutor], items):
+    if pool is None:
+        return [_describe_or_error(data) for data in items]
+    # One dispatch for the whole batch; the pool spreads it over its workers
+    return list(pool.map(_describe_or_error, items))
+
+
+_batcher_lock = threading.Lock()
+
+
+def get_face_batcher() -> MicroBatcher:
+    """
+    App-wide batcher in front of the encoding workers, created on first use; call it with
+    (jpeg bytes, assume_face). FACE_WORKERS=0 encodes in the batcher thread instead of a
+    process pool.
+    """
+    with _batcher_lock:
+        return _face_batcher()
+
+
+def reset_face_batcher():
+    """Drop the batcher and its pool (e.g. after a worker died) so the next request starts fresh."""
+    with _batcher_lock:
+        batcher = current_app.extensions.pop("face_batcher", None)
+    if batcher is not None:
+        batcher.close()
+        if batcher.pool is not None:
+            batcher.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _face_batcher() -> MicroBatcher:
+    batcher = current_app.extensions.get("face_batcher")
+    if batcher is None:
+        _require_backend()
+        cfg = current_app.config
+        workers = cfg.get("FACE_WORKERS", min(4, os.cpu_count() or 1))
+        pool = ProcessPoolExecutor(max_workers=workers) if workers else None
+        batcher = MicroBatcher(
+            lambda items: _describe_batch(pool, items),
+            max_batch=cfg.get("FACE_MAX_BATCH", 8),
+            max_wait_ms=cfg.get("FACE_MAX_WAIT_MS", 15),
+            max_queue=cfg.get("FACE_MAX_QUEUE", 32),
+            name="face-describe",
+        )
+        batcher.pool = pool
+        current_app.extensions["face_batcher"] = batcher
+    return batcher
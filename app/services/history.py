@@ -0,0 +1,81 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, or_
+
+from app import db
+from app.models import Conversation, TranscriptTurn
+
+# Keyset ("seek") pagination: a page is everything strictly after the last row of the
+# previous page in (time, id) order, so each page is one index range scan on
+# ix_conversations_person_started / ix_turns_conversation_timestamp no matter how deep
+# the user scrolls. Cursors are opaque strings "<iso time>_<id>".
+CONVERSATIONS_PER_PAGE = 20
+TURNS_PER_PAGE = 200
+STREAM_CHUNK = 500
+
+
+def encode_cursor(at: datetime, row_id: int) -> str:
+    return f"{at.isoformat()}_{row_id}"
+
+
+def decode_cursor(cursor: Optional[str]):
+    """(datetime, id) from a cursor, or None for a missing/garbled one (= first page)."""
+    if not cursor:
+        return None
+    try:
+        at, _, row_id = cursor.rpartition("_")
+        return datetime.fromisoformat(at), int(row_id)
+    except ValueError:
+        return None
+
+
+def conversation_page(person_id: int, before: Optional[str] = None, limit: int = CONVERSATIONS_PER_PAGE):
+    """
+    One page of a person's conversations, newest first.
+    Returns (conversations, cursor for the next page or None).
+    """
+    q = Conversation.query.filter(Conversation.person_id == person_id)
+    seek = decode_cursor(before)
+    if seek:
+        at, conv_id = seek
+        q = q.filter(or_(Conversation.started_at < at,
+                         and_(Conversation.started_at == at, Conversation.id < conv_id)))
+    rows = q.order_by(Conversation.started_at.desc(), Conversation.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (encode_cursor(rows[-1].started_at, rows[-1].id) if has_more else None)
+
+
+def _turn_columns():
+    return db.session.query(
+        TranscriptTurn.id, TranscriptTurn.speaker, TranscriptTurn.text, TranscriptTurn.timestamp
+    )
+
+
+def turn_page(conversation_id: int, after: Optional[str] = None, limit: int = TURNS_PER_PAGE):
+    """
+    One page of a transcript in speaking order, as lightweight rows (id, speaker, text, timestamp)
+    rather than ORM objects. Returns (rows, cursor for the next page or None).
+    """
+    q = _turn_columns().filter(TranscriptTurn.conversation_id == conversation_id)
+    seek = decode_cursor(after)
+    if seek:
+        at, turn_id = seek
+        q = q.filter(or_(TranscriptTurn.timestamp > at,
+                         and_(TranscriptTurn.timestamp == at, TranscriptTurn.id > turn_id)))
+    rows = q.order_by(TranscriptTurn.timestamp, TranscriptTurn.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None)
+
+
+def iter_turns(conversation_id: int, chunk: int = STREAM_CHUNK):
+    """All turns of a conversation, fetched from the cursor `chunk` rows at a time."""
+    q = (
+        _turn_columns()
+        .filter(TranscriptTurn.conversation_id == conversation_id)
+        .order_by(TranscriptTurn.timestamp, TranscriptTurn.id)
+        .yield_per(chunk)
+    )
+    yield from q
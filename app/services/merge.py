@@ -0,0 +1,109 @@
+import json
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy import update
+
+from app import db
+from app.models import Conversation, Embedding, Person, UnknownSighting
+from app.logger import log
+from app.services.recall import invalidate_recall_index
+from app.services.recap import mark_recap_stale
+
+
+class MergeError(ValueError):
+    """The requested merge is not valid (missing people, merging into itself, ...)."""
+
+
+def merge_embedding_rows(rows) -> tuple:
+    """
+    Combine several embeddings of one provider into (vector, samples): the mean of all
+    underlying samples, i.e. each row weighted by how many samples it already averages.
+    """
+    vectors = [json.loads(r.vector_json) for r in rows]
+    if len({len(v) for v in vectors}) > 1:
+        raise MergeError(f"{rows[0].provider} embeddings have different dimensions "
+                         f"({', '.join(str(len(v)) for v in vectors)}); re-enroll before merging")
+    vectors = np.asarray(vectors, dtype=np.float64)
+    weights = np.asarray([max(r.samples or 1, 1) for r in rows], dtype=np.float64)
+    merged = (vectors * weights[:, None]).sum(axis=0) / weights.sum()
+    return [round(float(x), 6) for x in merged], int(weights.sum())
+
+
+def merge_people(target_id: int, source_ids, keep_photo: bool = True) -> dict:
+    """
+    Fold one or more profiles (usually unknowns) into `target_id` in a single transaction:
+    conversations and unknown-face sightings are re-pointed with one UPDATE each, embeddings
+    are merged per provider (sample-weighted, so the target keeps one row per provider),
+    notes are appended and the sources are deleted. Recap cards, cached profiles and the recognition/recall indexes are
+    refreshed when the transaction commits. Commits; returns a report.
+    """
+    source_ids = sorted({int(s) for s in source_ids} - {target_id})
+    if not source_ids:
+        raise MergeError("nothing to merge")
+    target = db.session.get(Person, target_id)
+    if target is None:
+        raise MergeError(f"person {target_id} not found")
+    sources = db.session.query(Person).filter(Person.id.in_(source_ids)).all()
+    missing = set(source_ids) - {s.id for s in sources}
+    if missing:
+        raise MergeError(f"people not found: {sorted(missing)}")
+
+    try:
+        moved = db.session.execute(
+            update(Conversation)
+            .where(Conversation.person_id.in_(source_ids))
+            .values(person_id=target.id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        mark_recap_stale(target.id)
+        db.session.execute(
+            update(UnknownSighting)
+            .where(UnknownSighting.person_id.in_(source_ids))
+            .values(person_id=target.id)
+            .execution_options(synchronize_session=False)
+        )
+
+        by_provider = defaultdict(list)
+        for emb in (
+            db.session.query(Embedding)
+            .filter(Embedding.person_id.in_([target.id, *source_ids]))
+            .order_by(Embedding.person_id != target.id, Embedding.id)  # target's row first
+        ):
+            by_provider[emb.provider].append(emb)
+
+        embeddings = {}
+        for provider, rows in by_provider.items():
+            keep, extra = rows[0], rows[1:]
+            if extra:
+                vector, samples = merge_embedding_rows(rows)
+                for emb in extra:
+                    db.session.delete(emb)
+                db.session.flush()  # free the (person, provider) slot before re-pointing `keep`
+                keep.vector_json = json.dumps(vector)
+                keep.dim = len(vector)
+                keep.samples = samples
+            keep.person_id = target.id
+            embeddings[provider] = keep.samples
+
+        notes = [target.notes] + [f"[{s.display_name}] {s.notes}" for s in sources if s.notes]
+        target.notes = "\n".join(n for n in notes if n) or None
+        if not keep_photo or not target.photo_filename:
+            target.photo_filename = next(
+                (s.photo_filename for s in sources if s.photo_filename), target.photo_filename
+            )
+
+        for source in sources:
+            # Their conversations, sightings and embeddings were moved above; don't let the
+            # ORM cascade act on stale collections
+            db.session.expire(source, ["conversations", "embeddings", "sightings"])
+            db.session.delete(source)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # The bulk UPDATE bypassed the listeners that keep person-scoped recall results fresh
+    invalidate_recall_index()
+    log.info(f"Merged people {source_ids} into {target.id}: {moved} conversations, embeddings {embeddings}")
+    return {"target_id": target.id, "merged": source_ids, "conversations": moved, "embeddings": embeddings}
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import click
+from flask import current_app, url_for
+from flask.cli import with_appcontext
+from PIL import Image, ImageOps
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.models import Person
+from app.logger import log
+from app.services.profile_cache import get_profile_cache
+
+ALLOWED_EXTS = {"png", "jpg", "jpeg", "webp"}
+DEFAULT_PHOTO = "people/default_silhouette.png"
+
+# Longest side in px per named size; cards and the glasses sidebar show 160px avatars (2x for HiDPI)
+VARIANT_SIZES = {"thumb": 128, "card": 320, "full": 960}
+# URLs always name the webp; the static view answers with the jpg for clients without WebP
+VARIANT_FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}), "jpg": ("JPEG", {"quality": 82, "optimize": True})}
+VARIANT_DIR = "variants"   # under the upload folder
+
+
+def allowed_file(filename: str) -> bool:
+    # Split once from the right; index 1 is always the extension when a dot exists
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTS
+
+
+def _upload_folder() -> str:
+    return current_app.config.get("UPLOAD_FOLDER") or os.path.join(current_app.root_path, "static", "people")
+
+
+def save_person_photo(file_storage, desired_stem: str = "") -> str:
+    """
+    Save an uploaded image in static/people and return just the stored filename
+    (e.g. 'ravi-3f2a9c0d1b7e4a65.png'). The name carries a hash of the content, so a URL
+    never changes meaning and can be cached forever; re-uploading the same image is a no-op.
+    Resized variants are generated in the background.
+    """
+    if not file_storage or file_storage.filename == "":
+        return ""
+    if not allowed_file(file_storage.filename):
+        return ""
+
+    data = file_storage.read()
+    ext = file_storage.filename.rsplit(".", 1)[1].lower()
+    base = secure_filename(desired_stem or file_storage.filename.rsplit(".", 1)[0]) or "photo"
+    candidate = f"{base}-{hashlib.sha256(data).hexdigest()[:16]}.{ext}"
+
+    folder = _upload_folder()
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, candidate)
+    if not os.path.exists(path):
+        tmp = f"{path}.part"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    schedule_variants(candidate)
+    return candidate
+
+
+# ---------- Variants ----------
+def variant_name(filename: str, size: str, fmt: str) -> str:
+    return f"{VARIANT_DIR}/{filename.rsplit('.', 1)[0]}-{size}.{fmt}"
+
+
+def build_variants(folder: str, filename: str) -> int:
+    """Write every size/format variant of one stored photo that is missing. Returns files written."""
+    os.makedirs(os.path.join(folder, VARIANT_DIR), exist_ok=True)
+    written = 0
+    with Image.open(os.path.join(folder, filename)) as im:
+        im = ImageOps.exif_transpose(im)
+        for size, longest in VARIANT_SIZES.items():
+            resized = im.copy()
+            resized.thumbnail((longest, longest), Image.LANCZOS)  # never upscales
+            for fmt, (pil_format, options) in VARIANT_FORMATS.items():
+                path = os.path.join(folder, variant_name(filename, size, fmt))
+                if os.path.exists(path):
+                    continue
+                out = resized
+                if pil_format == "JPEG" and resized.mode not in ("RGB", "L"):
+                    out = Image.new("RGB", resized.size, "white")
+                    out.paste(resized, mask=resized.convert("RGBA").split()[-1])
+                tmp = f"{path}.part"
+                out.save(tmp, pil_format, **options)
+                os.replace(tmp, path)
+                written += 1
+    return written
+
+
+_executor_lock = threading.Lock()
+
+
+def _variant_executor() -> ThreadPoolExecutor:
+    with _executor_lock:
+        executor = current_app.extensions.get("photo_variants")
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="photo-variants")
+            current_app.extensions["photo_variants"] = executor
+        return executor
+
+
+def schedule_variants(filename: str):
+    """Generate a photo's variants off the request thread."""
+    app = current_app._get_current_object()
+    folder = _upload_folder()
+
+    def job():
+        try:
+            written = build_variants(folder, filename)
+        except Exception as e:
+            log.error(f"Photo variants failed for {filename}: {e}")
+            return
+        if written:
+            with app.app_context():
+                _variants_ready(filename)
+
+    _variant_executor().submit(job)
+
+
+def _variants_ready(filename: str):
+    # Cached profile bodies still point at the original; let them pick up the variant
+    ids = [pid for (pid,) in db.session.query(Person.id).filter(Person.photo_filename == filename)]
+    get_profile_cache().invalidate(ids)
+
+
+# ---------- Resolver ----------
+def photo_path_for_person(person: Person, size: Optional[str] = "card", fmt: str = "webp") -> str:
+    """
+    Static path (relative to /static) of the best available image for a person:
+    1) the requested variant of person.photo_filename, once it has been generated
+    2) person.photo_filename itself
+    3) an ID-based file like people/<id>.(png|jpg|jpeg|webp)
+    4) the default silhouette
+    Pass size=None for the original upload.
+    """
+    folder = _upload_folder()
+    filename = getattr(person, "photo_filename", None)
+    if filename:
+        if size:
+            variant = variant_name(filename, size, fmt)
+            if os.path.exists(os.path.join(folder, variant)):
+                return f"people/{variant}"
+        return f"people/{filename}"
+
+    for ext in ("png", "jpg", "jpeg", "webp"):
+        if os.path.exists(os.path.join(folder, f"{person.id}.{ext}")):
+            return f"people/{person.id}.{ext}"
+    return DEFAULT_PHOTO
+
+
+def photo_url_for_person(person: Person, size: Optional[str] = "card", fmt: str = "webp") -> str:
+    """URL of a person's photo at the given variant size (see photo_path_for_person)."""
+    return url_for("static", filename=photo_path_for_person(person, size, fmt))
+
+
+@click.command("photos-build")
+@with_appcontext
+def photos_build_command():
+    """Generate missing resized variants for every stored person photo."""
+    folder = _upload_folder()
+    filenames = {f for (f,) in db.session.query(Person.photo_filename).filter(Person.photo_filename.isnot(None))}
+    written = 0
+    for filename in sorted(filenames):
+        if not os.path.exists(os.path.join(folder, filename)):
+            click.echo(f"Missing: {filename}")
+            continue
+        written += build_variants(folder, filename)
+    click.echo(f"Wrote {written} variants for {len(filenames)} photos.")
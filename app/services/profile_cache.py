@@ -0,0 +1,159 @@
+import json
+import threading
+from typing import Callable, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Conversation, Person
+
+# Serialized /glasses/api/people/<id> bodies, keyed by person id.
+#
+# Every write that can change a profile goes through the ORM and dirties the person row
+# (profile edits, register, merge and delete directly; conversation start/stop and summary
+# writes through the recap card in services/recap.py), so a session listener invalidates
+# exactly the affected ids when the transaction commits.
+#
+# PROFILE_CACHE_SHARED=True keeps the bodies in an SQLite table instead of process memory,
+# for deployments with several worker processes: invalidation then happens inside the
+# writing transaction, so every process sees it. Per-process generations can't guard a
+# build that races a write in another process, so a shared body is only stored while the
+# person's updated_at is still the one read before the build.
+SHARED_TABLE = "profile_cache"
+
+
+class ProfileCache:
+    def __init__(self, shared: bool = False):
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self._bodies = {}
+        self._generations = {}  # bumped on invalidation, so a build racing a write is not stored
+        self._lock = threading.Lock()
+        self._table_ready = False
+
+    def get(self, person_id: int, build: Callable[[int], Optional[dict]]) -> Optional[str]:
+        """The cached JSON body for a person, building it with `build(person_id)` on a miss."""
+        body = self._read(person_id)
+        if body is not None:
+            self.hits += 1
+            return body
+        self.misses += 1
+
+        generation = self._generations.get(person_id, 0)
+        stamp = self._stamp(person_id) if self.shared else None
+        profile = build(person_id)
+        if profile is None:
+            return None
+        body = json.dumps(profile, separators=(",", ":"))
+        self._write(person_id, body, generation, stamp)
+        return body
+
+    def invalidate(self, person_ids):
+        person_ids = [pid for pid in person_ids if pid is not None]
+        with self._lock:
+            for pid in person_ids:
+                self._bodies.pop(pid, None)
+                self._generations[pid] = self._generations.get(pid, 0) + 1
+        if self.shared and person_ids:
+            self._ensure_table()
+            with db.engine.begin() as conn:
+                _delete_shared(conn, person_ids)
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+        if self.shared:
+            self._ensure_table()
+            with db.engine.begin() as conn:
+                conn.execute(text(f"DELETE FROM {SHARED_TABLE}"))
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._bodies), "shared": self.shared}
+
+    def _read(self, person_id: int) -> Optional[str]:
+        if not self.shared:
+            return self._bodies.get(person_id)
+        self._ensure_table()
+        return db.session.execute(
+            text(f"SELECT body FROM {SHARED_TABLE} WHERE person_id = :pid"), {"pid": person_id}
+        ).scalar()
+
+    def _stamp(self, person_id: int):
+        # Raw column value, compared as-is in _write
+        return db.session.execute(
+            text(f"SELECT updated_at FROM {Person.__tablename__} WHERE id = :pid"), {"pid": person_id}
+        ).scalar()
+
+    def _write(self, person_id: int, body: str, generation: int, stamp=None):
+        if not self.shared:
+            with self._lock:
+                if self._generations.get(person_id, 0) == generation:
+                    self._bodies[person_id] = body
+            return
+        with db.engine.begin() as conn:
+            conn.execute(
+                text(f"INSERT OR REPLACE INTO {SHARED_TABLE}(person_id, body) SELECT :pid, :body "
+                     f"WHERE (SELECT updated_at FROM {Person.__tablename__} WHERE id = :pid) = :stamp"),
+                {"pid": person_id, "body": body, "stamp": stamp},
+            )
+
+    def _ensure_table(self, conn=None):
+        if self._table_ready:
+            return
+        ddl = text(f"CREATE TABLE IF NOT EXISTS {SHARED_TABLE} (person_id INTEGER PRIMARY KEY, body TEXT NOT NULL)")
+        if conn is not None:
+            conn.execute(ddl)
+        else:
+            with db.engine.begin() as own:
+                own.execute(ddl)
+        self._table_ready = True
+
+
+def get_profile_cache() -> ProfileCache:
+    cache = current_app.extensions.get("profile_cache")
+    if cache is None:
+        cache = ProfileCache(shared=bool(current_app.config.get("PROFILE_CACHE_SHARED")))
+        current_app.extensions["profile_cache"] = cache
+    return cache
+
+
+def _delete_shared(conn, person_ids):
+    conn.execute(
+        text(f"DELETE FROM {SHARED_TABLE} WHERE person_id IN ({','.join(str(int(p)) for p in person_ids)})")
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _track_profile_changes(session, flush_context):
+    changed = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Person):
+            changed.add(obj.id)
+        elif isinstance(obj, Conversation):
+            changed.add(obj.person_id)
+    changed.discard(None)
+    if not changed:
+        return
+    session.info.setdefault("profiles_changed", set()).update(changed)
+    if has_app_context() and current_app.config.get("PROFILE_CACHE_SHARED"):
+        # Same transaction as the write: other processes never see a stale body after commit
+        conn = session.connection()
+        get_profile_cache()._ensure_table(conn)
+        _delete_shared(conn, changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_changed_profiles(session):
+    changed = session.info.pop("profiles_changed", None)
+    if changed and has_app_context():
+        cache = current_app.extensions.get("profile_cache")
+        if cache is not None and not cache.shared:  # shared rows went with the flush
+            cache.invalidate(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_profile_changes(session):
+    session.info.pop("profiles_changed", None)
@@ -0,0 +1,410 @@
+import hashlib
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import click
+import numpy as np
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import and_, event, inspect, or_
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Conversation, RecallChunk, TranscriptTurn
+from app.logger import log
+
+try:
+    from sentence_transformers import SentenceTransformer  # optional, better recall
+except ImportError:
+    SentenceTransformer = None
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+HASHING_MODEL = "hashing-v1"
+HASHING_DIM = 512
+
+CHUNK_TURNS = 4          # consecutive transcript lines per chunk
+CHUNK_MAX_CHARS = 600
+BATCH_SIZE = 64          # chunks embedded per model call
+DEBOUNCE_S = 2.0         # let a burst of appended turns settle before re-chunking
+
+
+# ---------- Embedders ----------
+class HashingEmbedder:
+    """
+    Dependency-free fallback: signed feature hashing of word unigrams and bigrams.
+    Catches shared vocabulary (pharmacy, doctor, walk) but not paraphrases.
+    """
+    name = HASHING_MODEL
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+
+    def encode(self, texts) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, t in enumerate(texts):
+            words = re.findall(r"\w+", t.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = int.from_bytes(hashlib.blake2b(feature.encode("utf8"), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) else -1.0
+        return _normalize(out)
+
+
+class SentenceEmbedder:
+    def __init__(self, model_name: str):
+        self.name = model_name
+        self._model = SentenceTransformer(model_name)
+
+    def encode(self, texts) -> np.ndarray:
+        vectors = self._model.encode(list(texts), batch_size=BATCH_SIZE, convert_to_numpy=True)
+        return _normalize(vectors.astype(np.float32))
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    return m / (np.linalg.norm(m, axis=1, keepdims=True) + 1e-12)
+
+
+_embedders = {}
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """The configured embedder (RECALL_MODEL), loaded once per process; hashing if unavailable."""
+    name = current_app.config.get("RECALL_MODEL", DEFAULT_MODEL)
+    with _embedder_lock:
+        if name not in _embedders:
+            if name != HASHING_MODEL and SentenceTransformer is not None:
+                try:
+                    _embedders[name] = SentenceEmbedder(name)
+                except Exception as e:
+                    log.warning(f"Recall model {name} unavailable ({e}); using hashing embedder")
+                    _embedders[name] = HashingEmbedder()
+            else:
+                _embedders[name] = HashingEmbedder()
+        return _embedders[name]
+
+
+# ---------- Chunking ----------
+def turn_windows(conversation_id: int, start: Optional[tuple] = None):
+    """
+    Yield ("turns", text, at, first_turn_id) windows of consecutive turns, in transcript
+    order, beginning at the turn whose (timestamp, id) is `start` (the whole transcript if None).
+    """
+    window, size, started, first_id = [], 0, None, None
+    turns = (
+        db.session.query(TranscriptTurn.id, TranscriptTurn.speaker, TranscriptTurn.text, TranscriptTurn.timestamp)
+        .filter(TranscriptTurn.conversation_id == conversation_id)
+        .order_by(TranscriptTurn.timestamp, TranscriptTurn.id)
+    )
+    if start is not None:
+        ts, turn_id = start
+        turns = turns.filter(or_(TranscriptTurn.timestamp > ts,
+                                 and_(TranscriptTurn.timestamp == ts, TranscriptTurn.id >= turn_id)))
+    for turn_id, speaker, text, timestamp in turns:
+        line = f"{'Me' if speaker == 'PATIENT' else 'Them'}: {text}"
+        if window and (len(window) >= CHUNK_TURNS or size + len(line) > CHUNK_MAX_CHARS):
+            yield "turns", "\n".join(window), started, first_id
+            window, size = [], 0
+        if not window:
+            started, first_id = timestamp, turn_id
+        window.append(line)
+        size += len(line)
+    if window:
+        yield "turns", "\n".join(window), started, first_id
+
+
+def chunk_conversation(conv: Conversation):
+    """Yield (kind, text, at, first_turn_id) chunks: windows of consecutive turns, plus the summary."""
+    yield from turn_windows(conv.id)
+    if conv.summary:
+        yield "summary", conv.summary, conv.started_at, None
+
+
+def _store_chunks(pending, embedder):
+    for start in range(0, len(pending), BATCH_SIZE):
+        batch = pending[start:start + BATCH_SIZE]
+        vectors = embedder.encode([text for _, _, text, _, _ in batch]).astype(np.float16)
+        db.session.add_all([
+            RecallChunk(conversation_id=conv_id, kind=kind, text=text, at=at, first_turn_id=first_turn_id,
+                        model=embedder.name, vector=vector.tobytes())
+            for (conv_id, kind, text, at, first_turn_id), vector in zip(batch, vectors)
+        ])
+
+
+def _rechunk(conversation_ids) -> list:
+    """Drop the conversations' chunks and return all of them freshly chunked (not yet embedded)."""
+    pending = []
+    for conv_id in conversation_ids:
+        db.session.query(RecallChunk).filter(RecallChunk.conversation_id == conv_id).delete()
+        conv = db.session.get(Conversation, conv_id)
+        if conv is not None:
+            pending.extend((conv_id, *chunk) for chunk in chunk_conversation(conv))
+    return pending
+
+
+def rebuild_conversations(conversation_ids) -> int:
+    """Re-chunk and re-embed the given conversations in batches; commits. Returns chunks written."""
+    embedder = get_embedder()
+    pending = _rechunk(conversation_ids)
+    _store_chunks(pending, embedder)
+    db.session.commit()
+    invalidate_recall_index()
+    return len(pending)
+
+
+def extend_conversations(conversation_ids) -> int:
+    """
+    Index turns appended to the given conversations: only the last (possibly partial) window
+    is re-chunked, from its first turn on, so a live visit costs the same per new turn however
+    long it gets. Conversations without a usable tail window are rebuilt. Commits; returns
+    chunks written.
+    """
+    embedder = get_embedder()
+    pending, rebuild = [], []
+    for conv_id in conversation_ids:
+        tail = (
+            db.session.query(RecallChunk)
+            .filter(RecallChunk.conversation_id == conv_id, RecallChunk.model == embedder.name,
+                    RecallChunk.kind == "turns")
+            .order_by(RecallChunk.at.desc(), RecallChunk.id.desc())
+            .first()
+        )
+        first = db.session.get(TranscriptTurn, tail.first_turn_id) if tail and tail.first_turn_id else None
+        if first is None:
+            rebuild.append(conv_id)
+            continue
+        # Appended turns are stamped on arrival, so they always sort after the tail's first turn
+        db.session.delete(tail)
+        pending.extend((conv_id, *chunk) for chunk in turn_windows(conv_id, start=(first.timestamp, first.id)))
+
+    pending.extend(_rechunk(rebuild))
+    _store_chunks(pending, embedder)
+    db.session.commit()
+    invalidate_recall_index()
+    return len(pending)
+
+
+def unindexed_conversation_ids(model_name: str) -> list:
+    """Conversations with text but no chunks from the current embedder."""
+    indexed = db.session.query(RecallChunk.conversation_id).filter(RecallChunk.model == model_name)
+    with_text = (
+        db.session.query(Conversation.id)
+        .outerjoin(TranscriptTurn, TranscriptTurn.conversation_id == Conversation.id)
+        .filter((Conversation.summary.isnot(None)) | (TranscriptTurn.id.isnot(None)))
+        .filter(Conversation.id.notin_(indexed))
+        .group_by(Conversation.id)
+    )
+    return [row[0] for row in with_text]
+
+
+# ---------- Background indexer ----------
+class RecallIndexer:
+    """
+    Indexes conversations off the request path. Changed conversation ids are queued after
+    each commit; the worker waits DEBOUNCE_S so a burst of appended turns is handled in one
+    pass. Conversations that only gained turns get their tail extended; edits, deletes
+    and summary changes get a full rebuild.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._pending = set()     # full rebuilds
+        self._appended = set()    # new turns only
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="recall-indexer", daemon=True)
+        self._thread.start()
+
+    def schedule(self, conversation_ids, appended_only: bool = False):
+        with self._cond:
+            (self._appended if appended_only else self._pending).update(conversation_ids)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._appended)
+            time.sleep(DEBOUNCE_S)
+            with self._cond:
+                rebuild, self._pending = sorted(self._pending), set()
+                extend, self._appended = sorted(self._appended - set(rebuild)), set()
+            with self.app.app_context():
+                try:
+                    written = rebuild_conversations(rebuild) if rebuild else 0
+                    written += extend_conversations(extend) if extend else 0
+                    log.debug(f"Recall: rebuilt {len(rebuild)} and extended {len(extend)} conversations "
+                              f"({written} chunks)")
+                except Exception as e:
+                    db.session.rollback()
+                    log.error(f"Recall indexing failed for {rebuild + extend}: {e}")
+                finally:
+                    db.session.remove()
+
+
+_indexer_lock = threading.Lock()
+
+
+def get_indexer() -> RecallIndexer:
+    with _indexer_lock:
+        indexer = current_app.extensions.get("recall_indexer")
+        if indexer is None:
+            indexer = RecallIndexer(current_app._get_current_object())
+            current_app.extensions["recall_indexer"] = indexer
+        return indexer
+
+
+def ensure_backfill():
+    """Once per process, queue conversations not yet indexed with the current embedder."""
+    if current_app.extensions.get("recall_backfilled"):
+        return
+    current_app.extensions["recall_backfilled"] = True
+    backlog = unindexed_conversation_ids(get_embedder().name)
+    if backlog:
+        log.info(f"Recall: indexing {len(backlog)} conversations in the background")
+        get_indexer().schedule(backlog)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_recall_changes(session, flush_context):
+    changed = session.info.setdefault("recall_changed", set())
+    appended = session.info.setdefault("recall_appended", set())
+    for obj in session.new:
+        if isinstance(obj, TranscriptTurn):
+            appended.add(obj.conversation_id)
+        elif isinstance(obj, Conversation) and obj.summary:
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, TranscriptTurn) and session.is_modified(obj):
+            history = inspect(obj).attrs.conversation_id.history
+            changed.update((*history.added, *history.unchanged, *history.deleted))
+        elif isinstance(obj, Conversation):
+            state = inspect(obj)
+            if state.attrs.summary.history.has_changes() or state.attrs.started_at.history.has_changes():
+                changed.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, TranscriptTurn):
+            changed.add(obj.conversation_id)
+        elif isinstance(obj, Conversation):
+            changed.add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _schedule_recall_rebuild(session):
+    changed = session.info.pop("recall_changed", None)
+    appended = session.info.pop("recall_appended", None)
+    if not (changed or appended) or not has_app_context() or current_app.config.get("RECALL_DISABLED"):
+        return
+    if changed:
+        get_indexer().schedule(c for c in changed if c is not None)
+    if appended:
+        get_indexer().schedule((c for c in appended if c is not None), appended_only=True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_recall_changes(session):
+    session.info.pop("recall_changed", None)
+    session.info.pop("recall_appended", None)
+
+
+# ---------- Query ----------
+class RecallIndex:
+    """All chunk vectors of one embedder as a float32 matrix, with person/time arrays for scoping."""
+
+    def __init__(self, model_name: str):
+        rows = (
+            db.session.query(RecallChunk.id, RecallChunk.vector, RecallChunk.at, Conversation.person_id)
+            .join(Conversation, Conversation.id == RecallChunk.conversation_id)
+            .filter(RecallChunk.model == model_name)
+            .all()
+        )
+        self.chunk_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.person_ids = np.array([r[3] if r[3] is not None else -1 for r in rows], dtype=np.int64)
+        self.at = np.array([r[2] for r in rows], dtype="datetime64[s]")
+        self.matrix = (
+            np.frombuffer(b"".join(r[1] for r in rows), dtype=np.float16).reshape(len(rows), -1).astype(np.float32)
+            if rows else np.zeros((0, 0), dtype=np.float32)
+        )
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def top_k(self, query_vector, k=5, person_id=None, since=None, until=None):
+        mask = np.ones(len(self), dtype=bool)
+        if person_id is not None:
+            mask &= self.person_ids == person_id
+        if since is not None:
+            mask &= self.at >= np.datetime64(since, "s")
+        if until is not None:
+            mask &= self.at < np.datetime64(until, "s")
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+        scores = self.matrix[candidates] @ query_vector
+        k = min(k, len(candidates))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(self.chunk_ids[candidates[i]]), float(scores[i])) for i in best]
+
+
+def invalidate_recall_index():
+    if has_app_context():
+        current_app.extensions.pop("recall_index", None)
+
+
+def get_recall_index() -> RecallIndex:
+    name = get_embedder().name
+    index = current_app.extensions.get("recall_index")
+    if index is None or index[0] != name:
+        index = (name, RecallIndex(name))
+        current_app.extensions["recall_index"] = index
+    return index[1]
+
+
+def recall(query: str, person_id: Optional[int] = None, since: Optional[datetime] = None,
+           until: Optional[datetime] = None, k: int = 5, min_score: float = 0.0) -> list:
+    """Top-k chunks most similar to `query`, optionally limited to one person and a date range."""
+    ensure_backfill()
+    index = get_recall_index()
+    if not len(index) or not (query or "").strip():
+        return []
+    vector = get_embedder().encode([query])[0]
+    hits = [(cid, score) for cid, score in index.top_k(vector, k, person_id, since, until) if score > min_score]
+    if not hits:
+        return []
+
+    chunks = {
+        c.id: c for c in db.session.query(RecallChunk).filter(RecallChunk.id.in_([cid for cid, _ in hits]))
+    }
+    out = []
+    for cid, score in hits:
+        chunk = chunks.get(cid)
+        if chunk is None:  # rebuilt since the index was loaded
+            continue
+        out.append({
+            "chunk_id": cid,
+            "conversation_id": chunk.conversation_id,
+            "kind": chunk.kind,
+            "text": chunk.text,
+            "at": chunk.at.isoformat(),
+            "score": round(score, 4),
+        })
+    return out
+
+
+@click.command("recall-reindex")
+@click.option("--all", "rebuild_all", is_flag=True, help="Re-embed every conversation, not just unindexed ones.")
+@with_appcontext
+def recall_reindex_command(rebuild_all):
+    """Build the semantic recall index in the foreground."""
+    embedder = get_embedder()
+    if rebuild_all:
+        ids = [row[0] for row in db.session.query(Conversation.id)]
+    else:
+        ids = unindexed_conversation_ids(embedder.name)
+    started = time.perf_counter()
+    written = 0
+    for start in range(0, len(ids), 50):
+        written += rebuild_conversations(ids[start:start + 50])
+    click.echo(f"Indexed {len(ids)} conversations ({written} chunks) with {embedder.name} "
+               f"in {time.perf_counter() - started:.1f}s")
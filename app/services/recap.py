@@ -0,0 +1,155 @@
+import json
+import re
+from collections import Counter
+from typing import Optional
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Conversation, Person
+from app.logger import log
+
+# The recap card is everything the glasses sidebar shows about a person, materialized onto
+# the person row whenever one of their conversations changes, so the profile endpoint is a
+# primary-key read instead of a join + sort over conversations.
+RECAP_BULLETS = 5             # newest summary bullets kept on the card
+RECAP_TOPICS = 5
+TOPIC_CONVERSATIONS = 20      # summaries mined for topics
+
+# Conversation columns that change what the card shows
+_RECAP_COLUMNS = ("summary", "started_at", "ended_at", "person_id")
+
+_STOPWORDS = set("""
+a about after again all also an and any are as at be been before being but by can could did do
+does doing done for from get got had has have he her here him his how i if in into is it its just
+like me more most my no not now of on once only or other our out over own same she should so some
+still such than that the their them then there these they this those through to too under until
+up very was we were what when where which while who will with would you your discussed talked
+said told asked will shared mentioned agreed plan planned today tomorrow yesterday week
+""".split())
+
+
+def summary_bullets(summary: Optional[str]) -> list:
+    """Summary text -> bullet lines, with any leading bullet/number markers removed."""
+    lines = (re.sub(r"^[•*\-\d.)\s]+", "", line.strip()) for line in (summary or "").splitlines())
+    return [line for line in lines if line]
+
+
+def top_topics(summaries, n: int = RECAP_TOPICS) -> list:
+    """Most frequent content words across summaries (counted once per summary)."""
+    counts = Counter()
+    for summary in summaries:
+        words = {w for w in re.findall(r"[a-z][a-z'-]{3,}", (summary or "").lower()) if w not in _STOPWORDS}
+        counts.update(words)
+    return [word for word, count in counts.most_common(n) if count > 0]
+
+
+def build_recap(person_id: int) -> dict:
+    """Compute the recap card for one person from their conversations."""
+    count, last_met = (
+        db.session.query(func.count(Conversation.id), func.max(Conversation.started_at))
+        .filter(Conversation.person_id == person_id)
+        .one()
+    )
+    recent = (
+        db.session.query(Conversation.id, Conversation.started_at, Conversation.ended_at, Conversation.summary)
+        .filter(Conversation.person_id == person_id)
+        .order_by(Conversation.started_at.desc(), Conversation.id.desc())
+        .limit(TOPIC_CONVERSATIONS)
+        .all()
+    )
+
+    bullets = []
+    for row in recent:
+        bullets.extend(summary_bullets(row.summary))
+        if len(bullets) >= RECAP_BULLETS:
+            break
+
+    latest = recent[0] if recent else None
+    return {
+        "bullets": bullets[:RECAP_BULLETS],
+        "conversation_count": count,
+        "last_met_at": last_met.isoformat() if last_met else None,
+        "topics": top_topics(row.summary for row in recent),
+        "latest_conversation": {
+            "id": latest.id,
+            "started_at": latest.started_at.isoformat(),
+            "ended_at": latest.ended_at.isoformat() if latest.ended_at else None,
+            "has_summary": bool(latest.summary),
+        } if latest else None,
+    }
+
+
+def refresh_recap(person: Person) -> dict:
+    """Recompute and store a person's recap card. Caller commits."""
+    recap = build_recap(person.id)
+    person.recap_json = json.dumps(recap)
+    person.last_summary_cached = "\n".join(recap["bullets"]) or None
+    return recap
+
+
+def get_recap(person: Person) -> dict:
+    """
+    The stored recap card. People never materialized (rows from before recap cards existed)
+    get one computed live without writing, so read paths stay read-only; it is stored the
+    next time one of their conversations changes, or for everyone by `flask recap-rebuild`.
+    """
+    if person.recap_json:
+        return json.loads(person.recap_json)
+    return build_recap(person.id)
+
+
+def mark_recap_stale(*person_ids):
+    """Refresh these cards at the next commit; for bulk UPDATEs that bypass the ORM events."""
+    db.session.info.setdefault("recap_stale", set()).update(pid for pid in person_ids if pid)
+
+
+@event.listens_for(Conversation.person_id, "set", active_history=True)
+def _load_previous_owner(target, value, oldvalue, initiator):
+    # active_history makes SQLAlchemy load the old person_id even on an expired instance,
+    # so the person history below also sees the person a conversation was moved away from.
+    pass
+
+
+@event.listens_for(Session, "after_flush")
+def _track_recap_changes(session, flush_context):
+    stale = session.info.setdefault("recap_stale", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, Conversation):
+            continue
+        state = inspect(obj)
+        if obj in session.dirty and not any(state.attrs[c].history.has_changes() for c in _RECAP_COLUMNS):
+            continue
+        # Both sides of a reassignment (e.g. merging an unknown) need a new card
+        history = state.attrs.person_id.history
+        stale.update(pid for pid in (*history.added, *history.unchanged, *history.deleted) if pid)
+
+
+@event.listens_for(Session, "before_commit")
+def _materialize_recaps(session):
+    session.flush()  # surface pending conversation changes to _track_recap_changes
+    stale = session.info.pop("recap_stale", None)
+    if not stale:
+        return
+    for person in session.query(Person).filter(Person.id.in_(stale)):
+        refresh_recap(person)
+    log.debug(f"Refreshed recap cards for people {sorted(stale)}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_recap_changes(session):
+    session.info.pop("recap_stale", None)
+
+
+@click.command("recap-rebuild")
+@with_appcontext
+def recap_rebuild_command():
+    """Recompute every person's recap card (e.g. after importing conversations)."""
+    people = Person.query.all()
+    for person in people:
+        refresh_recap(person)
+    db.session.commit()
+    click.echo(f"Rebuilt recap cards for {len(people)} people.")
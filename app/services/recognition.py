@@ -0,0 +1,218 @@
+import json
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Embedding, Person
+from app.logger import log
+
+MODALITY_FACE = "face"
+MODALITY_VOICE = "voice"
+
+# Defaults per modality: which provider the clients enroll with, how distances are measured,
+# and the distance at which a candidate stops counting as the same person.
+MODALITY_DEFAULTS = {
+    MODALITY_FACE: {"provider": "local", "metric": "l2", "threshold": 0.58, "dim": 128},  # face-api.js / dlib
+    MODALITY_VOICE: {"provider": "ecapa", "metric": "cosine", "threshold": 0.25},  # 1 - cos >= 0.75 similarity
+}
+
+
+def is_valid_vector(vector, modality: str) -> bool:
+    """A non-empty list of finite numbers, of the modality's dimension when it has a fixed one."""
+    if not isinstance(vector, list) or not vector:
+        return False
+    if any(isinstance(x, bool) or not isinstance(x, (int, float)) or not np.isfinite(x) for x in vector):
+        return False
+    dim = MODALITY_DEFAULTS[modality].get("dim")
+    return dim is None or len(vector) == dim
+
+
+class EmbeddingIndex:
+    """
+    All enrolled vectors for one provider, stacked into a single float32 matrix.
+    One row per person (embeddings are unique per person+provider), so a search
+    returns one distance per person in a single matrix operation.
+    Rows whose length differs from the provider's usual dimension are left out (and logged)
+    rather than breaking every search on that provider.
+    """
+
+    def __init__(self, provider: str, metric: str, rows, unknown=None):
+        self.provider = provider
+        self.metric = metric
+        unknown = list(unknown) if unknown is not None else [False] * len(rows)
+        vectors = [(r.person_id, json.loads(r.vector_json), u) for r, u in zip(rows, unknown)]
+        self.dim = Counter(len(v) for _, v, _ in vectors).most_common(1)[0][0] if vectors else 0
+        skipped = [pid for pid, v, _ in vectors if len(v) != self.dim]
+        if skipped:
+            log.warning(f"Skipping {provider} embeddings of people {skipped}: not {self.dim}-d")
+            vectors = [row for row in vectors if len(row[1]) == self.dim]
+        self.person_ids = np.array([pid for pid, _, _ in vectors], dtype=np.int64)
+        self.unknown = np.array([u for _, _, u in vectors], dtype=bool)  # rows of unknown profiles
+        self.matrix = np.asarray([v for _, v, _ in vectors], dtype=np.float32).reshape(len(vectors), self.dim)
+        if metric == "cosine" and len(vectors):
+            self.matrix /= np.linalg.norm(self.matrix, axis=1, keepdims=True) + 1e-12
+
+    def __len__(self):
+        return len(self.person_ids)
+
+    def accepts(self, vector) -> bool:
+        """Whether `vector` has the dimension this index was built with."""
+        return len(vector) == self.dim
+
+    def distances(self, vector) -> np.ndarray:
+        """Distance from `vector` to every enrolled person, aligned with self.person_ids."""
+        q = np.asarray(vector, dtype=np.float32)
+        if q.shape != (self.dim,):
+            raise ValueError(f"expected a {self.dim}-d vector for {self.provider}, got {q.shape}")
+        if self.metric == "cosine":
+            q = q / (np.linalg.norm(q) + 1e-12)
+            return 1.0 - self.matrix @ q
+        return np.linalg.norm(self.matrix - q, axis=1)
+
+
+def _index_cache() -> dict:
+    return current_app.extensions.setdefault("recognition_index", {})
+
+
+def get_index(provider: str, modality: str) -> EmbeddingIndex:
+    """Return the cached index for a provider, building it from the DB on first use."""
+    cache = _index_cache()
+    idx = cache.get(provider)
+    if idx is None:
+        rows = (
+            db.session.query(Embedding, Person.is_unknown)
+            .join(Person, Person.id == Embedding.person_id)
+            .filter(Embedding.provider == provider)
+            .all()
+        )
+        idx = EmbeddingIndex(provider, MODALITY_DEFAULTS[modality]["metric"],
+                             [e for e, _ in rows], [bool(u) for _, u in rows])
+        cache[provider] = idx
+        log.debug(f"Built {modality} index for provider={provider} with {len(idx)} people")
+    return idx
+
+
+def invalidate_index(provider: Optional[str] = None):
+    """Drop a cached index (or all of them) after embeddings change."""
+    cache = _index_cache()
+    if provider is None:
+        cache.clear()
+    else:
+        cache.pop(provider, None)
+
+
+def upsert_embedding(person_id: int, vector, provider: str, modality: str, samples: int = 1) -> Embedding:
+    """Save/replace the single embedding a person has for a provider. Caller commits."""
+    emb = (
+        db.session.query(Embedding)
+        .filter(Embedding.person_id == person_id, Embedding.provider == provider)
+        .first()
+    )
+    vec_json = json.dumps(vector)
+    if emb:
+        emb.vector_json = vec_json
+        emb.dim = len(vector)
+        emb.modality = modality
+        emb.samples = samples
+    else:
+        emb = Embedding(
+            person_id=person_id,
+            provider=provider,
+            modality=modality,
+            vector_json=vec_json,
+            dim=len(vector),
+            samples=samples,
+        )
+        db.session.add(emb)
+    return emb
+
+
+@event.listens_for(Session, "after_flush")
+def _track_embedding_changes(session, flush_context):
+    # Any embedding write, a person delete (which cascades to embeddings), or a person becoming
+    # known/unknown (the index keeps that flag per row) makes the indexes stale.
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Embedding) or (isinstance(obj, Person) and (
+                obj in session.deleted or inspect(obj).attrs.is_unknown.history.has_changes())):
+            session.info["recognition_index_stale"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_stale_indexes(session):
+    if session.info.pop("recognition_index_stale", False) and has_app_context():
+        invalidate_index()
+
+
+def resolve_person(face_vector=None, voice_vector=None,
+                   face_provider: Optional[str] = None, voice_provider: Optional[str] = None,
+                   face_threshold: Optional[float] = None, voice_threshold: Optional[float] = None,
+                   face_weight: float = 1.0, voice_weight: float = 1.0,
+                   include_unknown: bool = True) -> dict:
+    """
+    Resolve who is in front of the wearer from a face descriptor, a voiceprint, or both.
+
+    Each modality's distance is turned into a margin score 1 - d/threshold (>= 0 means
+    "within threshold"), and the scores are fused per person as a weighted mean over the
+    modalities that person is enrolled in. The best fused score wins if it is >= 0.
+    include_unknown=False only considers known contacts; unknown profiles are then left to
+    the clustering in services/unknowns.py.
+    """
+    queries = []
+    if face_vector is not None:
+        cfg = MODALITY_DEFAULTS[MODALITY_FACE]
+        queries.append((MODALITY_FACE, face_vector, face_provider or cfg["provider"],
+                        cfg["threshold"] if face_threshold is None else face_threshold, face_weight))
+    if voice_vector is not None:
+        cfg = MODALITY_DEFAULTS[MODALITY_VOICE]
+        queries.append((MODALITY_VOICE, voice_vector, voice_provider or cfg["provider"],
+                        cfg["threshold"] if voice_threshold is None else voice_threshold, voice_weight))
+
+    per_modality = {}
+    mismatched = False
+    for modality, vector, provider, threshold, weight in queries:
+        idx = get_index(provider, modality)
+        if not len(idx):
+            continue
+        if not idx.accepts(vector):
+            log.warning(f"{modality} query is {len(vector)}-d, {provider} index is {idx.dim}-d")
+            mismatched = True
+            continue
+        pids, d = idx.person_ids, idx.distances(vector)
+        if not include_unknown:
+            pids, d = pids[~idx.unknown], d[~idx.unknown]
+            if not len(pids):
+                continue
+        per_modality[modality] = (pids, d, 1.0 - d / max(threshold, 1e-12), weight)
+
+    if not per_modality:
+        return {"match": False, "reason": "dim_mismatch" if mismatched else "no_enrollments"}
+
+    person_ids = np.unique(np.concatenate([v[0] for v in per_modality.values()]))
+    weighted = np.zeros(len(person_ids))
+    weights = np.zeros(len(person_ids))
+    distances = {}
+    for modality, (pids, d, score, weight) in per_modality.items():
+        pos = np.searchsorted(person_ids, pids)
+        weighted[pos] += weight * score
+        weights[pos] += weight
+        full = np.full(len(person_ids), np.nan)
+        full[pos] = d
+        distances[modality] = full
+
+    fused = weighted / weights
+    best = int(np.argmax(fused))
+    result = {
+        "match": bool(fused[best] >= 0),
+        "person_id": int(person_ids[best]),
+        "score": round(float(fused[best]), 4),
+        "distances": {
+            m: round(float(d[best]), 4) for m, d in distances.items() if not np.isnan(d[best])
+        },
+    }
+    return result
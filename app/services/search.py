@@ -0,0 +1,215 @@
+import re
+from typing import Optional
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from markupsafe import Markup, escape
+from sqlalchemy import inspect, text
+
+from app import db
+from app.models import Conversation, Person, TranscriptTurn
+from app.logger import log
+
+# One FTS5 table for every searchable text. The FTS rowid encodes where a row came from
+# (source id * 4 + kind), so triggers update and delete by rowid instead of scanning.
+FTS_TABLE = "search_fts"
+KIND_TURN, KIND_SUMMARY, KIND_NOTES = 0, 1, 2
+KIND_NAMES = {KIND_TURN: "turn", KIND_SUMMARY: "summary", KIND_NOTES: "notes"}
+
+_SOURCES = (
+    # (kind, table, text column)
+    (KIND_TURN, "transcript_turns", "text"),
+    (KIND_SUMMARY, "conversations", "summary"),
+    (KIND_NOTES, "people", "notes"),
+)
+
+# Snippet highlight markers: control characters that never occur in stored text,
+# swapped for <mark> after the snippet has been HTML-escaped.
+_HL_START, _HL_END = "\x02", "\x03"
+
+
+def _trigger_ddl(kind: int, table: str, column: str):
+    rowid_new = f"new.id * 4 + {kind}"
+    rowid_old = f"old.id * 4 + {kind}"
+    yield (f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} "
+           f"WHEN new.{column} IS NOT NULL BEGIN "
+           f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES ({rowid_new}, new.{column}); END")
+    yield (f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN "
+           f"DELETE FROM {FTS_TABLE} WHERE rowid = {rowid_old}; END")
+    yield (f"CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF {column} ON {table} BEGIN "
+           f"DELETE FROM {FTS_TABLE} WHERE rowid = {rowid_old}; "
+           f"INSERT INTO {FTS_TABLE}(rowid, body) SELECT {rowid_new}, new.{column} "
+           f"WHERE new.{column} IS NOT NULL; END")
+
+
+def ensure_search_index() -> bool:
+    """
+    Create the FTS table and its triggers if they are missing, backfilling existing rows.
+    Returns False when the base tables do not exist yet (nothing to index).
+    """
+    if current_app.extensions.get("search_index_ready"):
+        return True
+    engine = db.engine
+    tables = set(inspect(engine).get_table_names())
+    if not all(table in tables for _, table, _ in _SOURCES):
+        return False
+    if FTS_TABLE in tables:
+        current_app.extensions["search_index_ready"] = True
+        return True
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(body, tokenize='porter unicode61')"
+        ))
+        for kind, table, column in _SOURCES:
+            for ddl in _trigger_ddl(kind, table, column):
+                conn.execute(text(ddl))
+        _backfill(conn)
+    current_app.extensions["search_index_ready"] = True
+    log.info("Created full-text search index")
+    return True
+
+
+def _backfill(conn):
+    for kind, table, column in _SOURCES:
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE}(rowid, body) "
+            f"SELECT id * 4 + {kind}, {column} FROM {table} WHERE {column} IS NOT NULL"
+        ))
+
+
+def rebuild_search_index():
+    """Drop and refill the index from the source tables (e.g. after a bulk import without triggers)."""
+    if not ensure_search_index():
+        return
+    with db.engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        _backfill(conn)
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def to_match_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 query: every word must match, and the last one
+    may be a prefix (so results show up while typing). Punctuation is ignored.
+    """
+    words = re.findall(r"\w+", query or "")
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _snippet_html(raw: str) -> Markup:
+    html = str(escape(raw))
+    return Markup(html.replace(_HL_START, "<mark>").replace(_HL_END, "</mark>"))
+
+
+def search(query: str, person_id: Optional[int] = None, limit: int = 50) -> list:
+    """
+    Ranked (bm25) hits for a free-text query, optionally limited to one person.
+    Each hit: kind, person (id/name), conversation (id/started_at) when applicable,
+    turn timestamp for transcript lines, and an HTML snippet with <mark> highlights.
+    """
+    match = to_match_query(query)
+    if not match or not ensure_search_index():
+        return []
+
+    scope = ""
+    params = {"match": match, "hl_start": _HL_START, "hl_end": _HL_END, "limit": limit}
+    if person_id is not None:
+        # Restrict inside SQL so ranking and LIMIT only ever see this person's rows
+        scope = (
+            f" AND ((rowid % 4 = {KIND_TURN} AND rowid / 4 IN ("
+            "SELECT t.id FROM transcript_turns t JOIN conversations c ON c.id = t.conversation_id "
+            "WHERE c.person_id = :person_id))"
+            f" OR (rowid % 4 = {KIND_SUMMARY} AND rowid / 4 IN "
+            "(SELECT id FROM conversations WHERE person_id = :person_id))"
+            f" OR rowid = :person_id * 4 + {KIND_NOTES})"
+        )
+        params["person_id"] = person_id
+
+    rows = db.session.execute(
+        text(
+            f"SELECT rowid, bm25({FTS_TABLE}) AS rank, "
+            f"snippet({FTS_TABLE}, 0, :hl_start, :hl_end, '…', 16) AS snip "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match{scope} ORDER BY rank LIMIT :limit"
+        ),
+        params,
+    ).all()
+
+    ids = {kind: [] for kind in KIND_NAMES}
+    for rowid, _, _ in rows:
+        ids[rowid % 4].append(rowid // 4)
+
+    # Resolve hits to their conversation/person with one query per kind
+    turns = {
+        t.id: t for t in db.session.query(TranscriptTurn).filter(TranscriptTurn.id.in_(ids[KIND_TURN]))
+    } if ids[KIND_TURN] else {}
+    conv_ids = set(ids[KIND_SUMMARY]) | {t.conversation_id for t in turns.values()}
+    convs = {
+        c.id: c for c in db.session.query(Conversation).filter(Conversation.id.in_(conv_ids))
+    } if conv_ids else {}
+    person_ids = set(ids[KIND_NOTES]) | {c.person_id for c in convs.values() if c.person_id}
+    people = {
+        p.id: p for p in db.session.query(Person).filter(Person.id.in_(person_ids))
+    } if person_ids else {}
+
+    hits = []
+    for rowid, rank, snip in rows:
+        kind, ref_id = rowid % 4, rowid // 4
+        turn = conv = person = None
+        if kind == KIND_TURN:
+            turn = turns.get(ref_id)
+            conv = convs.get(turn.conversation_id) if turn else None
+        elif kind == KIND_SUMMARY:
+            conv = convs.get(ref_id)
+        if kind == KIND_NOTES:
+            person = people.get(ref_id)
+        elif conv is not None:
+            person = people.get(conv.person_id)
+        if (kind != KIND_NOTES and conv is None) or (kind == KIND_NOTES and person is None):
+            continue  # stale row for something deleted outside the triggers
+
+        hits.append({
+            "kind": KIND_NAMES[kind],
+            "rank": round(-float(rank), 4),
+            "snippet": _snippet_html(snip),
+            "person_id": person.id if person else None,
+            "person_name": person.display_name if person else None,
+            "conversation_id": conv.id if conv else None,
+            "started_at": conv.started_at if conv else None,
+            "timestamp": turn.timestamp if turn else None,
+            "speaker": turn.speaker if turn else None,
+        })
+    return hits
+
+
+def group_hits(hits: list) -> list:
+    """Group ranked hits per person, then per conversation, keeping the best-ranked groups first."""
+    people = {}
+    for hit in hits:
+        person = people.setdefault(hit["person_id"], {
+            "person_id": hit["person_id"], "person_name": hit["person_name"],
+            "notes": [], "conversations": {},
+        })
+        if hit["kind"] == "notes":
+            person["notes"].append(hit)
+            continue
+        conv = person["conversations"].setdefault(hit["conversation_id"], {
+            "conversation_id": hit["conversation_id"], "started_at": hit["started_at"], "hits": [],
+        })
+        conv["hits"].append(hit)
+    for person in people.values():
+        person["conversations"] = list(person["conversations"].values())
+    return list(people.values())
+
+
+@click.command("search-reindex")
+@with_appcontext
+def search_reindex_command():
+    """Rebuild the full-text search index from transcripts, summaries and notes."""
+    rebuild_search_index()
+    click.echo("Search index rebuilt.")
@@ -0,0 +1,172 @@
+import json
+from typing import Optional
+
+import click
+import numpy as np
+from flask.cli import with_appcontext
+
+from app import db
+from app.models import Embedding, Person, UnknownSighting
+from app.logger import log
+from app.services.merge import merge_people
+from app.services.recognition import MODALITY_DEFAULTS, MODALITY_FACE, EmbeddingIndex, upsert_embedding
+
+# Online clustering of unrecognized faces. Every unknown profile is a cluster whose centroid is
+# its Embedding (mean of its sightings). A new sighting joins the nearest unknown cluster when it
+# is within CLUSTER_FACTOR * threshold, otherwise it starts a new unknown profile. Clusters that
+# drift close to each other (or to a known contact) later are offered as merge proposals.
+CLUSTER_FACTOR = 0.85      # tighter than recognition, so two strangers are not lumped together
+PROPOSAL_FACTOR = 1.15     # slightly looser than recognition: a human confirms these
+
+
+def _unknown_index(provider: str):
+    """Vectorized index over unknown profiles' centroids, plus the Embedding rows it was built from."""
+    rows = (
+        db.session.query(Embedding)
+        .join(Person, Person.id == Embedding.person_id)
+        .filter(Embedding.provider == provider, Person.is_unknown == True)
+        .all()
+    )
+    return EmbeddingIndex(provider, MODALITY_DEFAULTS[MODALITY_FACE]["metric"], rows), rows
+
+
+def _add_to_cluster(emb: Embedding, vec: np.ndarray, provider: str):
+    # Running mean: the centroid moves 1/(n+1) of the way towards the new sighting
+    n = max(emb.samples or 1, 1)
+    centroid = (np.asarray(json.loads(emb.vector_json)) * n + vec) / (n + 1)
+    upsert_embedding(emb.person_id, [round(float(x), 6) for x in centroid], provider, MODALITY_FACE,
+                     samples=n + 1)
+
+
+def record_sighting(vector, provider: Optional[str] = None, threshold: Optional[float] = None,
+                    person: Optional[Person] = None, distance: Optional[float] = None) -> dict:
+    """
+    Assign one unrecognized face descriptor to an unknown profile, creating a new profile when
+    no existing cluster is close enough. The cluster centroid is updated incrementally. Commits.
+    Pass `person` (and its `distance`) when recognition already matched an unknown profile.
+    Returns {"person": Person, "created": bool, "distance": float or None}.
+    """
+    cfg = MODALITY_DEFAULTS[MODALITY_FACE]
+    provider = provider or cfg["provider"]
+    join_distance = (cfg["threshold"] if threshold is None else threshold) * CLUSTER_FACTOR
+    vec = np.asarray(vector, dtype=np.float64)
+
+    if person is not None:
+        emb = (
+            db.session.query(Embedding)
+            .filter(Embedding.person_id == person.id, Embedding.provider == provider)
+            .first()
+        )
+        if emb is not None and len(json.loads(emb.vector_json)) == len(vec):
+            _add_to_cluster(emb, vec, provider)
+    else:
+        index, rows = _unknown_index(provider)
+        if len(index) and index.accepts(vec):
+            distances = index.distances(vec)
+            best = int(np.argmin(distances))
+            if distances[best] <= join_distance:
+                distance = float(distances[best])
+                emb = next(r for r in rows if r.person_id == index.person_ids[best])
+                person = emb.person
+                _add_to_cluster(emb, vec, provider)
+
+    created = person is None
+    if created:
+        person = Person.make_unknown()
+        db.session.add(person)
+        db.session.flush()
+        upsert_embedding(person.id, [round(float(x), 6) for x in vec], provider, MODALITY_FACE)
+
+    db.session.add(UnknownSighting(person_id=person.id, provider=provider,
+                                   vector_json=json.dumps([round(float(x), 6) for x in vec]),
+                                   distance=distance))
+    db.session.commit()
+    if created:
+        log.info(f"New unknown cluster {person.display_name} (id {person.id})")
+    return {"person": person, "created": created, "distance": distance}
+
+
+def merge_proposals(provider: Optional[str] = None, threshold: Optional[float] = None,
+                    limit: Optional[int] = 20) -> list:
+    """
+    Candidate merges for unknown profiles, closest first: an unknown whose centroid is near a
+    known contact, or two unknowns that are probably the same person (the newer one is
+    proposed to fold into the older). One vectorized distance matrix over all centroids.
+    limit=None returns every proposal.
+    """
+    cfg = MODALITY_DEFAULTS[MODALITY_FACE]
+    provider = provider or cfg["provider"]
+    threshold = threshold or cfg["threshold"]
+    max_distance = threshold * PROPOSAL_FACTOR
+
+    rows = (
+        db.session.query(Embedding, Person)
+        .join(Person, Person.id == Embedding.person_id)
+        .filter(Embedding.provider == provider)
+        .all()
+    )
+    # Same dimension filter as the recognition index: odd-sized rows can't be compared
+    index = EmbeddingIndex(provider, cfg["metric"], [e for e, _ in rows])
+    comparable = set(index.person_ids.tolist())
+    rows = [(e, p) for e, p in rows if e.person_id in comparable]
+    unknown_rows = [(e, p) for e, p in rows if p.is_unknown]
+    if not unknown_rows or len(rows) < 2:
+        return []
+
+    all_vecs = np.asarray([json.loads(e.vector_json) for e, _ in rows], dtype=np.float32)
+    unk_vecs = np.asarray([json.loads(e.vector_json) for e, _ in unknown_rows], dtype=np.float32)
+    if cfg["metric"] == "cosine":
+        all_vecs /= np.linalg.norm(all_vecs, axis=1, keepdims=True) + 1e-12
+        unk_vecs /= np.linalg.norm(unk_vecs, axis=1, keepdims=True) + 1e-12
+        dist = 1.0 - unk_vecs @ all_vecs.T
+    else:
+        sq = (unk_vecs ** 2).sum(1)[:, None] + (all_vecs ** 2).sum(1)[None, :] - 2 * unk_vecs @ all_vecs.T
+        dist = np.sqrt(np.maximum(sq, 0.0))
+
+    proposals, seen = [], set()
+    for i, j in zip(*np.nonzero(dist <= max_distance)):
+        (_, unknown), (_, other) = unknown_rows[i], rows[j]
+        if other.id == unknown.id:
+            continue
+        if other.is_unknown:
+            # Each unknown pair once, folding the newer profile into the older one
+            if (min(unknown.id, other.id), max(unknown.id, other.id)) in seen:
+                continue
+            seen.add((min(unknown.id, other.id), max(unknown.id, other.id)))
+            if (other.created_at, other.id) > (unknown.created_at, unknown.id):
+                unknown, other = other, unknown
+        d = float(dist[i, j])
+        proposals.append({
+            "source": unknown,
+            "target": other,
+            "distance": round(d, 4),
+            "similarity": round(max(0.0, 1.0 - d / max_distance), 3),
+        })
+    # Known contacts first: resolving an unknown into a real person is the more useful merge
+    proposals.sort(key=lambda p: (p["target"].is_unknown, p["distance"]))
+    return proposals[:limit]
+
+
+@click.command("cluster-unknowns")
+@click.option("--apply", "apply_merges", is_flag=True,
+              help="Merge unknown profiles that are within the clustering distance of each other.")
+@with_appcontext
+def cluster_unknowns_command(apply_merges):
+    """List merge proposals for unknown profiles (and optionally merge duplicate unknowns)."""
+    # Applying needs every unknown/unknown pair, not just the top of the known-first ranking
+    proposals = merge_proposals(limit=None if apply_merges else 20)
+    for p in proposals:
+        click.echo(f"{p['source'].display_name} -> {p['target'].display_name}: "
+                   f"distance {p['distance']} (similarity {p['similarity']:.0%})")
+    if not apply_merges:
+        return
+
+    join_distance = MODALITY_DEFAULTS[MODALITY_FACE]["threshold"] * CLUSTER_FACTOR
+    pairs = [(p["source"].id, p["target"].id) for p in proposals
+             if p["target"].is_unknown and p["distance"] <= join_distance]
+    merged = set()
+    for source_id, target_id in pairs:
+        if source_id not in merged and target_id not in merged:
+            merge_people(target_id, [source_id])
+            merged.add(source_id)
+    click.echo(f"Merged {len(merged)} duplicate unknown profiles.")
@@ -40,7 +40,7 @@ let FACE_PRESENT_NOW = false;
 
 async function loadFaceModels() {
   try {
-    const MODELS_URL = "/static/face-models";
+    const MODELS_URL = window.MEMOIR_MODELS_URL || "/static/face-models";  // versioned URL set by the page
     await faceapi.nets.tinyFaceDetector.loadFromUri(MODELS_URL);
     await faceapi.nets.faceLandmark68Net.loadFromUri(MODELS_URL);
     await faceapi.nets.faceRecognitionNet.loadFromUri(MODELS_URL);
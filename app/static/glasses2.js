@@ -39,7 +39,7 @@ let FACE_PRESENT_NOW = false;
 
 async function loadFaceModels() {
   try {
-    const MODELS_URL = "/static/face-models";
+    const MODELS_URL = window.MEMOIR_MODELS_URL || "/static/face-models";  // versioned URL set by the page
     await faceapi.nets.tinyFaceDetector.loadFromUri(MODELS_URL);
     await faceapi.nets.faceLandmark68Net.loadFromUri(MODELS_URL);
     await faceapi.nets.faceRecognitionNet.loadFromUri(MODELS_URL);
@@ -739,7 +739,11 @@ case "set-speaker": {
     openProfile(pid);
     } else {
     try {
-      const r2 = await fetch("/glasses/api/unknown/ensure", { method: "POST" });
+      const r2 = await fetch("/glasses/api/unknown/ensure", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ vector: vec, provider: "local" }),
+      });
       if (!r2.ok) throw new Error(`HTTP ${r2.status}`);
       const unk = await r2.json();
 
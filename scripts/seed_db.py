@@ -14,6 +14,7 @@ from datetime import datetime, timedelta
 # --- Project imports (based on your app structure) ---
 from app import create_app, db
 from app.models import Person, Conversation, TranscriptTurn, Embedding
+from app.services.search import ensure_search_index
 
 
 def dt(y, m, d, hh, mm, ss=0):
@@ -284,19 +285,7 @@ def seed_data():
         ]
     )
 
-    # ---------------- Update cached summaries ----------------
-    def set_cached_summary(person: Person):
-        conv = (
-            db.session.query(Conversation)
-            .filter(Conversation.person_id == person.id)
-            .order_by(Conversation.started_at.desc())
-            .first()
-        )
-        if conv and conv.summary:
-            person.last_summary_cached = conv.summary
-
-    for p in (mom, dr, ravi):
-        set_cached_summary(p)
+    # Recap cards (last_summary_cached etc.) are materialized on commit by app/services/recap.py
 
     db.session.commit()
 
@@ -310,11 +299,13 @@ def seed_data():
 
 
 def main():
-    app = create_app()
+    # The recall index is built on first query (or with `flask recall-reindex`), not per seed commit
+    app = create_app({"RECALL_DISABLED": True})
     with app.app_context():
         db_path = reset_database_file(app)
         print("Recreating tables...")
         db.create_all()
+        ensure_search_index()  # triggers index the seed rows as they are inserted
         print(f"Created new DB at: {db_path}")
         seed_data()
 
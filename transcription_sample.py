@@ -2,7 +2,10 @@
 from __future__ import annotations
 
 import os
+import queue
 import sys
+import tempfile
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -38,31 +41,91 @@ def _load_gemini_client() -> genai.Client:
 
 # ---------------- Recording backend ----------------
 class InteractiveRecorder:
-    def __init__(self, samplerate: int = 16_000, channels: int = 1, dtype: str = "int16"):
+    """
+    Microphone recorder that streams to disk while recording.
+
+    The audio callback only copies each block into a bounded queue; a writer thread drains
+    the queue into a spool file next to the final output, and stop_and_save() renames it
+    into place. Memory use is capped at `max_queue_blocks` blocks no matter how long the
+    visit lasts (blocks are dropped and counted in `overruns` if the disk falls that far behind).
+    Pausing simply stops queueing blocks, so the saved file has no silent gaps.
+    """
+
+    def __init__(self, samplerate: int = 16_000, channels: int = 1, dtype: str = "int16",
+                 spool_dir: Path | None = None, max_queue_blocks: int = 512, blocksize: int = 1024):
         self.samplerate = samplerate
         self.channels = channels
         self.dtype = dtype
+        self.blocksize = blocksize
+        self.spool_dir = Path(spool_dir or AUDIO_OUT_PATH.parent)
         self._stream: sd.InputStream | None = None
-        self._frames: list[np.ndarray] = []
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_blocks)
+        self._writer: threading.Thread | None = None
+        self._spool_path: Path | None = None
+        self._frames_written = 0
+        self.overruns = 0
         self._is_open = False
         self._is_recording = False
+        # Live consumers (e.g. a streaming transcriber's feed) get every recorded block as it arrives.
+        self._listeners = []
+
+    @property
+    def max_buffered_bytes(self) -> int:
+        """Upper bound on audio held in RAM, independent of recording length."""
+        itemsize = np.dtype(self.dtype).itemsize
+        return self._queue.maxsize * self.blocksize * self.channels * itemsize
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
 
     def _callback(self, indata, frames, time_info, status):
         if status:
             print(f"[REC][warn] {status}", file=sys.stderr)
         if self._is_recording:
-            self._frames.append(indata.copy())
+            block = indata.copy()
+            try:
+                self._queue.put_nowait(block)
+            except queue.Full:
+                self.overruns += 1
+            for listener in self._listeners:
+                listener(block)
+
+    def _write_loop(self, sink: sf.SoundFile):
+        try:
+            while True:
+                block = self._queue.get()
+                if block is None:
+                    break
+                sink.write(block)
+                self._frames_written += len(block)
+        finally:
+            sink.close()
 
     def open(self):
         if self._is_open:
             return
-        self._stream = sd.InputStream(
-            samplerate=self.samplerate,
-            channels=self.channels,
-            dtype=self.dtype,
-            callback=self._callback,
-        )
-        self._stream.start()
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        fd, spool = tempfile.mkstemp(prefix=".rec-", suffix=".wav", dir=self.spool_dir)
+        os.close(fd)
+        self._spool_path = Path(spool)
+        self._frames_written = 0
+        sink = sf.SoundFile(str(self._spool_path), mode="w", samplerate=self.samplerate,
+                            channels=self.channels, subtype="PCM_16")
+        self._writer = threading.Thread(target=self._write_loop, args=(sink,), daemon=True)
+        self._writer.start()
+
+        try:
+            self._stream = sd.InputStream(
+                samplerate=self.samplerate,
+                channels=self.channels,
+                dtype=self.dtype,
+                blocksize=self.blocksize,
+                callback=self._callback,
+            )
+            self._stream.start()
+        except Exception:
+            self.discard()
+            raise
         self._is_open = True
         print("[REC] Stream opened.")
 
@@ -83,56 +146,84 @@ class InteractiveRecorder:
             print("[REC] Resumed.")
 
     def stop_and_save(self, out_path: Path) -> Path:
-        if self._is_open:
-            self._is_recording = False
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        if not self._is_open:
+            print("[REC] No audio captured. Creating empty file.")
+            audio = np.zeros((0, self.channels), dtype=np.int16)
+            sf.write(str(out_path), audio, self.samplerate, subtype="PCM_16")
+            return out_path
+
+        self._is_recording = False
+        try:
+            self._stream.stop()
+            self._stream.close()
+        finally:
+            self._stream = None
+            self._is_open = False
+        print("[REC] Stream closed.")
+
+        # Let the writer drain what is queued, then move the finished file into place
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+        os.replace(self._spool_path, out_path)
+        self._spool_path = None
+
+        if self.overruns:
+            print(f"[REC][warn] Dropped {self.overruns} blocks (disk too slow).", file=sys.stderr)
+        print(f"[REC] Saved: {out_path}  ({self._frames_written/self.samplerate:.2f}s)")
+        return out_path
+
+    def discard(self):
+        """Stop without saving: close the stream and writer and delete the spool file."""
+        self._is_recording = False
+        if self._stream is not None:
             try:
                 self._stream.stop()
                 self._stream.close()
             finally:
                 self._stream = None
-                self._is_open = False
-            print("[REC] Stream closed.")
-
-        if len(self._frames) == 0:
-            print("[REC] No audio captured. Creating empty file.")
-            audio = np.zeros((0, self.channels), dtype=np.int16)
-        else:
-            audio = np.concatenate(self._frames, axis=0)
-
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-        sf.write(str(out_path), audio, self.samplerate, subtype="PCM_16")
-        print(f"[REC] Saved: {out_path}  ({audio.shape[0]/self.samplerate:.2f}s)")
-        self._frames.clear()
-        return out_path
+        self._is_open = False
+        if self._writer is not None:
+            if self._writer.is_alive():
+                self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        if self._spool_path is not None:
+            self._spool_path.unlink(missing_ok=True)
+            self._spool_path = None
 
 
 def record_audio_interactive(out_path: Path) -> Path:
-    rec = InteractiveRecorder()
+    rec = InteractiveRecorder(spool_dir=out_path.parent)
     print("\n=== Microphone Recorder ===")
     print("Controls:  S=Start, P=Pause, R=Resume, T=Stop&Save, Q=Quit\n")
 
     saved_path: Path | None = None
-    while True:
-        try:
-            cmd = input("[S/P/R/T/Q] > ").strip().lower()
-        except (EOFError, KeyboardInterrupt):
-            print("\n[REC] Exiting.")
-            break
-
-        if cmd == "s":
-            rec.start()
-        elif cmd == "p":
-            rec.pause()
-        elif cmd == "r":
-            rec.resume()
-        elif cmd == "t":
-            saved_path = rec.stop_and_save(out_path)
-            break
-        elif cmd == "q":
-            print("[REC] Quit requested.")
-            sys.exit(0)
-        else:
-            print("Unknown command.")
+    try:
+        while True:
+            try:
+                cmd = input("[S/P/R/T/Q] > ").strip().lower()
+            except (EOFError, KeyboardInterrupt):
+                print("\n[REC] Exiting.")
+                break
+
+            if cmd == "s":
+                rec.start()
+            elif cmd == "p":
+                rec.pause()
+            elif cmd == "r":
+                rec.resume()
+            elif cmd == "t":
+                saved_path = rec.stop_and_save(out_path)
+                break
+            elif cmd == "q":
+                print("[REC] Quit requested.")
+                sys.exit(0)
+            else:
+                print("Unknown command.")
+    finally:
+        rec.discard()  # no-op after a save; otherwise don't leave a spool file behind
     return saved_path or out_path
 
 